@@ -1,14 +1,16 @@
 from fastapi import APIRouter , Request , Response , Depends , status 
 from starlette.responses import RedirectResponse
 
-from app.services.auth_service import auth_service
-from app.security.deps import get_current_user 
+from app.core.lazy import LazyObject
+from app.security.admission import admit_auth, admit_auth_client
 from app.schemas.user import User
 from app.schemas.auth import LogoutResponse , RefreshTokenResponse, SessionRequest, SessionResponse
 
+auth_service = LazyObject("app.services.auth_service:auth_service")
+
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-@router.get("/login/google",status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+@router.get("/login/google",status_code=status.HTTP_307_TEMPORARY_REDIRECT, dependencies=[Depends(admit_auth_client)])
 async def google_login(request: Request):
     """
         Initiate Google OAuth login by redirecting the user to Supabase OAuth.
@@ -16,7 +18,7 @@ async def google_login(request: Request):
     login_response = await auth_service.initiate_google_login(request)
     return RedirectResponse(url=login_response.redirect_url)
 
-@router.post("/session", response_model=SessionResponse)
+@router.post("/session", response_model=SessionResponse, dependencies=[Depends(admit_auth_client)])
 async def create_session(
     response: Response,
     session_data: SessionRequest
@@ -28,20 +30,20 @@ async def create_session(
     return await auth_service.create_session_from_tokens(response, session_data)
 
 @router.get("/me" , response_model=User)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(admit_auth)):
     """
         Get the profile of the currently authenticated user.
     """
     return current_user 
 
-@router.post("/logout", response_model=LogoutResponse)
+@router.post("/logout", response_model=LogoutResponse, dependencies=[Depends(admit_auth_client)])
 async def logout(request: Request, response: Response):
     """
     Log out the user by clearing their session cookies.
     """
     return await auth_service.logout(request, response)
 
-@router.post("/refresh", response_model=RefreshTokenResponse)
+@router.post("/refresh", response_model=RefreshTokenResponse, dependencies=[Depends(admit_auth_client)])
 async def refresh_token(request: Request, response: Response):
     """
     Refresh the access token using the refresh token cookie.
@@ -1,5 +1,81 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from starlette.responses import StreamingResponse
+
+from app.core.lazy import LazyObject
+from app.security.admission import admit_chat
+from app.security.deps import get_current_user
+from app.schemas.user import User
+from app.schemas.chat import (
+    ChatRequest,
+    Conversation,
+    ConversationCreate,
+    ConversationDetail,
+    ConversationListResponse,
+)
+
+# --- Services (and the RAG stack behind them) load with the first request ---
+chat_service = LazyObject("app.services.chat_service:chat_service")
+conversation_service = LazyObject("app.services.conversation_service:conversation_service")
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-# Chat endpoints will be implemented later
\ No newline at end of file
+@router.post("/stream")
+async def stream_chat(
+    chat_request: ChatRequest,
+    request: Request,
+    current_user: User = Depends(admit_chat),
+):
+    """
+    Answer a question over the user's documents as Server-Sent Events.
+
+    Emits a `retrieval` event with the matched chunks, one `token` event per
+    generated text delta and a final `done` event with timings. Comment
+    frames keep idle connections alive; disconnecting stops generation.
+    With a `conversation_id` the answer takes the conversation so far into
+    account and the turn is added to it.
+    """
+    conversation = None
+    if chat_request.conversation_id:
+        conversation = await conversation_service.get(current_user.id, chat_request.conversation_id)
+    return StreamingResponse(
+        chat_service.stream_chat(current_user, chat_request, request.is_disconnected, conversation),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/conversations", response_model=Conversation, status_code=status.HTTP_201_CREATED)
+async def create_conversation(
+    body: ConversationCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Start a conversation; pass its id as `conversation_id` to /chat/stream.
+    """
+    return await conversation_service.create(current_user.id, body.title)
+
+@router.get("/conversations", response_model=ConversationListResponse)
+async def list_conversations(current_user: User = Depends(get_current_user)):
+    """
+    List the current user's conversations, most recently active first.
+    """
+    return ConversationListResponse(conversations=await conversation_service.list(current_user.id))
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationDetail)
+async def get_conversation(
+    conversation_id: str,
+    after: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get a conversation and a page of its messages (those after position `after`).
+    """
+    return await conversation_service.detail(current_user.id, conversation_id, after, limit)
+
+@router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_conversation(conversation_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Delete a conversation and its messages.
+    """
+    await conversation_service.delete(current_user.id, conversation_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
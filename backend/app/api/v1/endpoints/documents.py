@@ -1,5 +1,74 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, File, UploadFile, status
+
+from app.core.lazy import LazyObject
+from app.security.admission import admit_ingestion
+from app.security.deps import get_current_user
+from app.schemas.user import User
+from app.schemas.document import DocumentInfo, DocumentListResponse, DocumentUploadResponse
+from app.schemas.job import JobInfo, JobListResponse
+
+# --- The service (and the ingestion stack behind it) loads with the first request ---
+document_service = LazyObject("app.services.document_service:document_service")
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
-# Document endpoints will be implemented later
\ No newline at end of file
+@router.post("/upload", response_model=DocumentUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_document(
+    file: UploadFile = File(...),
+    current_user: User = Depends(admit_ingestion),
+):
+    """
+    Upload a document and queue it for ingestion.
+
+    The multipart body is streamed into a spooled temporary file and copied
+    to storage in fixed-size blocks, so memory use does not grow with file
+    size. Ingestion runs in the background; follow it via the returned job.
+    """
+    document = await document_service.save_upload(current_user.id, file)
+    job = await document_service.enqueue_ingest(document)
+    return DocumentUploadResponse(success=True, document=document, job=job)
+
+@router.put("/{document_id}", response_model=DocumentUploadResponse, status_code=status.HTTP_202_ACCEPTED)
+async def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    current_user: User = Depends(admit_ingestion),
+):
+    """
+    Upload a new version of a document.
+
+    Only chunks that differ from the indexed version are embedded; removed
+    chunks are tombstoned and unchanged ones are kept as they are. The
+    current version is served until the queued re-index succeeds; no job is
+    returned when the content is unchanged.
+    """
+    document, job = await document_service.enqueue_replacement(current_user.id, document_id, file)
+    return DocumentUploadResponse(success=True, document=document, job=job)
+
+@router.get("", response_model=DocumentListResponse)
+async def list_documents(current_user: User = Depends(get_current_user)):
+    """
+    List the current user's documents.
+    """
+    return DocumentListResponse(documents=document_service.list_documents(current_user.id))
+
+@router.get("/jobs", response_model=JobListResponse)
+async def list_jobs(current_user: User = Depends(get_current_user)):
+    """
+    List the current user's recent ingestion jobs, newest first.
+    """
+    return JobListResponse(jobs=document_service.list_jobs(current_user.id))
+
+@router.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Get an ingestion job's status, attempts and progress.
+    """
+    return document_service.get_job(current_user.id, job_id)
+
+@router.get("/{document_id}", response_model=DocumentInfo)
+async def get_document(document_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Get a single document's metadata and ingestion status.
+    """
+    return document_service.get_document(current_user.id, document_id)
@@ -1,5 +1,206 @@
-from fastapi import APIRouter
+import hmac
+from typing import TYPE_CHECKING
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.responses import PlainTextResponse
+
+from app.core.config import get_settings
+from app.core.http_client import UpstreamClient, get_http_client
+from app.core.lazy import lazy_dependency
+from app.core.metrics import MetricsRegistry, get_metrics
+from app.core.profiling import RequestProfiler, get_profiler
+from app.core.warmup import Warmup, get_warmup
+from app.security.admission import AdmissionController, get_admission_controller
+from app.security.deps import get_admin_user, get_current_user, get_token_from_request
+from app.schemas.user import User
+
+if TYPE_CHECKING:
+    from app.rag.batcher import BatchingEmbedder
+    from app.rag.embedding_cache import CachedEmbedder
+    from app.rag.parser_pool import ParserPool
+    from app.rag.vector_store import PartitionedVectorStore
+    from app.services.chat_service import SemanticAnswerCache
+    from app.services.conversation_service import ConversationService
+    from app.services.job_scheduler import JobScheduler
+
+settings = get_settings()
+
+# --- Stats of components that are imported on first use, not with the app ---
+get_batching_embedder = lazy_dependency("app.rag.batcher:get_batching_embedder")
+get_embedding_cache = lazy_dependency("app.rag.embedding_cache:get_embedding_cache")
+get_parser_pool = lazy_dependency("app.rag.parser_pool:get_parser_pool")
+get_partitioned_store = lazy_dependency("app.rag.vector_store:get_partitioned_store")
+get_answer_cache = lazy_dependency("app.services.chat_service:get_answer_cache")
+get_conversation_service = lazy_dependency("app.services.conversation_service:get_conversation_service")
+get_job_scheduler = lazy_dependency("app.services.job_scheduler:get_job_scheduler")
 
 router = APIRouter(prefix="/system", tags=["System"])
 
-# System endpoints will be implemented later
\ No newline at end of file
+
+@router.get("/health")
+async def health():
+    """
+    Liveness: the worker is up. Answers during warm-up too.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready(response: Response, startup: Warmup = Depends(get_warmup)):
+    """
+    Readiness: 503 until warm-up (services loaded, jobs recovered, keys and
+    indexes preloaded) has finished; the body shows each step's progress.
+    """
+    if not startup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return startup.stats()
+
+
+async def metrics_access(request: Request) -> None:
+    """
+    A scraper may present METRICS_TOKEN as a bearer token; anyone else needs a session
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if settings.METRICS_TOKEN and hmac.compare_digest(auth_header, f"Bearer {settings.METRICS_TOKEN}"):
+        return
+    await get_current_user(request, await get_token_from_request(request))
+
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(metrics_access)])
+async def prometheus_metrics(registry: MetricsRegistry = Depends(get_metrics)):
+    """
+    Request latency per route, requests in flight and per-stage timings (auth,
+    embedding, retrieval, packing, generation) in Prometheus text format.
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/profiles")
+async def list_profiles(
+    admin: User = Depends(get_admin_user),
+    profiler: RequestProfiler = Depends(get_profiler),
+):
+    """
+    Recent request profiles, newest first. Send the PROFILE_HEADER header on
+    a request to capture one; its id comes back in X-Profile-Id.
+    """
+    return {"profiles": profiler.list(), "captures": profiler.captures, "refused": profiler.refused}
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(
+    profile_id: str,
+    admin: User = Depends(get_admin_user),
+    profiler: RequestProfiler = Depends(get_profiler),
+):
+    """
+    One captured profile as a pstats report, sorted by cumulative time.
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    header = f"{profile['method']} {profile['path']} ({profile['route']}) {1000 * profile['seconds']:.2f} ms\n\n"
+    return PlainTextResponse(header + profile["report"])
+
+@router.get("/admission")
+async def admission_stats(
+    current_user: User = Depends(get_current_user),
+    controller: AdmissionController = Depends(get_admission_controller),
+):
+    """
+    Per route class: slots in use, queue length, average hold time and rate
+    limits. Outcome counters and queue waits are in /system/metrics.
+    """
+    return controller.stats()
+
+
+@router.get("/upstream")
+async def upstream_stats(
+    current_user: User = Depends(get_current_user),
+    client: UpstreamClient = Depends(get_http_client),
+):
+    """
+    Connection pool and request stats for upstream Supabase calls.
+    """
+    return client.stats()
+
+
+@router.get("/embeddings")
+async def embedding_stats(
+    current_user: User = Depends(get_current_user),
+    batcher: "BatchingEmbedder" = Depends(get_batching_embedder),
+):
+    """
+    Micro-batcher queue depth, batch sizes and wait times.
+    """
+    return batcher.stats()
+
+
+@router.get("/embedding-cache")
+async def embedding_cache_stats(
+    current_user: User = Depends(get_current_user),
+    cache: "CachedEmbedder" = Depends(get_embedding_cache),
+):
+    """
+    Embedding cache hit rate per tier and bytes saved.
+    """
+    return cache.stats()
+
+
+@router.get("/parsers")
+async def parser_stats(
+    current_user: User = Depends(get_current_user),
+    pool: "ParserPool" = Depends(get_parser_pool),
+):
+    """
+    Parser worker pool jobs, timeouts, crashes and restarts.
+    """
+    return pool.stats()
+
+
+@router.get("/jobs")
+async def job_stats(
+    admin: User = Depends(get_admin_user),
+    scheduler: "JobScheduler" = Depends(get_job_scheduler),
+):
+    """
+    Background job queue depth, running jobs, busiest users and outcomes.
+    Admins only, since the busiest users are listed by id.
+    """
+    return scheduler.stats()
+
+
+@router.get("/partitions")
+async def partition_stats(
+    admin: User = Depends(get_admin_user),
+    stores: "PartitionedVectorStore" = Depends(get_partitioned_store),
+):
+    """
+    Index partitions loaded in this worker, loads and evictions. Admins
+    only, since partitions are listed by owner id.
+    """
+    return stores.stats()
+
+
+@router.get("/answer-cache")
+async def answer_cache_stats(
+    current_user: User = Depends(get_current_user),
+    cache: "SemanticAnswerCache" = Depends(get_answer_cache),
+):
+    """
+    Semantic answer cache size, hit rate, evictions and invalidations.
+    """
+    return cache.stats()
+
+
+@router.get("/conversations")
+async def conversation_stats(
+    current_user: User = Depends(get_current_user),
+    conversations: "ConversationService" = Depends(get_conversation_service),
+):
+    """
+    Conversation store backend, summaries written and messages folded.
+    """
+    return conversations.stats()
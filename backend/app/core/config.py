@@ -1,3 +1,4 @@
+import os
 from typing import List 
 from pydantic_settings import BaseSettings 
 from functools import lru_cache
@@ -20,6 +21,25 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    REFRESH_COALESCE_TTL_SECONDS: float = 5.0
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    JWKS_CACHE_TTL_SECONDS: int = 3600
+    JWKS_MAX_STALE_SECONDS: int = 86400
+    JWKS_MIN_REFRESH_SECONDS: int = 30
+    JWKS_MAX_REFRESH_BACKOFF_SECONDS: int = 600
+    ADMIN_EMAILS: str = ""
+    # --- Upstream HTTP ---
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP2_ENABLED: bool = False
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_TIMEOUT_JWKS_SECONDS: float = 5.0
+    HTTP_TIMEOUT_TOKEN_SECONDS: float = 10.0
+    HTTP_TIMEOUT_LOGOUT_SECONDS: float = 5.0
+    HTTP_RETRY_ATTEMPTS: int = 2
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.1
+    HTTP_RETRY_BACKOFF_MAX_SECONDS: float = 2.0
     # --- Cookies --- 
     COOKIE_DOMAIN: str = "localhost"
     COOKIE_SECURE: bool = False 
@@ -27,6 +47,107 @@ class Settings(BaseSettings):
     COOKIE_HTTPONLY: bool = True 
     # --- CORS --- 
     CORS_ALLOWED_ORIGINS: str = "http://localhost:3000"
+    # --- Documents & RAG ---
+    DATA_DIR: str = "data"
+    UPLOAD_MAX_BYTES: int = 512 * 1024 * 1024
+    UPLOAD_READ_CHUNK_BYTES: int = 1024 * 1024
+    LOADER_BLOCK_BYTES: int = 1024 * 1024
+    PARSER_WORKERS: int = 2  # 0 = parse in the API process
+    PARSER_JOB_TIMEOUT_SECONDS: float = 120.0
+    PARSER_PDF_PAGES_PER_JOB: int = 16
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    SPLITTER_MODE: str = "content_defined"  # content_defined | recursive
+    SPLITTER_TOKENIZER: str = "char"  # char | regex | tiktoken
+    EMBEDDING_DIM: int = 384
+    EMBEDDING_BATCH_SIZE: int = 64
+    INGEST_QUEUE_SIZE: int = 8
+    EMBEDDING_MAX_BATCH: int = 256
+    EMBEDDING_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_MAX_QUEUE: int = 1024
+    EMBEDDING_MAX_CONCURRENT_BATCHES: int = 2
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 50000
+    EMBEDDING_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+    # --- Background jobs ---
+    JOB_STORE: str = "sqlite"  # sqlite | memory
+    JOB_CONCURRENCY: int = 4
+    JOB_PER_USER_CONCURRENCY: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: float = 2.0
+    JOB_RETRY_MAX_SECONDS: float = 60.0
+    JOB_LARGE_FILE_BYTES: int = 64 * 1024 * 1024
+    # --- Vector index ---
+    VECTOR_INDEX: str = "flat"  # flat | ivf
+    ANN_MIN_ROWS: int = 50000
+    IVF_NLIST: int = 0
+    IVF_NPROBE: int = 8
+    VECTOR_COMPRESSION: str = "none"  # none | int8 | pq
+    COMPRESSION_MIN_ROWS: int = 10000
+    PQ_SUBVECTORS: int = 48
+    RERANK_FACTOR: int = 8
+    LEXICAL_INDEX: bool = True
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    HYBRID_CANDIDATES: int = 50
+    RRF_K: int = 60
+    VECTOR_PARTITIONS_MAX_LOADED: int = 64
+    VECTOR_PARTITION_IDLE_SECONDS: float = 900.0
+    VECTOR_MEMTABLE_ROWS: int = 4096
+    VECTOR_SEGMENT_MAX_ROWS: int = 1_000_000
+    VECTOR_MERGE_FACTOR: int = 8
+    VECTOR_COMPACTION_DELETED_RATIO: float = 0.3
+    VECTOR_COMPACTION_INTERVAL_SECONDS: float = 10.0
+    # --- Chat ---
+    LLM_PROVIDER: str = "fake"  # fake | openai
+    LLM_BASE_URL: str = "https://api.openai.com/v1"
+    LLM_API_KEY: str = ""
+    LLM_MODEL: str = "gpt-4o-mini"
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_TOKENS: int = 512
+    FAKE_LLM_FIRST_TOKEN_DELAY_MS: float = 300.0
+    FAKE_LLM_TOKEN_DELAY_MS: float = 20.0
+    CHAT_TOP_K: int = 5
+    CHAT_HEARTBEAT_SECONDS: float = 15.0
+    CHAT_CACHE_MAX_ENTRIES: int = 10000
+    CHAT_CACHE_TTL_SECONDS: float = 3600.0
+    CHAT_CACHE_SIMILARITY: float = 0.95
+    CHAT_CONTEXT_TOKENS: int = 3000
+    CHAT_CONTEXT_TOKENIZER: str = "regex"  # char | regex | tiktoken
+    CHAT_CONTEXT_CANDIDATES: int = 20
+    CHAT_CONTEXT_DUPLICATE_SIMILARITY: float = 0.97
+    CHAT_CONTEXT_TOKEN_CACHE_ITEMS: int = 100000
+    CHAT_MMR_LAMBDA: float = 0.7
+    # --- Conversations ---
+    CONVERSATION_STORE: str = "memory"  # memory | local | supabase
+    CONVERSATION_MEMORY_MAX: int = 10000
+    CHAT_HISTORY_TOKENS: int = 2000
+    CHAT_HISTORY_SUMMARY_TOKENS: int = 400
+    # --- Observability ---
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""
+    PROFILING_ENABLED: bool = True
+    PROFILE_HEADER: str = "X-Profile"
+    PROFILE_KEEP: int = 20
+    # --- Admission control ---
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_QUEUE: int = 256
+    ADMISSION_AUTH_CONCURRENCY: int = 64
+    ADMISSION_AUTH_QUEUE_SLO_MS: float = 250.0
+    ADMISSION_CHAT_CONCURRENCY: int = 16
+    ADMISSION_CHAT_QUEUE_SLO_MS: float = 2000.0
+    ADMISSION_INGESTION_CONCURRENCY: int = 4
+    ADMISSION_INGESTION_QUEUE_SLO_MS: float = 5000.0
+    ADMISSION_TRUSTED_PROXIES: str = ""
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | sqlite
+    RATE_LIMIT_AUTH_PER_MINUTE: float = 600.0
+    RATE_LIMIT_AUTH_BURST: int = 60
+    RATE_LIMIT_CHAT_PER_MINUTE: float = 30.0
+    RATE_LIMIT_CHAT_BURST: int = 10
+    RATE_LIMIT_INGESTION_PER_MINUTE: float = 30.0
+    RATE_LIMIT_INGESTION_BURST: int = 10
+    # --- Startup ---
+    STARTUP_WARMUP: bool = True
+    STARTUP_PRELOAD_PARTITIONS: int = 4
 
     @property
     def is_production(self) -> bool:
@@ -40,6 +161,22 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ALLOWED_ORIGINS.split(",")]
     
+    @property
+    def documents_dir(self) -> str:
+        return os.path.join(self.DATA_DIR, "documents")
+
+    @property
+    def partitions_dir(self) -> str:
+        return os.path.join(self.DATA_DIR, "partitions")
+
+    @property
+    def admin_emails_list(self) -> List[str]:
+        return [email.strip().lower() for email in self.ADMIN_EMAILS.split(",") if email.strip()]
+
+    @property
+    def trusted_proxies_list(self) -> List[str]:
+        return [address.strip() for address in self.ADMISSION_TRUSTED_PROXIES.split(",") if address.strip()]
+
     @property
     def supabase_jwks_url(self) -> str:
         return f"{self.SUPABASE_URL}/auth/v1/keys"
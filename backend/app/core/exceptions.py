@@ -1,3 +1,5 @@
+import math
+
 from fastapi import HTTPException , status 
 
 class AuthException(HTTPException):
@@ -25,4 +27,34 @@ class SessionException(HTTPException):
         super().__init__(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=detail
-        )
\ No newline at end of file
+        )
+
+class DocumentException(HTTPException):
+    def __init__(
+        self,
+        detail: str = "Document processing failed",
+        status_code: int = status.HTTP_400_BAD_REQUEST,
+    ):
+        super().__init__(
+            status_code=status_code,
+            detail=detail
+        )
+
+class ConversationException(HTTPException):
+    def __init__(
+        self,
+        detail: str = "Conversation error",
+        status_code: int = status.HTTP_400_BAD_REQUEST,
+    ):
+        super().__init__(
+            status_code=status_code,
+            detail=detail
+        )
+
+class RateLimitException(HTTPException):
+    def __init__(self, detail: str = "Too many requests", retry_after: float = 1.0):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
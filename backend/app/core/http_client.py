@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    import httpx
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class UpstreamClient:
+    """
+    App-lifetime, connection-pooled HTTP client for upstream (Supabase) calls
+    """
+
+    def __init__(
+        self,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self._transport = transport
+        self._client: Optional["httpx.AsyncClient"] = None
+        self.timeouts = timeouts or {
+            "default": settings.HTTP_TIMEOUT_SECONDS,
+            "jwks": settings.HTTP_TIMEOUT_JWKS_SECONDS,
+            "token": settings.HTTP_TIMEOUT_TOKEN_SECONDS,
+            "logout": settings.HTTP_TIMEOUT_LOGOUT_SECONDS,
+            "llm": settings.LLM_TIMEOUT_SECONDS,
+        }
+        # --- Stats ---
+        self.in_flight = 0
+        self.requests_total = 0
+        self.retries_total = 0
+        self.errors_total = 0
+        self.endpoint_requests: Dict[str, int] = {}
+
+    def _build_client(self) -> "httpx.AsyncClient":
+        # --- httpx is imported when the pool opens, not with the app ---
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        options: Dict[str, Any] = {
+            "limits": limits,
+            "timeout": httpx.Timeout(self.timeouts["default"]),
+            "transport": self._transport,
+        }
+        if settings.HTTP2_ENABLED:
+            try:
+                return httpx.AsyncClient(http2=True, **options)
+            except ImportError:
+                logger.warning("HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1")
+        return httpx.AsyncClient(**options)
+
+    async def start(self) -> None:
+        """
+        Open the connection pool (called from the app lifespan)
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+
+    async def close(self) -> None:
+        """
+        Close the connection pool (called from the app lifespan)
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        # --- Lazily open the pool when used outside the app lifespan (scripts, workers) ---
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        # --- Full jitter: uniform(0, base * 2^attempt), capped ---
+        ceiling = min(
+            settings.HTTP_RETRY_BACKOFF_MAX_SECONDS,
+            settings.HTTP_RETRY_BACKOFF_SECONDS * (2 ** attempt),
+        )
+        return random.uniform(0, ceiling)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        endpoint: str = "default",
+        idempotent: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> "httpx.Response":
+        """
+        Send a request through the shared pool, retrying idempotent calls with jitter
+        """
+        import httpx
+
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retries = settings.HTTP_RETRY_ATTEMPTS if idempotent else 0
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, self.timeouts["default"]))
+
+        self.endpoint_requests[endpoint] = self.endpoint_requests.get(endpoint, 0) + 1
+        attempt = 0
+        while True:
+            self.requests_total += 1
+            self.in_flight += 1
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                self.errors_total += 1
+                if attempt >= retries:
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= retries:
+                    return response
+                await response.aclose()
+            finally:
+                self.in_flight -= 1
+
+            self.retries_total += 1
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        *,
+        endpoint: str = "default",
+        **kwargs: Any,
+    ) -> AsyncIterator["httpx.Response"]:
+        """
+        Streamed request through the shared pool (no retries). Leaving the
+        block closes the response, which aborts the upstream request.
+        """
+        import httpx
+
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, self.timeouts["default"]))
+        self.endpoint_requests[endpoint] = self.endpoint_requests.get(endpoint, 0) + 1
+        self.requests_total += 1
+        self.in_flight += 1
+        try:
+            async with self.client.stream(method.upper(), url, **kwargs) as response:
+                yield response
+        except httpx.TransportError:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def get(self, url: str, **kwargs: Any) -> "httpx.Response":
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> "httpx.Response":
+        return await self.request("POST", url, **kwargs)
+
+    def pool_stats(self) -> Dict[str, int]:
+        """
+        Best-effort connection pool usage read from the underlying transport
+        """
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "connections": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "in_flight": self.in_flight,
+            "requests": self.requests_total,
+            "retries": self.retries_total,
+            "errors": self.errors_total,
+            "endpoints": dict(self.endpoint_requests),
+            "pool": self.pool_stats(),
+        }
+
+
+def get_http_client() -> UpstreamClient:
+    """
+    Dependency returning the shared upstream client
+    """
+    return http_client
+
+
+# Singleton instance
+http_client = UpstreamClient()
@@ -0,0 +1,68 @@
+import importlib
+import sys
+from typing import Any, Callable, Optional
+
+
+def _split(path: str):
+    module, _, name = path.partition(":")
+    if not name:
+        raise ValueError(f"Expected 'package.module:name', got {path!r}")
+    return module, name
+
+
+class LazyObject:
+    """
+    Stand-in for a module-level object whose module is imported on first use.
+
+    `document_service = LazyObject("app.services.document_service:document_service")`
+    lets a router call `document_service.save_upload(...)` as before while
+    the service, and NumPy and the parsers behind it, load with the first
+    request that needs them instead of with the app.
+    """
+    __slots__ = ("_path", "_target")
+
+    def __init__(self, path: str):
+        _split(path)
+        self._path = path
+        self._target = None
+
+    def resolve(self) -> Any:
+        if self._target is None:
+            module, name = _split(self._path)
+            self._target = getattr(importlib.import_module(module), name)
+        return self._target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyObject {self._path} ({state})>"
+
+
+def lazy_dependency(path: str) -> Callable[[], Any]:
+    """
+    FastAPI dependency calling the provider at `path` (e.g. "app.services.job_scheduler:get_job_scheduler"),
+    imported on first call; keep the returned function to override it in tests
+    """
+    module, name = _split(path)
+    provider: Optional[Callable[[], Any]] = None
+
+    def dependency() -> Any:
+        nonlocal provider
+        if provider is None:
+            provider = getattr(importlib.import_module(module), name)
+        return provider()
+
+    dependency.__name__ = name
+    dependency.__qualname__ = name
+    return dependency
+
+
+def loaded(path: str) -> Optional[Any]:
+    """
+    The object at `path` if its module was already imported, else None (used on shutdown)
+    """
+    module, name = _split(path)
+    imported = sys.modules.get(module)
+    return getattr(imported, name, None) if imported is not None else None
@@ -0,0 +1,266 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUEST_DURATION = "http_request_duration_seconds"
+REQUESTS_IN_FLIGHT = "http_requests_in_flight"
+STAGE_DURATION = "app_stage_duration_seconds"
+
+_UNMATCHED = "unmatched"
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; `counts[i]` holds observations in (bounds[i-1], bounds[i]]
+    """
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Process-local histograms, counters and scrape-time gauges in Prometheus text format.
+
+    Label sets are tuples of (name, value) pairs. Hot paths keep the
+    handle returned by `histogram()` and call `observe` on it directly,
+    which takes well under a microsecond: updates are not locked, so
+    under the GIL an observation made concurrently from another thread can
+    very rarely be lost, an acceptable error for monitoring. Gauges are
+    callbacks evaluated at scrape time and cost nothing per request.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, text: str) -> None:
+        self._help[name] = (kind, text)
+
+    def histogram(self, name: str, labels: Labels = ()) -> Histogram:
+        series = self._histograms.get(name)
+        if series is None:
+            with self._lock:
+                series = self._histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = series.setdefault(labels, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        self.histogram(name, labels).observe(value)
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0.0) + amount
+
+    def gauge(self, name: str, text: str, collect: Callable[[], Dict[Labels, float]]) -> None:
+        self.describe(name, "gauge", text)
+        self._gauges[name] = collect
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            histograms = {name: {labels: (list(h.counts), h.sum) for labels, h in list(series.items())}
+                          for name, series in list(self._histograms.items())}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        for name, series in sorted(histograms.items()):
+            self._header(lines, name, "histogram")
+            for labels, (counts, total) in sorted(series.items()):
+                count = sum(counts)
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    lines.append(f"{name}_bucket{_format(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_format(labels)} {count}")
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, "counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format(labels)} {_number(value)}")
+        for name, collect in sorted(self._gauges.items()):
+            self._header(lines, name, "gauge")
+            for labels, value in sorted(collect().items()):
+                lines.append(f"{name}{_format(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str) -> None:
+        kind, text = self._help.get(name, (kind, ""))
+        if text:
+            lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def reset(self) -> None:
+        with self._lock:
+            for series in self._histograms.values():
+                for histogram in series.values():
+                    histogram.counts = [0] * len(histogram.counts)
+                    histogram.sum = 0.0
+            self._counters.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# --- Stage timings ---
+
+_stages: Dict[str, Histogram] = {}
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    histogram = _stages.get(stage)
+    if histogram is None:
+        histogram = _stages[stage] = metrics.histogram(STAGE_DURATION, (("stage", stage),))
+    histogram.observe(seconds)
+
+
+class span:
+    """
+    Time a block as one pipeline stage: `with span("retrieval"): ...`
+
+    Works in sync and async code alike; the duration lands in
+    app_stage_duration_seconds{stage=...} whether or not the block raises.
+    """
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        record_stage(self.stage, time.perf_counter() - self.started)
+
+
+# --- Requests ---
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route and requests in flight.
+
+    Latency goes to http_request_duration_seconds{method,route,status},
+    with `route` the matched path template (FastAPI stores the route in
+    the scope while routing) so ids in URLs do not multiply series; paths
+    that match no route share one label. Requests in flight are tracked by
+    scope and grouped by route only when scraped. A `profiler` may run
+    single requests under cProfile.
+    """
+
+    def __init__(self, app, registry: Optional["MetricsRegistry"] = None, profiler: Any = None):
+        self.app = app
+        self.registry = registry or metrics
+        self.profiler = profiler
+        self._active: Dict[int, dict] = {}
+        self._templates: Dict[int, str] = {}
+        self._series: Dict[Tuple[str, str, int], Histogram] = {}
+        self.registry.describe(REQUEST_DURATION, "histogram", "HTTP request latency by route")
+        self.registry.gauge(REQUESTS_IN_FLIGHT, "HTTP requests being handled, by route", self.in_flight)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        key = id(scope)
+        self._active[key] = scope
+        try:
+            if self.profiler is not None and self.profiler.requested(scope):
+                await self.profiler.run(self.app, scope, receive, send_status)
+            else:
+                await self.app(scope, receive, send_status)
+        finally:
+            del self._active[key]
+            series_key = (scope["method"], self._template(scope), status)
+            histogram = self._series.get(series_key)
+            if histogram is None:
+                labels = (("method", series_key[0]), ("route", series_key[1]), ("status", str(status)))
+                histogram = self._series[series_key] = self.registry.histogram(REQUEST_DURATION, labels)
+            histogram.observe(time.perf_counter() - started)
+
+    def _template(self, scope) -> str:
+        route = scope.get("route")
+        if route is None:
+            return _UNMATCHED
+        # --- Routes live as long as the app, so their ids are stable keys ---
+        template = self._templates.get(id(route))
+        if template is None:
+            template = self._templates[id(route)] = _full_template(scope["path"], route)
+        return template
+
+    def in_flight(self) -> Dict[Labels, float]:
+        routes = Counter(self._template(scope) for scope in list(self._active.values()))
+        return {(("route", route),): float(count) for route, count in routes.items()}
+
+
+def _full_template(path: str, route: Any) -> str:
+    """
+    Path template of `route` including router prefixes, from a path it matched.
+
+    Routes of included routers may hold a template relative to their
+    prefix; the prefix is the part of the path their own pattern leaves.
+    Worked out once per route.
+    """
+    relative = getattr(route, "path", None)
+    if relative is None:
+        return _UNMATCHED
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return relative
+    for cut in range(1, len(path)):
+        if path[cut] == "/" and regex.match(path[cut:]):
+            return path[:cut] + relative
+    return relative
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+metrics.describe(STAGE_DURATION, "histogram", "Time spent per request stage (auth, embedding, retrieval, ...)")
+
+
+def get_metrics() -> MetricsRegistry:
+    return metrics
@@ -0,0 +1,123 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_REPORT_LINES = 60
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile capture of a single request, for admins.
+
+    A request carrying `header` whose user (checked with get_current_user)
+    is an admin runs under cProfile. The report is kept in memory (the
+    last `keep`) and its id is returned in the X-Profile-Id response
+    header; fetch it from /system/profiles/{id}. Anyone else's header is
+    ignored. cProfile sees the whole event loop thread, so work of other
+    requests running meanwhile shows up too, and only one capture runs at
+    a time; profile on a quiet instance.
+    """
+
+    def __init__(
+        self,
+        header: str = settings.PROFILE_HEADER,
+        keep: int = settings.PROFILE_KEEP,
+        enabled: bool = settings.PROFILING_ENABLED,
+    ):
+        self.header = header.lower().encode("latin-1")
+        self.keep = keep
+        self.enabled = enabled
+        self._reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._busy = asyncio.Lock()
+        self.captures = 0
+        self.refused = 0
+
+    def requested(self, scope) -> bool:
+        if not self.enabled:
+            return False
+        for name, _ in scope["headers"]:
+            if name == self.header:
+                return True
+        return False
+
+    async def _authorized(self, scope) -> bool:
+        from starlette.requests import Request
+
+        from app.security.deps import get_current_user, get_token_from_request, is_admin
+
+        request = Request(scope)
+        try:
+            user = await get_current_user(request, await get_token_from_request(request))
+        except Exception:
+            return False
+        return is_admin(user)
+
+    async def run(self, app, scope, receive, send) -> None:
+        """
+        Serve the request, under cProfile when allowed
+        """
+        if self._busy.locked() or not await self._authorized(scope):
+            self.refused += 1
+            await app(scope, receive, send)
+            return
+
+        async with self._busy:
+            profile_id = uuid.uuid4().hex
+
+            async def send_with_id(message) -> None:
+                if message["type"] == "http.response.start":
+                    message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+                await send(message)
+
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                await app(scope, receive, send_with_id)
+            finally:
+                profiler.disable()
+                self._store(profile_id, scope, profiler, time.perf_counter() - started)
+
+    def _store(self, profile_id: str, scope, profiler: cProfile.Profile, seconds: float) -> None:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(_REPORT_LINES)
+        route = scope.get("route")
+        self._reports[profile_id] = {
+            "id": profile_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "seconds": round(seconds, 6),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "report": out.getvalue(),
+        }
+        self.captures += 1
+        while len(self._reports) > self.keep:
+            self._reports.popitem(last=False)
+        logger.info("Profiled %s %s in %.1f ms (profile %s)", scope["method"], scope["path"], 1000 * seconds, profile_id)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return self._reports.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [{k: v for k, v in report.items() if k != "report"} for report in reversed(self._reports.values())]
+
+
+def get_profiler() -> RequestProfiler:
+    return profiler
+
+
+# Singleton instance
+profiler = RequestProfiler()
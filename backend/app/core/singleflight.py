@@ -0,0 +1,163 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.cache import LRUCache
+
+
+class SingleFlightError(Exception):
+    """
+    The call for a key was led by another worker and failed or gave no result in time
+    """
+
+
+@dataclass(frozen=True)
+class _Failure:
+    """
+    Stored in place of a result when the leader's call raised, so waiters elsewhere stop waiting
+    """
+    error: str
+
+
+class ResultBackend(ABC):
+    """
+    Storage for single-flight results and leader locks.
+
+    The in-memory backend only coalesces within one process; a shared
+    implementation (e.g. Redis with SET NX PX) lets uvicorn workers share
+    one upstream call per key.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """Return a recent result for `key`, if any"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """Keep `value` for `ttl` seconds so late arrivals can reuse it"""
+
+    @abstractmethod
+    async def acquire(self, key: str, ttl: float) -> bool:
+        """Try to become the leader for `key`; the lock expires after `ttl`"""
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        """Release the leader lock for `key`"""
+
+
+class InMemoryResultBackend(ResultBackend):
+    def __init__(self, max_size: int = 10000):
+        self._results: LRUCache[Any] = LRUCache(max_size)
+        self._locks: Dict[str, float] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._results.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._results.set(key, value, expires_at=time.time() + ttl)
+
+    async def acquire(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        if self._locks.get(key, 0.0) > now:
+            return False
+        self._locks[key] = now + ttl
+        return True
+
+    async def release(self, key: str) -> None:
+        self._locks.pop(key, None)
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time and share its result with every
+    concurrent caller, keeping it for `result_ttl` seconds afterwards.
+
+    A caller never makes a second call for a key that another worker is
+    leading: if that call fails, or no result arrives within `wait_timeout`,
+    it raises SingleFlightError instead.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[ResultBackend] = None,
+        result_ttl: float = 5.0,
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.05,
+    ):
+        self.backend = backend or InMemoryResultBackend()
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # --- Stats ---
+        self.calls = 0
+        self.coalesced = 0
+        self.result_hits = 0
+        self.failures_shared = 0
+        self.wait_timeouts = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        cached = await self.backend.get(key)
+        # --- A recorded failure is only for waiters; a new caller makes a fresh call ---
+        if cached is not None and not isinstance(cached, _Failure):
+            self.result_hits += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._lead(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # --- Shield so one cancelled caller does not cancel the shared call ---
+        return await asyncio.shield(task)
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        acquired = await self.backend.acquire(key, self.wait_timeout)
+        if not acquired:
+            # --- Another worker is leading: wait for its outcome rather than call again ---
+            result = await self._wait_for_result(key)
+            if isinstance(result, _Failure):
+                self.failures_shared += 1
+                raise SingleFlightError(result.error)
+            if result is None:
+                self.wait_timeouts += 1
+                raise SingleFlightError(f"No result from the leading call within {self.wait_timeout:g} s")
+            self.result_hits += 1
+            return result
+
+        try:
+            self.calls += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+                await self.backend.set(key, _Failure(str(detail)), self.result_ttl)
+                raise
+            await self.backend.set(key, result, self.result_ttl)
+            return result
+        finally:
+            await self.backend.release(key)
+
+    async def _wait_for_result(self, key: str) -> Optional[Any]:
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            result = await self.backend.get(key)
+            if result is not None:
+                return result
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+            "result_hits": self.result_hits,
+            "failures_shared": self.failures_shared,
+            "wait_timeouts": self.wait_timeouts,
+        }
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+HEARTBEAT = ": ping\n\n"
+
+
+def format_event(event: str, data: Any) -> str:
+    """
+    Encode one Server-Sent Events frame with a JSON payload
+    """
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def with_heartbeat(
+    source: AsyncIterator[str],
+    interval: float,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+) -> AsyncIterator[str]:
+    """
+    Relay `source`, emitting a comment frame whenever it is idle for
+    `interval` seconds and stopping as soon as the client goes away.
+
+    Closing this iterator (or a detected disconnect) cancels the pending
+    read and closes `source`, so work upstream stops with it.
+    """
+    pending: Optional[asyncio.Future] = None
+    last_check = time.monotonic()
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(source.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+
+            # --- Poll for disconnects at most once per interval, busy or idle ---
+            if is_disconnected is not None and time.monotonic() - last_check >= interval:
+                last_check = time.monotonic()
+                if await is_disconnected():
+                    return
+
+            if not done:
+                yield HEARTBEAT
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                return
+            pending = None
+            yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await source.aclose()
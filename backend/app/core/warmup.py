@@ -0,0 +1,139 @@
+import asyncio
+import importlib
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# --- Imported during warm-up instead of with the app; routers load them on demand too ---
+SERVICE_MODULES = (
+    "app.services.auth_service",
+    "app.services.document_service",
+    "app.services.chat_service",
+    "app.services.conversation_service",
+)
+
+
+class Warmup:
+    """
+    Start-up work of a worker, run in the background once it is serving.
+
+    Importing the app only registers routes; services, NumPy and the
+    parsers load on first use. Warm-up loads them ahead of traffic, then
+    does what start-up needs (split a pre-partitioning index, requeue
+    interrupted jobs) and, with `preload`, opens the upstream pool, fetches
+    and parses the JWKS and maps the most recently written indexes. Steps
+    run in order; a failed step is logged and the rest still run. Until
+    `ready`, /system/ready answers 503 while health checks already pass.
+    """
+
+    def __init__(self, preload_partitions: int = settings.STARTUP_PRELOAD_PARTITIONS):
+        self.preload_partitions = preload_partitions
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.seconds is not None
+
+    def migration_pending(self) -> bool:
+        """
+        Whether an index from before per-owner partitioning still has to be split (must finish before serving)
+        """
+        return os.path.exists(os.path.join(settings.DATA_DIR, "index", "meta.json"))
+
+    def start(self, preload: bool = True) -> asyncio.Task:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(preload))
+        return self._task
+
+    async def run(self, preload: bool = True) -> None:
+        self.started_at = time.perf_counter()
+        await self._step("services", self._import_services)
+        await self._step("index_migration", self._migrate_index)
+        await self._step("jobs", self._start_jobs)
+        if preload:
+            # --- Optional: the first request that needs them loads them otherwise ---
+            await self._step("upstream_pool", self._open_upstream_pool, required=False)
+            await self._step("jwks", self._preload_keys, required=False)
+            await self._step("partitions", self._preload_partitions, required=False)
+        self.seconds = time.perf_counter() - self.started_at
+        logger.info("Warm-up finished in %.0f ms", 1000 * self.seconds)
+
+    async def _step(self, name: str, step: Callable[[], Awaitable[Any]], required: bool = True) -> None:
+        started = time.perf_counter()
+        self.steps[name] = {"status": "running"}
+        try:
+            result = await step()
+        except asyncio.CancelledError:
+            self.steps[name] = {"status": "cancelled"}
+            raise
+        except Exception as e:
+            self.steps[name] = {"status": "failed", "error": str(e), "ms": round(1000 * (time.perf_counter() - started), 1)}
+            if required:
+                logger.exception("Warm-up step %s failed", name)
+            else:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+            return
+        self.steps[name] = {"status": "done", "ms": round(1000 * (time.perf_counter() - started), 1)}
+        if result is not None:
+            self.steps[name]["result"] = result
+
+    # --- Steps ---
+
+    async def _import_services(self) -> None:
+        # --- In a thread, so the event loop keeps answering while modules execute ---
+        for module in SERVICE_MODULES:
+            await asyncio.to_thread(importlib.import_module, module)
+
+    async def _migrate_index(self) -> int:
+        from app.services.document_service import document_service
+
+        return await asyncio.to_thread(document_service.migrate_global_index)
+
+    async def _start_jobs(self) -> None:
+        from app.services.job_scheduler import job_scheduler
+
+        await job_scheduler.start()
+
+    async def _open_upstream_pool(self) -> None:
+        from app.core.http_client import http_client
+
+        await http_client.start()
+
+    async def _preload_keys(self) -> int:
+        from app.security.jwks import jwks_verifier
+
+        return await jwks_verifier.preload()
+
+    async def _preload_partitions(self) -> int:
+        from app.rag.vector_store import get_partitioned_store
+
+        return await asyncio.to_thread(get_partitioned_store().preload, self.preload_partitions)
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "steps": self.steps,
+        }
+
+
+def get_warmup() -> Warmup:
+    return warmup
+
+
+# Singleton instance
+warmup = Warmup()
@@ -0,0 +1,29 @@
+-- Conversation history for the chat endpoint (CONVERSATION_STORE=supabase).
+-- The API writes with the service key; clients never query these tables.
+-- Plain enough that the local SQLite stand-in runs it unchanged.
+
+create table if not exists chat_conversations (
+    id text primary key,
+    owner_id text not null,
+    title text,
+    message_count integer not null default 0,
+    summary text not null default '',
+    summary_tokens integer not null default 0,
+    summarized_through integer not null default 0,
+    recent_tokens integer not null default 0,
+    created_at timestamptz not null,
+    updated_at timestamptz
+);
+
+create index if not exists chat_conversations_owner on chat_conversations (owner_id, updated_at desc);
+
+-- Append-only log; a prompt reads the rows after summarized_through by primary key
+create table if not exists chat_messages (
+    conversation_id text not null references chat_conversations (id) on delete cascade,
+    seq integer not null,
+    role text not null,
+    content text not null,
+    tokens integer not null,
+    created_at timestamptz not null,
+    primary key (conversation_id, seq)
+);
@@ -0,0 +1,171 @@
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+Row = Dict[str, Any]
+
+
+@dataclass
+class TableResponse:
+    data: List[Row]
+
+
+class LocalTableClient:
+    """
+    The slice of the supabase-py table API the app uses, over SQLite.
+
+    Lets Postgres-backed stores run without a Supabase project, for local
+    development and benchmarks:
+    `client.table("t").select("*").eq("id", x).order("seq").execute().data`.
+    `schema` (SQL) is run when the database is first opened.
+    """
+
+    def __init__(self, path: str, schema: str = ""):
+        self.path = path
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            if self.schema:
+                db.executescript(self.schema)
+            db.commit()
+            self._db = db
+        return self._db
+
+    def table(self, name: str) -> "TableQuery":
+        return TableQuery(self, _identifier(name))
+
+    def run(self, sql: str, params: Sequence[Any]) -> List[Row]:
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, params).fetchall()
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class TableQuery:
+    """
+    One PostgREST-style request: an action, filters, ordering and a limit
+    """
+
+    def __init__(self, client: LocalTableClient, table: str):
+        self._client = client
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._rows: List[Row] = []
+        self._values: Row = {}
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+
+    def select(self, columns: str = "*") -> "TableQuery":
+        self._action = "select"
+        self._columns = "*" if columns.strip() == "*" else ", ".join(_identifier(c.strip()) for c in columns.split(","))
+        return self
+
+    def insert(self, rows: Union[Row, List[Row]]) -> "TableQuery":
+        self._action = "insert"
+        self._rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values: Row) -> "TableQuery":
+        self._action = "update"
+        self._values = values
+        return self
+
+    def delete(self) -> "TableQuery":
+        self._action = "delete"
+        return self
+
+    def _filter(self, column: str, operator: str, value: Any) -> "TableQuery":
+        self._filters.append((_identifier(column), operator, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "TableQuery":
+        return self._filter(column, "=", value)
+
+    def gt(self, column: str, value: Any) -> "TableQuery":
+        return self._filter(column, ">", value)
+
+    def gte(self, column: str, value: Any) -> "TableQuery":
+        return self._filter(column, ">=", value)
+
+    def lt(self, column: str, value: Any) -> "TableQuery":
+        return self._filter(column, "<", value)
+
+    def lte(self, column: str, value: Any) -> "TableQuery":
+        return self._filter(column, "<=", value)
+
+    def order(self, column: str, desc: bool = False) -> "TableQuery":
+        self._order.append(f"{_identifier(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int) -> "TableQuery":
+        self._limit = size
+        return self
+
+    def execute(self) -> TableResponse:
+        if self._action == "insert":
+            if not self._rows:
+                return TableResponse(data=[])
+            columns = [_identifier(c) for c in self._rows[0]]
+            placeholders = ", ".join("?" * len(columns))
+            sql = (
+                f"INSERT INTO {self._table} ({', '.join(columns)}) VALUES "
+                f"{', '.join(f'({placeholders})' for _ in self._rows)} RETURNING *"
+            )
+            params = [row[c] for row in self._rows for c in columns]
+            return TableResponse(data=self._client.run(sql, params))
+
+        where, params = self._where()
+        if self._action == "update":
+            assignments = ", ".join(f"{_identifier(c)} = ?" for c in self._values)
+            sql = f"UPDATE {self._table} SET {assignments}{where} RETURNING *"
+            return TableResponse(data=self._client.run(sql, [*self._values.values(), *params]))
+        if self._action == "delete":
+            return TableResponse(data=self._client.run(f"DELETE FROM {self._table}{where} RETURNING *", params))
+
+        sql = f"SELECT {self._columns} FROM {self._table}{where}"
+        if self._order:
+            sql += f" ORDER BY {', '.join(self._order)}"
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        return TableResponse(data=self._client.run(sql, params))
+
+    def _where(self) -> Tuple[str, List[Any]]:
+        if not self._filters:
+            return "", []
+        clauses = [f"{column} {operator} ?" for column, operator, _ in self._filters]
+        return f" WHERE {' AND '.join(clauses)}", [value for _, _, value in self._filters]
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
@@ -1,25 +1,33 @@
-from supabase import create_client , Client 
+from typing import TYPE_CHECKING
 from app.core.config import get_settings
 from functools import lru_cache
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 settings = get_settings()
 
 @lru_cache
-def get_supabase_client() -> Client:
+def get_supabase_client() -> "Client":
     """
         Get Cached Supabase Client Instance 
     """
+    # --- supabase-py takes ~0.5 s to import; only pay for it when a client is needed ---
+    from supabase import create_client
+
     return create_client(
-        settings.supabase_url,
-        settings.supabase_anon_key
+        settings.SUPABASE_URL,
+        settings.SUPABASE_ANON_KEY
     )
 
 @lru_cache
-def get_supabase_service_client() -> Client:
+def get_supabase_service_client() -> "Client":
     """
         Get Admin Client With service key for server-side operations
     """
+    from supabase import create_client
+
     return create_client(
-        settings.supabase_url,
-        settings.supabase_service_key
+        settings.SUPABASE_URL,
+        settings.SUPABASE_SERVICE_KEY
     )
\ No newline at end of file
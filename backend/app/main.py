@@ -1,16 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
+from app.core.http_client import http_client
+from app.core.lazy import loaded
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import profiler
+from app.core.warmup import warmup
 from app.api.v1.router import api_router
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start warm-up on startup and release what was loaded on shutdown.
+
+    Services and the RAG stack are imported on first use, so the worker
+    serves (health checks first) right away while warm-up loads them in
+    the background; with STARTUP_WARMUP off, or when an old index must be
+    migrated first, the required steps run before serving.
+    """
+    if settings.STARTUP_WARMUP and not warmup.migration_pending():
+        warmup.start()
+    else:
+        await warmup.run(preload=settings.STARTUP_WARMUP)
+    yield
+    await warmup.close()
+    # --- Only close what this worker actually imported ---
+    job_scheduler = loaded("app.services.job_scheduler:job_scheduler")
+    if job_scheduler is not None:
+        await job_scheduler.close()
+    conversation_service = loaded("app.services.conversation_service:conversation_service")
+    if conversation_service is not None:
+        await conversation_service.close()
+    stores = loaded("app.rag.vector_store:_partitioned_store")
+    if stores is not None:
+        await asyncio.to_thread(stores.close)
+    embedder = loaded("app.rag.batcher:embedder")
+    if embedder is not None:
+        await embedder.close()
+    embedding_cache = loaded("app.rag.embedding_cache:embedding_cache")
+    if embedding_cache is not None:
+        await embedding_cache.close()
+    parser_pool = loaded("app.rag.parser_pool:parser_pool")
+    if parser_pool is not None:
+        parser_pool.close()
+    admission_controller = loaded("app.security.admission:admission_controller")
+    if admission_controller is not None:
+        admission_controller.close()
+    await http_client.close()
+
 app = FastAPI(
     title=settings.APP_NAME,
     description="Backend for the RAG ChatBot application.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- Middleware Configuration ---
@@ -30,6 +78,9 @@ if settings.CORS_ALLOWED_ORIGINS:
         allow_headers=["*"],
     )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, profiler=profiler)
+
 # --- API Router ---
 app.include_router(api_router, prefix="/api")
 
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.rag.embeddings import Embedder, HashingEmbedder
+
+settings = get_settings()
+
+
+@dataclass
+class _Request:
+    texts: Sequence[str]
+    future: asyncio.Future
+    enqueued: float
+
+
+class BatchingEmbedder(Embedder):
+    """
+    Micro-batching front for any embedder.
+
+    Concurrent `embed` calls (queries, ingestion jobs) are queued and merged
+    into one backend call once `max_batch_size` texts are waiting or the
+    oldest request has waited `max_wait_ms`. Each caller gets its own rows
+    back through a future. The queue is bounded, so a saturated backend
+    pushes back on callers instead of buffering without limit.
+    """
+
+    def __init__(
+        self,
+        backend: Embedder,
+        max_batch_size: int = settings.EMBEDDING_MAX_BATCH,
+        max_wait_ms: float = settings.EMBEDDING_MAX_WAIT_MS,
+        max_queue_size: int = settings.EMBEDDING_MAX_QUEUE,
+        max_concurrent_batches: int = settings.EMBEDDING_MAX_CONCURRENT_BATCHES,
+    ):
+        self.backend = backend
+        self.model_id = backend.model_id
+        self.dimension = backend.dimension
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+        # --- Stats ---
+        self.requests_total = 0
+        self.texts_total = 0
+        self.batches_total = 0
+        self.flushes_full = 0
+        self.flushes_deadline = 0
+        self.errors_total = 0
+        self.max_batch_seen = 0
+        self.wait_seconds_total = 0.0
+
+    def _ensure_worker(self) -> None:
+        # --- Queues and tasks are bound to the running loop; rebuild after a loop change ---
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(self.max_queue_size)
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = None
+            self._flushes = set()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if len(texts) == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if len(texts) > self.max_batch_size:
+            parts = [
+                self.embed(texts[begin:begin + self.max_batch_size])
+                for begin in range(0, len(texts), self.max_batch_size)
+            ]
+            return np.concatenate(await asyncio.gather(*parts))
+
+        self._ensure_worker()
+        request = _Request(texts, self._loop.create_future(), time.perf_counter())
+        await self._queue.put(request)
+        self.requests_total += 1
+        return await request.future
+
+    async def _run(self) -> None:
+        pending: Optional[_Request] = None
+        while True:
+            first = pending or await self._queue.get()
+            pending = None
+            batch: List[_Request] = [first]
+            size = len(first.texts)
+            deadline = first.enqueued + self.max_wait
+
+            while size < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(
+                        self._queue.get(), timeout
+                    )
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if size + len(request.texts) > self.max_batch_size:
+                    pending = request
+                    break
+                batch.append(request)
+                size += len(request.texts)
+
+            if size >= self.max_batch_size or pending is not None:
+                self.flushes_full += 1
+            else:
+                self.flushes_deadline += 1
+
+            # --- Bound concurrent backend calls; waiting here lets the next batch fill up ---
+            await self._slots.acquire()
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[_Request]) -> None:
+        try:
+            live = [request for request in batch if not request.future.done()]
+            if not live:
+                return
+            now = time.perf_counter()
+            texts = [text for request in live for text in request.texts]
+            self.batches_total += 1
+            self.texts_total += len(texts)
+            self.max_batch_seen = max(self.max_batch_seen, len(texts))
+            self.wait_seconds_total += sum(now - request.enqueued for request in live)
+            try:
+                vectors = await self.backend.embed(texts)
+            except Exception as exc:
+                self.errors_total += 1
+                for request in live:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+                return
+            offset = 0
+            for request in live:
+                count = len(request.texts)
+                if not request.future.done():
+                    request.future.set_result(vectors[offset:offset + count])
+                offset += count
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        """
+        Stop the worker and wait for in-flight batches (called from the app lifespan)
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.model_id,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "in_flight_batches": len(self._flushes),
+            "requests": self.requests_total,
+            "texts": self.texts_total,
+            "batches": self.batches_total,
+            "flushes_full": self.flushes_full,
+            "flushes_deadline": self.flushes_deadline,
+            "errors": self.errors_total,
+            "max_batch_seen": self.max_batch_seen,
+            "avg_batch_size": round(self.texts_total / self.batches_total, 2) if self.batches_total else 0.0,
+            "avg_wait_ms": round(1000.0 * self.wait_seconds_total / self.requests_total, 3)
+            if self.requests_total
+            else 0.0,
+        }
+
+
+def get_batching_embedder() -> BatchingEmbedder:
+    """
+    Dependency returning the shared micro-batched embedder
+    """
+    return embedder
+
+
+# Singleton instance
+embedder = BatchingEmbedder(HashingEmbedder())
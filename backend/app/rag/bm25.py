@@ -0,0 +1,375 @@
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# --- Identifiers such as "err-4012", "sku_88.1" or "v2/api" stay whole ---
+_TOKEN_RE = re.compile(r"[0-9a-z]+(?:[-_./:#][0-9a-z]+)*")
+_PART_RE = re.compile(r"[-_./:#]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word and identifier tokens; compound identifiers also yield their parts
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in _PART_RE.split(token) if part)
+    return tokens
+
+
+@dataclass
+class CollectionStats:
+    """
+    Corpus-wide statistics for scoring one index as part of a larger collection (e.g. one segment of many)
+    """
+    count: int
+    average_length: float
+    document_frequencies: Dict[str, int]
+
+
+class BM25Index:
+    """
+    Append-only inverted index over vector-store rows with BM25 scoring.
+
+    Every term has an array-backed postings list of (row, term frequency),
+    kept sorted by row because rows are only ever appended. Deleted rows are
+    filtered with the caller's row mask and leave the document frequencies
+    approximate until the index is rebuilt.
+
+    Queries use MaxScore pruning: terms are processed from the highest score
+    upper bound down, and once the bounds of the remaining terms cannot lift
+    an unseen row into the top k, those terms are only probed (binary search)
+    for the surviving candidates instead of being scanned.
+
+    Reads are safe while rows are being appended if the reader passes the
+    row count it saw as `limit`: postings at or past it are cut off, and a
+    term only becomes visible once its postings exist.
+    """
+
+    def __init__(self, k1: float = settings.BM25_K1, b: float = settings.BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.size = 0
+        self.live_count = 0
+        self.total_length = 0
+        self._terms: Dict[str, int] = {}
+        self._rows: List[np.ndarray] = []
+        self._tfs: List[np.ndarray] = []
+        self._sizes = np.zeros(0, dtype=np.int64)
+        self._max_tf = np.zeros(0, dtype=np.float32)
+        self._lengths = np.zeros(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / self.live_count if self.live_count else 1.0
+
+    # --- Writes ---
+
+    def add(self, rows: Sequence[int], texts: Sequence[str]) -> None:
+        """
+        Index texts for rows appended to the vector store (rows must be increasing)
+        """
+        if not len(rows):
+            return
+        term_ids: List[int] = []
+        posting_rows: List[int] = []
+        frequencies: List[int] = []
+        lengths = np.zeros(len(rows), dtype=np.int32)
+        for position, (row, text) in enumerate(zip(rows, texts)):
+            tokens = tokenize(text)
+            lengths[position] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    term_id = self._new_term(term)
+                term_ids.append(term_id)
+                posting_rows.append(int(row))
+                frequencies.append(count)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        needed = int(rows.max()) + 1
+        if needed > len(self._lengths):
+            grown = np.zeros(max(needed, 2 * len(self._lengths)), dtype=np.int32)
+            grown[: len(self._lengths)] = self._lengths
+            self._lengths = grown
+        self._lengths[rows] = lengths
+        self.size = max(self.size, needed)
+        self.live_count += len(rows)
+        self.total_length += int(lengths.sum())
+
+        # --- Group by term so each postings list is extended once per batch ---
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        terms, starts = np.unique(term_ids[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        posting_rows = np.asarray(posting_rows, dtype=np.int32)[order]
+        frequencies = np.asarray(frequencies, dtype=np.uint16)[order]
+        for term_id, begin, end in zip(terms, bounds[:-1], bounds[1:]):
+            self._append(int(term_id), posting_rows[begin:end], frequencies[begin:end])
+
+    def _new_term(self, term: str) -> int:
+        term_id = len(self._rows)
+        self._rows.append(np.zeros(0, dtype=np.int32))
+        self._tfs.append(np.zeros(0, dtype=np.uint16))
+        if term_id >= len(self._sizes):
+            capacity = max(1024, 2 * len(self._sizes))
+            self._sizes = np.concatenate([self._sizes, np.zeros(capacity - len(self._sizes), dtype=np.int64)])
+            self._max_tf = np.concatenate([self._max_tf, np.zeros(capacity - len(self._max_tf), dtype=np.float32)])
+        # --- Published last, so a concurrent reader never sees a term without its postings ---
+        self._terms[term] = term_id
+        return term_id
+
+    def _append(self, term_id: int, rows: np.ndarray, tfs: np.ndarray) -> None:
+        size = self._sizes[term_id]
+        needed = size + len(rows)
+        buffer_rows, buffer_tfs = self._rows[term_id], self._tfs[term_id]
+        if needed > len(buffer_rows) or not buffer_rows.flags.writeable:
+            capacity = max(needed, 2 * len(buffer_rows), 4)
+            grown_rows = np.empty(capacity, dtype=np.int32)
+            grown_tfs = np.empty(capacity, dtype=np.uint16)
+            grown_rows[:size] = buffer_rows[:size]
+            grown_tfs[:size] = buffer_tfs[:size]
+            buffer_rows = self._rows[term_id] = grown_rows
+            buffer_tfs = self._tfs[term_id] = grown_tfs
+        buffer_rows[size:needed] = rows
+        buffer_tfs[size:needed] = tfs
+        self._sizes[term_id] = needed
+        self._max_tf[term_id] = max(float(self._max_tf[term_id]), float(tfs.max()))
+
+    # --- Reads ---
+
+    def _postings(self, term_id: int, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        size = self._sizes[term_id]
+        rows, tfs = self._rows[term_id][:size], self._tfs[term_id][:size]
+        if limit is not None and limit < self.size:
+            size = int(np.searchsorted(rows, limit))
+            rows, tfs = rows[:size], tfs[:size]
+        return rows, tfs
+
+    def document_frequency(self, term: str, limit: Optional[int] = None) -> int:
+        term_id = self._terms.get(term)
+        if term_id is None:
+            return 0
+        if limit is None:
+            return int(self._sizes[term_id])
+        return len(self._postings(term_id, limit)[0])
+
+    def lengths(self) -> np.ndarray:
+        """
+        Token count of every indexed row
+        """
+        return self._lengths[: self.size]
+
+    def _idf(self, document_frequency: int, count: Optional[int] = None) -> float:
+        total = max(self.live_count if count is None else count, document_frequency)
+        return float(np.log1p((total - document_frequency + 0.5) / (document_frequency + 0.5)))
+
+    def _term_scores(
+        self,
+        term_id: int,
+        idf: float,
+        rows: np.ndarray,
+        tfs: np.ndarray,
+        average_length: Optional[float] = None,
+    ) -> np.ndarray:
+        tfs = tfs.astype(np.float32)
+        average_length = average_length or self.average_length
+        norm = self.k1 * (1.0 - self.b + self.b * self._lengths[rows] / average_length)
+        return idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        prune: bool = True,
+        limit: Optional[int] = None,
+        collection: Optional[CollectionStats] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows by BM25 as (scores, rows), best first; `mask` marks eligible
+        rows. `prune=False` scores every posting (for comparison). Only rows
+        below `limit` are considered; with `collection`, idf and length
+        normalization use its statistics instead of this index's own.
+        """
+        count = collection.count if collection is not None else None
+        average_length = collection.average_length if collection is not None else None
+        terms = []
+        for term in set(tokenize(query)):
+            term_id = self._terms.get(term)
+            if term_id is None:
+                continue
+            frequency = len(self._postings(term_id, limit)[0])
+            if frequency:
+                if collection is not None:
+                    frequency = collection.document_frequencies.get(term, frequency)
+                idf = self._idf(frequency, count)
+                # --- Upper bound: highest tf at the shortest possible length ---
+                max_tf = float(self._max_tf[term_id])
+                bound = idf * max_tf * (self.k1 + 1.0) / (max_tf + self.k1 * (1.0 - self.b))
+                terms.append((bound, term_id, idf))
+        if not terms:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        terms.sort(reverse=True)
+        remaining = np.cumsum([bound for bound, _, _ in terms][::-1])[::-1]
+
+        candidates = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float32)
+        threshold = 0.0
+        for position, (bound, term_id, idf) in enumerate(terms):
+            postings, tfs = self._postings(term_id, limit)
+            size = len(postings)
+            rest = remaining[position + 1] if position + 1 < len(terms) else 0.0
+            if prune and len(candidates) >= k and remaining[position] < threshold:
+                # --- No unseen row can reach the top k: probe candidates only ---
+                found = np.searchsorted(postings, candidates)
+                hit = found < size
+                hit[hit] = postings[found[hit]] == candidates[hit]
+                scores[hit] += self._term_scores(term_id, idf, candidates[hit], tfs[found[hit]], average_length)
+            else:
+                if mask is not None:
+                    keep = mask[postings]
+                    postings, tfs = postings[keep], tfs[keep]
+                term_scores = self._term_scores(term_id, idf, postings, tfs, average_length)
+                merged = np.concatenate([candidates, postings.astype(np.int64)])
+                candidates, inverse = np.unique(merged, return_inverse=True)
+                scores = np.bincount(
+                    inverse,
+                    weights=np.concatenate([scores, term_scores]),
+                    minlength=len(candidates),
+                ).astype(np.float32)
+
+            if prune and len(candidates) > k:
+                threshold = float(np.partition(scores, -k)[-k])
+                # --- Drop rows that cannot reach the current k-th score ---
+                alive = scores + rest >= threshold
+                candidates, scores = candidates[alive], scores[alive]
+
+        order = np.argsort(-scores, kind="stable")[:k]
+        return scores[order], candidates[order]
+
+    @classmethod
+    def merge(cls, sources: Sequence[Tuple["BM25Index", np.ndarray]]) -> "BM25Index":
+        """
+        Combine indexes into one, e.g. when segments are compacted. Each source
+        comes with the sorted rows to keep; they are renumbered in order, after
+        the kept rows of the sources before it. Postings are concatenated and
+        sorted as arrays, so no text is tokenized again.
+        """
+        first = sources[0][0] if sources else cls()
+        index = cls(k1=first.k1, b=first.b)
+        terms, rows, tfs, lengths = [], [], [], []
+        offset = 0
+        for source, keep in sources:
+            keep = np.asarray(keep, dtype=np.int64)
+            count = len(source._terms)
+            sizes = source._sizes[:count]
+            renumbered = np.full(source.size, -1, dtype=np.int64)
+            renumbered[keep] = offset + np.arange(len(keep))
+            ids = np.fromiter(
+                (index._terms.setdefault(term, len(index._terms)) for term in list(source._terms)[:count]),
+                dtype=np.int64,
+                count=count,
+            )
+            if count:
+                source_rows = np.concatenate([source._rows[i][: sizes[i]] for i in range(count)])
+                source_tfs = np.concatenate([source._tfs[i][: sizes[i]] for i in range(count)])
+                new_rows = renumbered[source_rows]
+                kept = new_rows >= 0
+                terms.append(np.repeat(ids, sizes)[kept])
+                rows.append(new_rows[kept])
+                tfs.append(source_tfs[kept])
+            lengths.append(source._lengths[keep])
+            offset += len(keep)
+
+        terms = np.concatenate(terms) if terms else np.zeros(0, dtype=np.int64)
+        order = np.lexsort((np.concatenate(rows), terms)) if len(terms) else np.zeros(0, dtype=np.int64)
+        terms = terms[order]
+        merged_rows = np.concatenate(rows)[order].astype(np.int32) if rows else np.zeros(0, dtype=np.int32)
+        merged_tfs = np.concatenate(tfs)[order] if tfs else np.zeros(0, dtype=np.uint16)
+        vocabulary = len(index._terms)
+        sizes = np.bincount(terms, minlength=vocabulary).astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        index._rows = [merged_rows[offsets[i]:offsets[i + 1]] for i in range(vocabulary)]
+        index._tfs = [merged_tfs[offsets[i]:offsets[i + 1]] for i in range(vocabulary)]
+        index._sizes = sizes
+        index._max_tf = np.zeros(vocabulary, dtype=np.float32)
+        present = sizes > 0
+        if present.any():
+            index._max_tf[present] = np.maximum.reduceat(merged_tfs, offsets[:-1][present]).astype(np.float32)
+        index._lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int32)
+        index.size = offset
+        index.live_count = offset
+        index.total_length = int(index._lengths.sum())
+        return index
+
+    # --- Persistence ---
+
+    def save(self, path: str) -> None:
+        """
+        Store postings in CSR form (one rows/tfs array + offsets per term)
+        """
+        os.makedirs(path, exist_ok=True)
+        count = len(self._rows)
+        sizes = self._sizes[:count]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        arrays = {
+            "offsets": offsets,
+            "rows": np.concatenate([self._rows[i][: sizes[i]] for i in range(count)]) if count else np.zeros(0, np.int32),
+            "tfs": np.concatenate([self._tfs[i][: sizes[i]] for i in range(count)]) if count else np.zeros(0, np.uint16),
+            "max_tf": self._max_tf[:count],
+            "lengths": self._lengths[: self.size],
+        }
+        for name, array in arrays.items():
+            tmp_path = os.path.join(path, f"{name}.npy.tmp")
+            with open(tmp_path, "wb") as fh:
+                np.save(fh, array)
+            os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+        meta = {
+            "k1": self.k1,
+            "b": self.b,
+            "size": self.size,
+            "live_count": self.live_count,
+            "total_length": self.total_length,
+            "terms": list(self._terms),
+        }
+        tmp_path = os.path.join(path, "bm25.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_path, os.path.join(path, "bm25.json"))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """
+        Map a saved index; postings are read-only views until first extended
+        """
+        with open(os.path.join(path, "bm25.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.size = meta["size"]
+        index.live_count = meta["live_count"]
+        index.total_length = meta["total_length"]
+        index._terms = {term: i for i, term in enumerate(meta["terms"])}
+        offsets = np.load(os.path.join(path, "offsets.npy"))
+        rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r").view(np.ndarray)
+        tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r").view(np.ndarray)
+        index._rows = [rows[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        index._tfs = [tfs[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        index._sizes = np.diff(offsets).astype(np.int64)
+        index._max_tf = np.array(np.load(os.path.join(path, "max_tf.npy")))
+        index._lengths = np.array(np.load(os.path.join(path, "lengths.npy")))
+        return index
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.metrics import record_stage, span
+from app.rag.context import ContextAssembler, PackedContext, format_context
+from app.rag.embeddings import Embedder, get_embedder
+from app.rag.llm import LLM, Message, get_llm
+from app.rag.vector_store import PartitionedVectorStore, SearchHit, get_partitioned_store
+
+settings = get_settings()
+
+SYSTEM_PROMPT = (
+    "Answer the user's question using only the numbered context passages below. "
+    "Cite passages as [n]. If the context does not contain the answer, say so."
+)
+
+
+@dataclass
+class ChainEvent:
+    """
+    One step of a streamed answer: "retrieval", "token" or "done"
+    """
+    type: str
+    data: Any
+
+
+class RAGChain:
+    """
+    Retrieval-augmented generation as an async generator.
+
+    Retrieval results are yielded as soon as they are known, then every
+    text delta from the model as it arrives. Closing the generator closes
+    the model stream, so an abandoned request stops generating.
+
+    Retrieval fetches `candidates` hits and the context assembler merges,
+    diversifies and packs them into at most `top_k` passages that fit the
+    prompt token budget.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        store: Optional[PartitionedVectorStore] = None,
+        llm: Optional[LLM] = None,
+        top_k: int = settings.CHAT_TOP_K,
+        candidates: int = settings.CHAT_CONTEXT_CANDIDATES,
+        assembler: Optional[ContextAssembler] = None,
+    ):
+        self.embedder = embedder or get_embedder()
+        self._store = store
+        self.llm = llm or get_llm()
+        self.top_k = top_k
+        self.candidates = candidates
+        self.assembler = assembler or ContextAssembler()
+
+    @property
+    def store(self) -> PartitionedVectorStore:
+        if self._store is None:
+            self._store = get_partitioned_store()
+        return self._store
+
+    async def embed_query(self, question: str) -> np.ndarray:
+        """
+        Query embedding of shape (1, dim)
+        """
+        with span("embedding"):
+            return await self.embedder.embed([question])
+
+    async def retrieve_context(
+        self,
+        owner_id: str,
+        question: str,
+        document_ids: Optional[Sequence[str]] = None,
+        k: Optional[int] = None,
+        query: Optional[np.ndarray] = None,
+    ) -> PackedContext:
+        k = k or self.top_k
+        if document_ids is not None and not document_ids:
+            return self.assembler.assemble([], np.zeros((0, 0), dtype=np.float32), k)
+        if query is None:
+            query = await self.embed_query(question)
+        depth = max(k, self.candidates) if self.assembler.enabled else k
+        with span("retrieval"):
+            hits, vectors = await asyncio.to_thread(
+                self.store.hybrid_candidates, owner_id, query, question, depth, document_ids
+            )
+        with span("packing"):
+            return self.assembler.assemble(hits, vectors, k)
+
+    async def retrieve(
+        self,
+        owner_id: str,
+        question: str,
+        document_ids: Optional[Sequence[str]] = None,
+        k: Optional[int] = None,
+        query: Optional[np.ndarray] = None,
+    ) -> List[SearchHit]:
+        return (await self.retrieve_context(owner_id, question, document_ids, k, query)).hits
+
+    def build_messages(
+        self,
+        question: str,
+        hits: Sequence[SearchHit],
+        history: Sequence[Message] = (),
+    ) -> List[Message]:
+        return [
+            {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{format_context(hits)}"},
+            *history,
+            {"role": "user", "content": question},
+        ]
+
+    async def stream(
+        self,
+        owner_id: str,
+        question: str,
+        document_ids: Optional[Sequence[str]] = None,
+        k: Optional[int] = None,
+        query: Optional[np.ndarray] = None,
+        history: Sequence[Message] = (),
+    ) -> AsyncIterator[ChainEvent]:
+        started = time.perf_counter()
+        context = await self.retrieve_context(owner_id, question, document_ids, k, query)
+        retrieved = time.perf_counter()
+        yield ChainEvent("retrieval", context.hits)
+
+        tokens = self.llm.stream(self.build_messages(question, context.hits, history))
+        first_token: Optional[float] = None
+        count = 0
+        try:
+            async for token in tokens:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    record_stage("first_token", first_token - retrieved)
+                count += 1
+                yield ChainEvent("token", token)
+        finally:
+            await tokens.aclose()
+            record_stage("generation", time.perf_counter() - retrieved)
+
+        finished = time.perf_counter()
+        yield ChainEvent(
+            "done",
+            {
+                "tokens": count,
+                "context_tokens": context.tokens,
+                "unpacked_context_tokens": context.raw_tokens,
+                "retrieval_ms": round(1000 * (retrieved - started), 2),
+                "ttft_ms": round(1000 * ((first_token or finished) - started), 2),
+                "total_ms": round(1000 * (finished - started), 2),
+            },
+        )
@@ -0,0 +1,245 @@
+import hashlib
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import get_settings
+from app.rag.splitter import Tokenizer, build_tokenizer
+from app.rag.vector_ops import normalize
+from app.rag.vector_store import SearchHit
+
+settings = get_settings()
+
+PASSAGE_SEPARATOR = "\n\n"
+
+
+def passage_label(n: int) -> str:
+    return f"[{n}] "
+
+
+def format_context(hits: Sequence[SearchHit]) -> str:
+    """
+    Numbered passages as they appear in the prompt
+    """
+    return PASSAGE_SEPARATOR.join(f"{passage_label(n)}{hit.text}" for n, hit in enumerate(hits, 1))
+
+
+class TokenCounter:
+    """
+    Token counts of prompt pieces, cached by content hash.
+
+    A chunk is tokenized once however many queries retrieve it.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Optional[Tokenizer] = None,
+        max_entries: int = settings.CHAT_CONTEXT_TOKEN_CACHE_ITEMS,
+    ):
+        self.tokenizer = tokenizer or build_tokenizer(settings.CHAT_CONTEXT_TOKENIZER)
+        self._counts: LRUCache[int] = LRUCache(max_entries)
+
+    def count(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        count = self._counts.get(key)
+        if count is None:
+            ends = self.tokenizer.token_ends(text)
+            count = len(text) if ends is None else len(ends)
+            self._counts.set(key, count)
+        return count
+
+    def truncate(self, text: str, tokens: int) -> str:
+        """
+        The longest prefix of `text` ending on a token boundary with at most `tokens` tokens
+        """
+        if tokens <= 0:
+            return ""
+        ends = self.tokenizer.token_ends(text)
+        if ends is None:
+            return text[:tokens]
+        return text if len(ends) <= tokens else text[: ends[tokens - 1]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._counts),
+            "hits": self._counts.hits,
+            "misses": self._counts.misses,
+            "hit_rate": round(self._counts.hit_rate, 4),
+        }
+
+
+@dataclass
+class PackedContext:
+    hits: List[SearchHit]
+    tokens: int
+    # --- What the top-k candidates would have cost sent as they are ---
+    raw_tokens: int
+    candidates: int
+    merged: int
+    duplicates: int
+    assembly_ms: float
+
+
+class ContextAssembler:
+    """
+    Turns hybrid-search candidates into the passages sent to the model.
+
+    Overlapping or touching chunks of the same document are merged into one
+    passage using their offsets, so the overlap the splitter adds is sent
+    once. Passages are then ordered by maximal marginal relevance: fused
+    retrieval score against cosine similarity to the passages already
+    chosen, from one similarity matrix over the candidate embeddings;
+    passages at or above `duplicate_similarity` to a chosen one are dropped.
+    Finally passages are taken greedily in that order while the formatted
+    context, labels and separators included, fits in `budget` tokens and
+    the chunks they cover number at most `k`; a merged passage uses one of
+    the `k` slots per chunk, so merging never widens the context.
+    """
+
+    def __init__(
+        self,
+        budget: int = settings.CHAT_CONTEXT_TOKENS,
+        mmr_lambda: float = settings.CHAT_MMR_LAMBDA,
+        duplicate_similarity: float = settings.CHAT_CONTEXT_DUPLICATE_SIMILARITY,
+        counter: Optional[TokenCounter] = None,
+    ):
+        self.budget = budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_similarity = duplicate_similarity
+        self.counter = counter or TokenCounter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def context_tokens(self, hits: Sequence[SearchHit]) -> int:
+        if not hits:
+            return 0
+        labels = sum(self.counter.count(passage_label(n)) for n in range(1, len(hits) + 1))
+        separators = (len(hits) - 1) * self.counter.count(PASSAGE_SEPARATOR)
+        return labels + separators + sum(self.counter.count(hit.text) for hit in hits)
+
+    def assemble(self, hits: Sequence[SearchHit], vectors: np.ndarray, k: int) -> PackedContext:
+        """
+        Passages covering up to `k` of `hits` (best first), given their embeddings `vectors`
+        """
+        started = time.perf_counter()
+        raw_tokens = self.context_tokens(hits[:k])
+        if not self.enabled or not hits:
+            packed, duplicates, merged = list(hits[:k]), 0, 0
+        else:
+            passages, passage_vectors, sizes = self.merge(hits, vectors)
+            order, duplicates = self.rank(np.array([p.score for p in passages], dtype=np.float32), passage_vectors)
+            packed = self.pack([passages[i] for i in order], [sizes[i] for i in order], k)
+            merged = len(hits) - len(passages)
+        return PackedContext(
+            hits=packed,
+            tokens=self.context_tokens(packed),
+            raw_tokens=raw_tokens,
+            candidates=len(hits),
+            merged=merged,
+            duplicates=duplicates,
+            assembly_ms=round(1000 * (time.perf_counter() - started), 3),
+        )
+
+    def merge(
+        self, hits: Sequence[SearchHit], vectors: np.ndarray
+    ) -> Tuple[List[SearchHit], np.ndarray, List[int]]:
+        """
+        Fold overlapping or touching chunks of one document into a single passage.
+
+        Returns the passages, their embeddings and how many chunks each
+        covers. A passage keeps the best score and row of its chunks; its
+        embedding is the normalized sum of theirs. Chunks whose text length
+        does not match their offsets are never merged.
+        """
+        order = sorted(range(len(hits)), key=lambda i: (hits[i].document_id, hits[i].start, hits[i].end))
+        passages: List[SearchHit] = []
+        group_starts: List[int] = []
+        exact = False
+        for position, i in enumerate(order):
+            hit = hits[i]
+            aligned = len(hit.text) == hit.end - hit.start
+            current = passages[-1] if passages else None
+            if (
+                current is not None
+                and exact
+                and aligned
+                and hit.document_id == current.document_id
+                and hit.start <= current.end
+            ):
+                if hit.end > current.end:
+                    current.text += hit.text[current.end - hit.start:]
+                    current.end = hit.end
+                if hit.score > current.score:
+                    current.score, current.row = hit.score, hit.row
+                continue
+            passages.append(replace(hit))
+            group_starts.append(position)
+            exact = aligned
+        summed = np.add.reduceat(np.asarray(vectors, dtype=np.float32)[order], group_starts, axis=0)
+        sizes = np.diff(group_starts + [len(order)]).tolist()
+        return passages, normalize(summed), sizes
+
+    def rank(self, scores: np.ndarray, vectors: np.ndarray) -> Tuple[List[int], int]:
+        """
+        MMR order of all passages, minus near-duplicates; returns (order, duplicates dropped)
+        """
+        count = len(scores)
+        top = float(scores.max()) if count else 0.0
+        relevance = scores / top if top > 0 else np.ones(count, dtype=np.float32)
+        similarity = vectors @ vectors.T
+        closest = np.zeros(count, dtype=np.float32)
+        available = np.ones(count, dtype=bool)
+        order: List[int] = []
+        duplicates = 0
+        while available.any():
+            mmr = self.mmr_lambda * relevance - (1.0 - self.mmr_lambda) * closest
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            order.append(best)
+            available[best] = False
+            np.maximum(closest, similarity[best], out=closest)
+            duplicate = available & (similarity[best] >= self.duplicate_similarity)
+            duplicates += int(duplicate.sum())
+            available &= ~duplicate
+        return order, duplicates
+
+    def pack(self, passages: Sequence[SearchHit], sizes: Sequence[int], k: int) -> List[SearchHit]:
+        """
+        Greedy: take each passage in order if it still fits in the budget and the `k` chunk slots
+        """
+        separator = self.counter.count(PASSAGE_SEPARATOR)
+        packed: List[SearchHit] = []
+        used = 0
+        slots = 0
+        for passage, size in zip(passages, sizes):
+            if slots >= k:
+                break
+            if slots + size > k:
+                continue
+            label = self.counter.count(passage_label(len(packed) + 1))
+            cost = label + self.counter.count(passage.text) + (separator if packed else 0)
+            if used + cost <= self.budget:
+                packed.append(passage)
+                used += cost
+                slots += size
+            elif not packed:
+                # --- The best passage alone is over budget; send the part that fits ---
+                text = self.counter.truncate(passage.text, self.budget - label)
+                if text:
+                    packed.append(replace(passage, text=text, end=passage.start + len(text)))
+                    used = label + self.counter.count(text)
+                    slots = size
+        return packed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "mmr_lambda": self.mmr_lambda,
+            "duplicate_similarity": self.duplicate_similarity,
+            "token_counts": self.counter.stats(),
+        }
@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.config import get_settings
+from app.rag.batcher import embedder as batching_embedder
+from app.rag.embeddings import Embedder
+
+settings = get_settings()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_SQL_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC, collapsed whitespace, trimmed
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(text: str, model_id: str) -> bytes:
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class SQLiteVectorCache:
+    """
+    Persistent key -> float32 vector table with least-recently-used eviction
+    once the stored vectors exceed `max_bytes`
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.entries = 0
+        self.bytes = 0
+        self.evictions = 0
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # --- Opened on first use so importing the module touches no files ---
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            db.commit()
+            self._db = db
+            self._count()
+        return self._db
+
+    def _count(self) -> None:
+        row = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        self.entries, self.bytes = int(row[0]), int(row[1])
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, bytes]:
+        found: Dict[bytes, bytes] = {}
+        now = time.time()
+        with self._lock:
+            for begin in range(0, len(keys), _SQL_BATCH):
+                part = keys[begin:begin + _SQL_BATCH]
+                placeholders = ",".join("?" * len(part))
+                found.update(
+                    self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                    ).fetchall()
+                )
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[bytes, bytes]) -> None:
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+            added = self._conn.total_changes - before
+            if added:
+                self.entries += added
+                self.bytes += added * len(next(iter(items.values())))
+                if self.bytes > self.max_bytes:
+                    self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # --- Drop the least recently used rows down to 90% of the budget ---
+        row_bytes = max(1, self.bytes // max(1, self.entries))
+        excess = self.bytes - int(self.max_bytes * 0.9)
+        count = min(self.entries, -(-excess // row_bytes))
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (count,),
+        )
+        self.evictions += count
+        self._count()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class CachedEmbedder(Embedder):
+    """
+    Content-addressed embedding cache in front of another embedder.
+
+    Chunks are keyed by sha256(model id + normalized text), looked up in an
+    in-memory LRU first and a persistent SQLite tier second; only the
+    remaining texts (deduplicated) reach the backend, normalized, so every
+    text sharing a key gets the vector of that same input. Re-uploading a
+    document, or a new version sharing most of its chunks, costs almost no
+    embedding calls.
+    """
+
+    def __init__(
+        self,
+        backend: Embedder,
+        memory_items: int = settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+        disk: Optional[SQLiteVectorCache] = None,
+    ):
+        self.backend = backend
+        self.model_id = backend.model_id
+        self.dimension = backend.dimension
+        self.memory: LRUCache[np.ndarray] = LRUCache(memory_items)
+        self.disk = disk
+        # --- Stats ---
+        self.lookups = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.text_bytes_saved = 0
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        if not len(texts):
+            return out
+        keys = [cache_key(text, self.model_id) for text in texts]
+        self.lookups += len(texts)
+
+        # --- Tier 1: memory ---
+        missing: Dict[bytes, List[int]] = {}
+        for i, key in enumerate(keys):
+            vector = self.memory.get(key)
+            if vector is not None:
+                out[i] = vector
+                self.memory_hits += 1
+                self.text_bytes_saved += len(texts[i])
+            else:
+                missing.setdefault(key, []).append(i)
+
+        # --- Tier 2: disk ---
+        if missing and self.disk is not None:
+            found = await asyncio.to_thread(self.disk.get_many, list(missing))
+            for key, blob in found.items():
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if len(vector) != self.dimension:
+                    continue
+                self.memory.set(key, vector)
+                for i in missing.pop(key):
+                    out[i] = vector
+                    self.disk_hits += 1
+                    self.text_bytes_saved += len(texts[i])
+
+        # --- Backend, once per distinct normalized text ---
+        if missing:
+            positions = list(missing.values())
+            vectors = await self.backend.embed([normalize_text(texts[p[0]]) for p in positions])
+            for key, rows, vector in zip(missing, positions, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                out[rows] = vector
+                self.memory.set(key, vector)
+                self.misses += 1
+                # --- Duplicates inside one call were embedded once ---
+                for i in rows[1:]:
+                    self.text_bytes_saved += len(texts[i])
+            if self.disk is not None:
+                blobs = {key: vectors[n].astype(np.float32).tobytes() for n, key in enumerate(missing)}
+                await asyncio.to_thread(self.disk.put_many, blobs)
+        return out
+
+    async def close(self) -> None:
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.close)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "model_id": self.model_id,
+            "lookups": self.lookups,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "vector_bytes_saved": hits * self.dimension * 4,
+            "text_bytes_saved": self.text_bytes_saved,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+def get_embedding_cache() -> CachedEmbedder:
+    """
+    Dependency returning the shared embedding cache
+    """
+    return embedding_cache
+
+
+# Singleton instance
+embedding_cache = CachedEmbedder(
+    batching_embedder,
+    disk=SQLiteVectorCache(
+        os.path.join(settings.DATA_DIR, "embedding_cache.sqlite3"),
+        settings.EMBEDDING_CACHE_DISK_MAX_BYTES,
+    )
+    if settings.EMBEDDING_CACHE_DISK_MAX_BYTES > 0
+    else None,
+)
@@ -0,0 +1,80 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class Embedder(ABC):
+    """
+    Turns texts into L2-normalized float32 vectors of shape (len(texts), dimension)
+    """
+    model_id: str
+    dimension: int
+
+    @abstractmethod
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder based on hashed character trigrams.
+
+    No model or network is involved, which makes it the default for
+    development, benchmarks and tests; similar texts still land close
+    together because they share trigrams.
+    """
+
+    def __init__(self, dimension: int = settings.EMBEDDING_DIM):
+        self.dimension = dimension
+        self.model_id = f"hashing-trigram-{dimension}"
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if len(texts) <= 8:
+            return self.embed_sync(texts)
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        count = len(texts)
+        out = np.zeros((count, self.dimension), dtype=np.float32)
+        if count == 0:
+            return out
+
+        encoded = [text.lower().encode("utf-8") for text in texts]
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=count)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint32)
+        if data.size < 3:
+            return out
+
+        # --- Hash every byte trigram, then drop trigrams spanning two texts ---
+        hashes = (data[:-2] * np.uint32(0x9E3779B1)) ^ (data[1:-1] * np.uint32(0x85EBCA77)) ^ (
+            data[2:] * np.uint32(0xC2B2AE3D)
+        )
+        owner = np.repeat(np.arange(count, dtype=np.int64), lengths)
+        valid = owner[:-2] == owner[2:]
+        owner = owner[:-2][valid]
+        hashes = hashes[valid]
+
+        buckets = (hashes % np.uint32(self.dimension)).astype(np.int64)
+        signs = np.where(hashes & np.uint32(0x80000000), -1.0, 1.0)
+        flat = np.bincount(owner * self.dimension + buckets, weights=signs, minlength=count * self.dimension)
+        out[:] = flat.reshape(count, self.dimension)
+
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+def get_embedder() -> Embedder:
+    """
+    Return the shared embedder: embedding cache -> micro-batcher -> model
+    """
+    # --- Imported here because the cache and batcher wrap the embedders defined above ---
+    from app.rag.embedding_cache import embedding_cache
+
+    return embedding_cache
@@ -0,0 +1,198 @@
+import json
+import os
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.vector_ops import normalize, top_k
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    clusters: int,
+    iterations: int = 15,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    k-means on the unit sphere (assignment by dot product); returns unit centroids
+    """
+    rng = np.random.default_rng(seed)
+    clusters = min(clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        # --- Per-cluster sums via sort + reduceat (much faster than np.add.at) ---
+        order = np.argsort(assignment, kind="stable")
+        members, starts = np.unique(assignment[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[members] = np.add.reduceat(vectors[order], starts, axis=0)
+        # --- Re-seed empty clusters with random points ---
+        empty = np.ones(clusters, dtype=bool)
+        empty[members] = False
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a k-means coarse quantizer.
+
+    Each row is assigned to its nearest centroid; a query scans only the
+    `nprobe` lists whose centroids score highest. Lists grow in place, so
+    inserts are incremental; deleted rows are filtered with the caller's row
+    mask. The index can be retrained when the data has grown well beyond
+    the training sample.
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._lists: List[np.ndarray] = []
+        self._list_sizes = np.zeros(0, dtype=np.int64)
+        self._assignments = np.zeros(0, dtype=np.int32)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return int(self._list_sizes.sum())
+
+    def train(self, vectors: np.ndarray, rows: np.ndarray, sample_per_list: int = 32) -> None:
+        """
+        Fit centroids on a sample of `vectors` and (re)build every list from `rows`.
+        With nlist=0 the list count defaults to sqrt(len(rows)).
+        """
+        nlist = self.nlist or max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(rows), nlist * sample_per_list)
+        sample = vectors[np.sort(rng.choice(rows, sample_size, replace=False))]
+        self.centroids = spherical_kmeans(np.asarray(sample, dtype=np.float32), nlist, seed=self.seed)
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(len(self.centroids))]
+        self._list_sizes = np.zeros(len(self.centroids), dtype=np.int64)
+        self._assignments = np.full(0, -1, dtype=np.int32)
+        self.trained_size = len(rows)
+        self.add(rows, vectors[rows])
+
+    def _assign(self, vectors: np.ndarray, batch: int = 8192) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int32)
+        for begin in range(0, len(vectors), batch):
+            out[begin:begin + batch] = np.argmax(vectors[begin:begin + batch] @ self.centroids.T, axis=1)
+        return out
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        if not self.is_trained or len(rows) == 0:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        assignment = self._assign(np.asarray(vectors, dtype=np.float32))
+
+        needed = int(rows.max()) + 1
+        if needed > len(self._assignments):
+            grown = np.full(max(needed, 2 * len(self._assignments)), -1, dtype=np.int32)
+            grown[: len(self._assignments)] = self._assignments
+            self._assignments = grown
+        self._assignments[rows] = assignment
+
+        order = np.argsort(assignment, kind="stable")
+        lists, starts = np.unique(assignment[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        for list_id, begin, end in zip(lists, bounds[:-1], bounds[1:]):
+            self._append(int(list_id), rows[order[begin:end]])
+
+    def _append(self, list_id: int, rows: np.ndarray) -> None:
+        size = self._list_sizes[list_id]
+        buffer = self._lists[list_id]
+        needed = size + len(rows)
+        if needed > len(buffer) or not buffer.flags.writeable:
+            grown = np.empty(max(needed, 2 * len(buffer), 16), dtype=np.int64)
+            grown[:size] = buffer[:size]
+            buffer = self._lists[list_id] = grown
+        buffer[size:needed] = rows
+        self._list_sizes[list_id] = needed
+
+    def missing(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Boolean mask of `rows` that are not in any list
+        """
+        known = rows < len(self._assignments)
+        known[known] = self._assignments[rows[known]] >= 0
+        return ~known
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        score: Callable[[np.ndarray, np.ndarray], np.ndarray],
+        mask: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k; candidates from the probed lists are scored with
+        `score(query, rows)`. Returns (scores, rows) padded with -inf / -1.
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe_scores = queries @ self.centroids.T
+        _, probes = top_k(probe_scores, nprobe)
+
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([self._lists[p][: self._list_sizes[p]] for p in probes[i]])
+            if mask is not None and len(candidates):
+                candidates = candidates[mask[candidates]]
+            if not len(candidates):
+                continue
+            scores, positions = top_k(score(query, candidates)[None, :], k)
+            found = scores.shape[1]
+            out_scores[i, :found] = scores[0]
+            out_rows[i, :found] = candidates[positions[0]]
+        return out_scores, out_rows
+
+    # --- Persistence ---
+
+    def save(self, path: str) -> None:
+        """
+        Store centroids and lists in CSR form (one rows array + offsets)
+        """
+        os.makedirs(path, exist_ok=True)
+        offsets = np.concatenate([[0], np.cumsum(self._list_sizes)])
+        rows = (
+            np.concatenate([self._lists[i][: self._list_sizes[i]] for i in range(len(self._lists))])
+            if self._lists
+            else np.zeros(0, dtype=np.int64)
+        )
+        arrays = {
+            "centroids": self.centroids,
+            "list_rows": rows,
+            "list_offsets": offsets,
+            "assignments": self._assignments,
+        }
+        for name, array in arrays.items():
+            tmp_path = os.path.join(path, f"{name}.npy.tmp")
+            with open(tmp_path, "wb") as fh:
+                np.save(fh, array)
+            os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+        with open(os.path.join(path, "ivf.json"), "w", encoding="utf-8") as fh:
+            json.dump({"nlist": self.nlist, "nprobe": self.nprobe, "trained_size": self.trained_size}, fh)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """
+        Map a saved index; lists are read-only views until first modified
+        """
+        with open(os.path.join(path, "ivf.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        index = cls(nlist=meta["nlist"], nprobe=meta["nprobe"])
+        index.trained_size = meta["trained_size"]
+        index.centroids = np.load(os.path.join(path, "centroids.npy"))
+        rows = np.load(os.path.join(path, "list_rows.npy"), mmap_mode="r")
+        offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        index._lists = [rows[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        index._list_sizes = np.diff(offsets).astype(np.int64)
+        index._assignments = np.array(np.load(os.path.join(path, "assignments.npy")))
+        return index
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from app.core.config import get_settings
+from app.core.http_client import UpstreamClient, http_client
+
+settings = get_settings()
+
+Message = Dict[str, str]
+
+
+class LLM(ABC):
+    """
+    Streaming chat model. `stream` yields text deltas as they are generated;
+    closing the iterator early must stop generation upstream.
+    """
+    model_id: str
+
+    @abstractmethod
+    def stream(self, messages: Sequence[Message]) -> AsyncIterator[str]:
+        ...
+
+
+class FakeLLM(LLM):
+    """
+    Deterministic local model for development, tests and benchmarks.
+
+    Waits `first_token_delay_ms`, then streams an answer assembled from the
+    question and the start of the supplied context, one word every
+    `token_delay_ms`.
+    """
+
+    def __init__(
+        self,
+        first_token_delay_ms: float = settings.FAKE_LLM_FIRST_TOKEN_DELAY_MS,
+        token_delay_ms: float = settings.FAKE_LLM_TOKEN_DELAY_MS,
+        max_tokens: int = settings.LLM_MAX_TOKENS,
+    ):
+        self.model_id = "fake"
+        self.first_token_delay = first_token_delay_ms / 1000.0
+        self.token_delay = token_delay_ms / 1000.0
+        self.max_tokens = max_tokens
+        self.tokens_generated = 0
+
+    def answer(self, messages: Sequence[Message]) -> List[str]:
+        question = messages[-1]["content"] if messages else ""
+        context = " ".join(m["content"] for m in messages[:-1] if m["role"] == "system")
+        words = re.findall(r"\S+", f"You asked: {question} Based on the documents: {context[:600]}")
+        return [f"{word} " for word in words[: self.max_tokens]]
+
+    async def stream(self, messages: Sequence[Message]) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_delay)
+        for index, token in enumerate(self.answer(messages)):
+            if index:
+                await asyncio.sleep(self.token_delay)
+            self.tokens_generated += 1
+            yield token
+
+
+class OpenAICompatibleLLM(LLM):
+    """
+    Any OpenAI-compatible /chat/completions endpoint, streamed over the
+    shared upstream pool. Closing the stream closes the HTTP response,
+    which cancels generation on the provider side.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.LLM_BASE_URL,
+        api_key: str = settings.LLM_API_KEY,
+        model: str = settings.LLM_MODEL,
+        max_tokens: int = settings.LLM_MAX_TOKENS,
+        client: Optional[UpstreamClient] = None,
+    ):
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.api_key = api_key
+        self.model_id = model
+        self.max_tokens = max_tokens
+        self.http_client = client or http_client
+
+    async def stream(self, messages: Sequence[Message]) -> AsyncIterator[str]:
+        body = {
+            "model": self.model_id,
+            "messages": list(messages),
+            "max_tokens": self.max_tokens,
+            "stream": True,
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        async with self.http_client.stream("POST", self.url, endpoint="llm", json=body, headers=headers) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+def get_llm() -> LLM:
+    """
+    Return the shared chat model
+    """
+    return llm
+
+
+# Singleton instance
+llm: LLM = OpenAICompatibleLLM() if settings.LLM_PROVIDER == "openai" else FakeLLM()
@@ -0,0 +1,188 @@
+import asyncio
+import codecs
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.rag import parsing
+from app.rag.parser_pool import ParserPool
+from app.rag.splitter import TextSplitter
+
+settings = get_settings()
+
+PDF_EXTENSIONS = {".pdf"}
+DOCX_EXTENSIONS = {".docx"}
+HTML_EXTENSIONS = {".html", ".htm"}
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown", ".csv", ".json", ".log", ".rst"}
+SUPPORTED_EXTENSIONS = PDF_EXTENSIONS | DOCX_EXTENSIONS | HTML_EXTENSIONS | TEXT_EXTENSIONS
+
+
+@dataclass
+class Section:
+    """
+    A page or block of document text.
+
+    `offset` is the character position of the section within the whole
+    document stream, so chunk offsets can be made document-absolute.
+    Sections parsed in the worker pool arrive already split: `starts` and
+    `ends` hold their chunk spans relative to `text`.
+    """
+    text: str
+    index: int
+    offset: int
+    page: Optional[int] = None
+    starts: Optional[np.ndarray] = None
+    ends: Optional[np.ndarray] = None
+
+
+def is_supported(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+async def load_sections(
+    path: str,
+    filename: Optional[str] = None,
+    splitter: Optional[TextSplitter] = None,
+    pool: Optional[ParserPool] = None,
+) -> AsyncIterator[Section]:
+    """
+    Yield document sections one at a time without reading the whole file into memory.
+
+    Given a `splitter` and an enabled `pool`, parsing and splitting run in
+    worker processes and sections carry their chunk spans.
+    """
+    extension = os.path.splitext(filename or path)[1].lower()
+    if pool is None or not pool.enabled or splitter is None:
+        if extension in PDF_EXTENSIONS:
+            sections = _load_pdf(path)
+        elif extension in DOCX_EXTENSIONS:
+            sections = _load_whole(parsing.parse_docx, path)
+        elif extension in HTML_EXTENSIONS:
+            sections = _load_whole(parsing.parse_html, path)
+        else:
+            sections = _load_text(path)
+    elif extension in PDF_EXTENSIONS:
+        sections = _parse_pdf(path, splitter, pool)
+    elif extension in DOCX_EXTENSIONS:
+        sections = _parse_whole(parsing.parse_docx, path, splitter, pool)
+    elif extension in HTML_EXTENSIONS:
+        sections = _parse_whole(parsing.parse_html, path, splitter, pool)
+    else:
+        sections = _parse_text(path, splitter, pool)
+    async for section in sections:
+        yield section
+
+
+async def _read_blocks(path: str) -> AsyncIterator[str]:
+    """
+    Read text in fixed-size blocks, cutting each block at the last line or word break
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    carry = ""
+    with open(path, "rb") as fh:
+        while True:
+            raw = await asyncio.to_thread(fh.read, settings.LOADER_BLOCK_BYTES)
+            final = not raw
+            text = carry + decoder.decode(raw, final=final)
+            if not final:
+                cut = _last_break(text)
+                text, carry = text[:cut], text[cut:]
+            if text:
+                yield text
+            if final:
+                break
+
+
+async def _load_text(path: str) -> AsyncIterator[Section]:
+    offset = 0
+    index = 0
+    async for text in _read_blocks(path):
+        yield Section(text=text, index=index, offset=offset)
+        index += 1
+        offset += len(text)
+
+
+def _last_break(text: str) -> int:
+    # --- Prefer paragraph, then line, then word boundaries; never return 0 ---
+    for separator in ("\n\n", "\n", " "):
+        position = text.rfind(separator)
+        if position > 0:
+            return position + len(separator)
+    return len(text)
+
+
+async def _load_pdf(path: str) -> AsyncIterator[Section]:
+    """
+    Extract PDF text page by page; only one page's text is held at a time
+    """
+    from pypdf import PdfReader
+
+    offset = 0
+    with open(path, "rb") as fh:
+        # --- Pass the handle so pypdf seeks the file instead of buffering it ---
+        reader = await asyncio.to_thread(PdfReader, fh)
+        for page_number in range(len(reader.pages)):
+            text = await asyncio.to_thread(_extract_page, reader, page_number)
+            if not text:
+                continue
+            yield Section(text=text, index=page_number, offset=offset, page=page_number + 1)
+            offset += len(text)
+
+
+def _extract_page(reader, page_number: int) -> str:
+    return reader.pages[page_number].extract_text() or ""
+
+
+async def _load_whole(parse, path: str) -> AsyncIterator[Section]:
+    unit = await asyncio.to_thread(parse, path)
+    if unit.text:
+        yield Section(text=unit.text, index=0, offset=0)
+
+
+# --- Worker pool: parse and split out of process, one bulk result per job ---
+
+
+async def _parse_text(path: str, splitter: TextSplitter, pool: ParserPool) -> AsyncIterator[Section]:
+    """
+    Blocks are read here; only their chunk spans come back from the workers
+    """
+    blocks: deque = deque()
+
+    async def jobs():
+        async for text in _read_blocks(path):
+            blocks.append(text)
+            yield (text, splitter)
+
+    offset = 0
+    index = 0
+    async for unit in pool.map(parsing.split_text, jobs()):
+        text = blocks.popleft()
+        yield Section(text=text, index=index, offset=offset, starts=unit.starts, ends=unit.ends)
+        index += 1
+        offset += len(text)
+
+
+async def _parse_pdf(path: str, splitter: TextSplitter, pool: ParserPool) -> AsyncIterator[Section]:
+    page_count = await pool.run(parsing.pdf_page_count, path)
+    per_job = settings.PARSER_PDF_PAGES_PER_JOB
+    jobs = ((path, first, first + per_job, splitter) for first in range(0, page_count, per_job))
+    offset = 0
+    index = 0
+    async for unit in pool.map(parsing.parse_pdf_pages, jobs):
+        if not unit.text:
+            continue
+        yield Section(
+            text=unit.text, index=index, offset=offset, page=unit.first_page, starts=unit.starts, ends=unit.ends,
+        )
+        index += 1
+        offset += len(unit.text)
+
+
+async def _parse_whole(parse, path: str, splitter: TextSplitter, pool: ParserPool) -> AsyncIterator[Section]:
+    unit = await pool.run(parse, path, splitter)
+    if unit.text:
+        yield Section(text=unit.text, index=0, offset=0, starts=unit.starts, ends=unit.ends)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.pipeline import ChunkBatch
+from app.rag.splitter import TextSplitter
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def splitter_signature(splitter: TextSplitter) -> str:
+    """
+    Identifies the chunking scheme; manifests from another scheme are not reused
+    """
+    return f"{type(splitter).__name__}:{splitter.chunk_size}:{splitter.chunk_overlap}"
+
+
+@dataclass
+class ChunkManifest:
+    """
+    Per-document list of chunk hashes, their offsets and vector store rows
+    """
+    splitter: str
+    hashes: List[str] = field(default_factory=list)
+    starts: List[int] = field(default_factory=list)
+    ends: List[int] = field(default_factory=list)
+    rows: List[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ChunkManifest"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as fh:
+            return cls(**json.load(fh))
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.__dict__, fh, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+class ManifestDiff:
+    """
+    Pipeline chunk filter that diffs a new document version against the
+    previous manifest.
+
+    Chunks whose hash appears in the previous version keep their vector
+    store row (only their offsets move); the rest continue to the embedder
+    and get rows as the sink writes them. Rows of the previous version that
+    were not matched are tombstoned by the caller.
+    """
+
+    def __init__(self, previous: Optional[ChunkManifest], splitter: str):
+        self.manifest = ChunkManifest(splitter)
+        self._available: Dict[str, Deque[int]] = {}
+        if previous is not None and previous.splitter == splitter:
+            for digest, row in zip(previous.hashes, previous.rows):
+                self._available.setdefault(digest, deque()).append(row)
+        self._pending: Deque[int] = deque()
+        self.kept: List[int] = []
+        self.added: List[int] = []
+
+    def __call__(self, batch: ChunkBatch) -> ChunkBatch:
+        fresh = ChunkBatch()
+        manifest = self.manifest
+        for text, start, end in zip(batch.texts, batch.starts, batch.ends):
+            digest = chunk_hash(text)
+            rows = self._available.get(digest)
+            manifest.hashes.append(digest)
+            manifest.starts.append(start)
+            manifest.ends.append(end)
+            if rows:
+                row = rows.popleft()
+                manifest.rows.append(row)
+                self.kept.append(len(manifest.rows) - 1)
+            else:
+                manifest.rows.append(-1)
+                self._pending.append(len(manifest.rows) - 1)
+                fresh.texts.append(text)
+                fresh.starts.append(start)
+                fresh.ends.append(end)
+        return fresh
+
+    def assign(self, rows: np.ndarray) -> None:
+        """
+        Record the rows the sink appended, in pipeline order
+        """
+        for row in rows:
+            entry = self._pending.popleft()
+            self.manifest.rows[entry] = int(row)
+            self.added.append(int(row))
+
+    def kept_offsets(self) -> Tuple[np.ndarray, List[int], List[int]]:
+        """
+        (rows, starts, ends) of reused chunks in the new version
+        """
+        manifest = self.manifest
+        return (
+            np.asarray([manifest.rows[i] for i in self.kept], dtype=np.int64),
+            [manifest.starts[i] for i in self.kept],
+            [manifest.ends[i] for i in self.kept],
+        )
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, Optional, Tuple, Union
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class ParseError(Exception):
+    """
+    A parse job timed out or crashed its worker process
+    """
+
+
+class ParserPool:
+    """
+    Worker processes for CPU-bound parsing and splitting.
+
+    Jobs run outside the API process, so a large PDF does not hold the GIL
+    while auth and chat requests wait. Each job has a timeout; a job that
+    times out or kills its worker (e.g. a malformed file crashing the
+    parser) gets the pool restarted. Every job lost to the restart is then
+    retried once in a single-use worker, so only the culprit fails.
+
+    With `workers=0` jobs run in a thread of the API process instead.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PARSER_WORKERS,
+        job_timeout: float = settings.PARSER_JOB_TIMEOUT_SECONDS,
+    ):
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.restarts = 0
+        self.resubmitted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _pool(self) -> Tuple[ProcessPoolExecutor, int]:
+        with self._lock:
+            if self._executor is None:
+                # --- Spawned workers do not inherit the event loop or open sockets ---
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor, self._generation
+
+    def _restart(self, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation or self._executor is None:
+                return
+            executor, self._executor = self._executor, None
+            self._generation += 1
+            self.restarts += 1
+        logger.warning("Restarting parser pool (generation %d)", generation + 1)
+        _terminate(executor)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Run `fn(*args)` in a worker and return its result
+        """
+        self.jobs += 1
+        timeout = timeout or self.job_timeout
+        if not self.enabled:
+            return await asyncio.to_thread(fn, *args)
+
+        executor, generation = self._pool()
+        try:
+            return await self._submit(executor, fn, args, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._restart(generation)
+            raise ParseError(f"Parsing timed out after {timeout:g}s")
+        except BrokenProcessPool:
+            self._restart(generation)
+
+        # --- Which job killed the pool is unknown: retry this one on its own ---
+        self.resubmitted += 1
+        isolated = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            return await self._submit(isolated, fn, args, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ParseError(f"Parsing timed out after {timeout:g}s")
+        except BrokenProcessPool:
+            self.crashes += 1
+            raise ParseError("Parser worker crashed")
+        finally:
+            _terminate(isolated)
+
+    @staticmethod
+    async def _submit(executor: ProcessPoolExecutor, fn: Callable[..., Any], args: Tuple[Any, ...], timeout: float) -> Any:
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout)
+
+    async def map(
+        self,
+        fn: Callable[..., Any],
+        jobs: Union[Iterable[Tuple[Any, ...]], AsyncIterable[Tuple[Any, ...]]],
+        window: Optional[int] = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Run `fn` over argument tuples with at most `window` jobs in flight,
+        yielding results in submission order
+        """
+        window = window or max(1, 2 * self.workers)
+        pending: deque = deque()
+        try:
+            async for args in _aiter(jobs):
+                pending.append(asyncio.ensure_future(self.run(fn, *args)))
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "restarts": self.restarts,
+            "resubmitted": self.resubmitted,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _terminate(executor: ProcessPoolExecutor) -> None:
+    # --- A running job cannot be cancelled, so its worker has to go ---
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+def get_parser_pool() -> ParserPool:
+    return parser_pool
+
+
+# Singleton instance
+parser_pool = ParserPool()
@@ -0,0 +1,163 @@
+"""
+CPU-bound document parsing and splitting.
+
+Everything here runs in parser worker processes (or a thread when the pool
+is disabled), so functions are top-level and results are compact: one text
+string plus numpy offset arrays per job rather than per-page objects.
+"""
+import re
+import zipfile
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+from xml.etree import ElementTree
+
+import numpy as np
+
+from app.rag.splitter import TextSplitter
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+@dataclass
+class ParsedUnit:
+    """
+    Text of one parse job with its chunk spans (offsets into `text`)
+    """
+    text: str
+    starts: np.ndarray = field(default_factory=lambda: _EMPTY)
+    ends: np.ndarray = field(default_factory=lambda: _EMPTY)
+    first_page: Optional[int] = None
+
+
+def split_spans(splitter: Optional[TextSplitter], text: str, base: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    if splitter is None or not text:
+        return _EMPTY, _EMPTY
+    spans = np.asarray(splitter.split(text), dtype=np.int64).reshape(-1, 2)
+    return spans[:, 0] + base, spans[:, 1] + base
+
+
+def split_text(text: str, splitter: TextSplitter) -> ParsedUnit:
+    """
+    Split an already-loaded text block; only the spans need to travel back
+    """
+    starts, ends = split_spans(splitter, text)
+    return ParsedUnit(text="", starts=starts, ends=ends)
+
+
+# --- PDF ---
+
+
+def pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    with open(path, "rb") as fh:
+        return len(PdfReader(fh).pages)
+
+
+def parse_pdf_pages(path: str, first: int, last: int, splitter: Optional[TextSplitter]) -> ParsedUnit:
+    """
+    Extract pages [first, last); each page is split on its own, as in-process ingestion does
+    """
+    from pypdf import PdfReader
+
+    texts: List[str] = []
+    starts: List[np.ndarray] = []
+    ends: List[np.ndarray] = []
+    offset = 0
+    with open(path, "rb") as fh:
+        reader = PdfReader(fh)
+        for page_number in range(first, min(last, len(reader.pages))):
+            text = reader.pages[page_number].extract_text() or ""
+            if not text:
+                continue
+            page_starts, page_ends = split_spans(splitter, text, offset)
+            texts.append(text)
+            starts.append(page_starts)
+            ends.append(page_ends)
+            offset += len(text)
+    return ParsedUnit(
+        text="".join(texts),
+        starts=np.concatenate(starts) if starts else _EMPTY,
+        ends=np.concatenate(ends) if ends else _EMPTY,
+        first_page=first + 1,
+    )
+
+
+# --- DOCX ---
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def parse_docx(path: str, splitter: Optional[TextSplitter] = None) -> ParsedUnit:
+    """
+    Paragraph text from word/document.xml (stdlib only); paragraphs are separated by blank lines
+    """
+    paragraphs: List[str] = []
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as fh:
+        for _, element in ElementTree.iterparse(fh, events=("end",)):
+            if element.tag == f"{_WORD_NS}p":
+                parts = []
+                for node in element.iter():
+                    if node.tag == f"{_WORD_NS}t" and node.text:
+                        parts.append(node.text)
+                    elif node.tag == f"{_WORD_NS}tab":
+                        parts.append("\t")
+                    elif node.tag in (f"{_WORD_NS}br", f"{_WORD_NS}cr"):
+                        parts.append("\n")
+                paragraph = "".join(parts).strip()
+                if paragraph:
+                    paragraphs.append(paragraph)
+                element.clear()
+    text = "\n\n".join(paragraphs)
+    starts, ends = split_spans(splitter, text)
+    return ParsedUnit(text=text, starts=starts, ends=ends)
+
+
+# --- HTML ---
+
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article",
+    "header", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote",
+}
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*")
+_SPACES_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skipping += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def parse_html(path: str, splitter: Optional[TextSplitter] = None) -> ParsedUnit:
+    extractor = _TextExtractor()
+    with open(path, encoding="utf-8", errors="replace") as fh:
+        while True:
+            block = fh.read(1024 * 1024)
+            if not block:
+                break
+            extractor.feed(block)
+    extractor.close()
+    text = _SPACES_RE.sub(" ", "".join(extractor.parts))
+    text = _BLANK_LINES_RE.sub("\n\n", text).strip()
+    starts, ends = split_spans(splitter, text)
+    return ParsedUnit(text=text, starts=starts, ends=ends)
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, List, Optional, Protocol
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.rag.embeddings import Embedder
+from app.rag.loader import Section
+from app.rag.splitter import TextSplitter, get_splitter
+
+settings = get_settings()
+
+_DONE = object()
+
+
+@dataclass
+class ChunkBatch:
+    """
+    Chunks flowing between pipeline stages; offsets are document-absolute
+    """
+    texts: List[str] = field(default_factory=list)
+    starts: List[int] = field(default_factory=list)
+    ends: List[int] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+class ChunkSink(Protocol):
+    async def write(self, batch: ChunkBatch) -> None:
+        ...
+
+
+class ChunkFilter(Protocol):
+    def __call__(self, batch: ChunkBatch) -> ChunkBatch:
+        """
+        Return the chunks of `batch` that still need embedding
+        """
+
+
+@dataclass
+class IngestStats:
+    sections: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    characters: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+class IngestionPipeline:
+    """
+    loader -> splitter -> embedder -> sink, connected by bounded queues.
+
+    Every queue holds at most `queue_size` items, so a slow embedder or sink
+    pauses the loader instead of letting sections pile up in memory. An
+    optional `chunk_filter` drops chunks that need no embedding (e.g. ones
+    already indexed) between the splitter and the embedder, and
+    `on_progress` is called with the running stats after every write.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        splitter: Optional[TextSplitter] = None,
+        batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+        queue_size: int = settings.INGEST_QUEUE_SIZE,
+        chunk_filter: Optional[ChunkFilter] = None,
+        on_progress: Optional[Callable[[IngestStats], None]] = None,
+    ):
+        self.embedder = embedder
+        self.splitter = splitter or get_splitter()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.chunk_filter = chunk_filter
+        self.on_progress = on_progress
+
+    async def run(self, sections: AsyncIterator[Section], sink: ChunkSink) -> IngestStats:
+        stats = IngestStats()
+        started = time.perf_counter()
+        section_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        chunk_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        vector_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        tasks = [
+            asyncio.create_task(self._load(sections, section_queue, stats)),
+            asyncio.create_task(self._split(section_queue, chunk_queue, stats)),
+            asyncio.create_task(self._embed(chunk_queue, vector_queue, stats)),
+            asyncio.create_task(self._write(vector_queue, sink, stats)),
+        ]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    async def _load(self, sections: AsyncIterator[Section], out: asyncio.Queue, stats: IngestStats) -> None:
+        async for section in sections:
+            stats.sections += 1
+            stats.characters += len(section.text)
+            await out.put(section)
+        await out.put(_DONE)
+
+    async def _split(self, source: asyncio.Queue, out: asyncio.Queue, stats: IngestStats) -> None:
+        batch = ChunkBatch()
+        while True:
+            section = await source.get()
+            if section is _DONE:
+                break
+            text = section.text
+            if section.starts is not None:
+                spans = zip(section.starts.tolist(), section.ends.tolist())
+            else:
+                spans = self.splitter.split(text)
+            for start, end in spans:
+                batch.texts.append(text[start:end])
+                batch.starts.append(section.offset + start)
+                batch.ends.append(section.offset + end)
+                if len(batch) >= self.batch_size:
+                    stats.chunks += len(batch)
+                    await out.put(batch)
+                    batch = ChunkBatch()
+        if batch.texts:
+            stats.chunks += len(batch)
+            await out.put(batch)
+        await out.put(_DONE)
+
+    async def _embed(self, source: asyncio.Queue, out: asyncio.Queue, stats: IngestStats) -> None:
+        while True:
+            batch = await source.get()
+            if batch is _DONE:
+                break
+            if self.chunk_filter is not None:
+                batch = self.chunk_filter(batch)
+                if not batch.texts:
+                    continue
+            batch.vectors = await self.embedder.embed(batch.texts)
+            stats.embedded += len(batch)
+            await out.put(batch)
+        await out.put(_DONE)
+
+    async def _write(self, source: asyncio.Queue, sink: ChunkSink, stats: IngestStats) -> None:
+        while True:
+            batch = await source.get()
+            if batch is _DONE:
+                break
+            await sink.write(batch)
+            stats.batches += 1
+            if self.on_progress is not None:
+                self.on_progress(stats)
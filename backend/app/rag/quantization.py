@@ -0,0 +1,167 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+_BLOCK_ROWS = 65536
+
+
+def kmeans(vectors: np.ndarray, clusters: int, iterations: int = 12, seed: int = 0) -> np.ndarray:
+    """
+    Euclidean k-means; assignment uses argmax(x.c - |c|^2 / 2) to stay a matrix multiply
+    """
+    rng = np.random.default_rng(seed)
+    clusters = min(clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        order = np.argsort(assignment, kind="stable")
+        members, starts = np.unique(assignment[order], return_index=True)
+        counts = np.diff(np.append(starts, len(order)))
+        centroids[members] = np.add.reduceat(vectors[order], starts, axis=0) / counts[:, None]
+    return centroids.astype(np.float32)
+
+
+class Quantizer(ABC):
+    """
+    Compresses unit vectors into uint8 codes and scores queries against codes
+    """
+    kind: str
+    code_size: int
+
+    @abstractmethod
+    def train(self, vectors: np.ndarray) -> None:
+        ...
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products, shape (len(queries), len(codes))
+        """
+
+    @abstractmethod
+    def save(self, path: str) -> None:
+        ...
+
+    @classmethod
+    def load(cls, path: str) -> "Quantizer":
+        with open(os.path.join(path, "quantizer.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        quantizer = {"int8": ScalarQuantizer, "pq": ProductQuantizer}[meta["kind"]](meta["dimension"], **meta.get("options", {}))
+        quantizer._load_arrays(path)
+        return quantizer
+
+    def _write(self, path: str, arrays: dict, options: Optional[dict] = None) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(os.path.join(path, "quantizer.json"), "w", encoding="utf-8") as fh:
+            json.dump({"kind": self.kind, "dimension": self.dimension, "options": options or {}}, fh)
+
+
+class ScalarQuantizer(Quantizer):
+    """
+    Per-dimension 8-bit quantization: x ~ low + code * step (4x smaller)
+    """
+    kind = "int8"
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.code_size = dimension
+        self.low: Optional[np.ndarray] = None
+        self.step: Optional[np.ndarray] = None
+
+    def train(self, vectors: np.ndarray) -> None:
+        self.low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+        self.step = np.maximum(high - self.low, 1e-6) / 255.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.low) / self.step)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # --- q.x = q.low + (q * step).code, decoded one block at a time ---
+        bias = queries @ self.low
+        scaled = queries * self.step
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for begin in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[begin:begin + _BLOCK_ROWS].astype(np.float32)
+            out[:, begin:begin + len(block)] = scaled @ block.T
+        out += bias[:, None]
+        return out
+
+    def save(self, path: str) -> None:
+        self._write(path, {"low": self.low, "step": self.step})
+
+    def _load_arrays(self, path: str) -> None:
+        self.low = np.load(os.path.join(path, "low.npy"))
+        self.step = np.load(os.path.join(path, "step.npy"))
+
+
+class ProductQuantizer(Quantizer):
+    """
+    Product quantization: the vector is cut into `subvectors` slices and each
+    slice is replaced by the id of its nearest of 256 trained centroids, so a
+    vector costs `subvectors` bytes. Queries are scored with per-slice lookup
+    tables (asymmetric distance computation).
+    """
+    kind = "pq"
+
+    def __init__(self, dimension: int, subvectors: int = 48):
+        if dimension % subvectors:
+            raise ValueError(f"dimension {dimension} is not divisible by {subvectors} subvectors")
+        self.dimension = dimension
+        self.subvectors = subvectors
+        self.code_size = subvectors
+        self.slice = dimension // subvectors
+        self.codebooks: Optional[np.ndarray] = None
+
+    def _slices(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.subvectors, self.slice)
+
+    def train(self, vectors: np.ndarray, max_samples: int = 256 * 64) -> None:
+        if len(vectors) > max_samples:
+            rng = np.random.default_rng(0)
+            vectors = vectors[np.sort(rng.choice(len(vectors), max_samples, replace=False))]
+        parts = self._slices(np.asarray(vectors, dtype=np.float32))
+        self.codebooks = np.stack([kmeans(np.ascontiguousarray(parts[:, j]), 256, seed=j) for j in range(self.subvectors)])
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = self._slices(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for j in range(self.subvectors):
+            codebook = self.codebooks[j]
+            distances = parts[:, j] @ codebook.T - 0.5 * (codebook ** 2).sum(axis=1)
+            codes[:, j] = np.argmax(distances, axis=1)
+        return codes
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # --- tables[q, j, c] = query slice j . centroid c of slice j ---
+        tables = np.einsum("qjs,jcs->qjc", self._slices(queries), self.codebooks)
+        # --- One contiguous gather per slice is much faster than fancy-indexing columns ---
+        columns = np.ascontiguousarray(codes.T)
+        out = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for j in range(self.subvectors):
+            out += np.take(tables[:, j], columns[j], axis=1)
+        return out
+
+    def save(self, path: str) -> None:
+        self._write(path, {"codebooks": self.codebooks}, {"subvectors": self.subvectors})
+
+    def _load_arrays(self, path: str) -> None:
+        self.codebooks = np.load(os.path.join(path, "codebooks.npy"))
+
+
+def build_quantizer(kind: str, dimension: int, subvectors: int) -> Optional[Quantizer]:
+    if kind == "int8":
+        return ScalarQuantizer(dimension)
+    if kind == "pq":
+        return ProductQuantizer(dimension, subvectors)
+    return None
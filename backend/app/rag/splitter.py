@@ -0,0 +1,285 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+Span = Tuple[int, int]
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+_WHITESPACE = re.compile(r"\s")
+
+
+class Tokenizer(Protocol):
+    """
+    Maps text to token end offsets. Returning None means one token per character.
+    """
+
+    def token_ends(self, text: str) -> Optional[Sequence[int]]:
+        ...
+
+
+class CharTokenizer:
+    def token_ends(self, text: str) -> Optional[Sequence[int]]:
+        return None
+
+
+class RegexTokenizer:
+    """
+    Approximate word-piece tokenizer: words and individual punctuation marks
+    """
+
+    def __init__(self, pattern: str = r"\w+|[^\w\s]"):
+        self._pattern = re.compile(pattern)
+
+    def token_ends(self, text: str) -> Optional[Sequence[int]]:
+        return [match.end() for match in self._pattern.finditer(text)]
+
+
+class TiktokenTokenizer:
+    """
+    Exact BPE token offsets via tiktoken (optional dependency)
+    """
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken
+
+        self._encoding = tiktoken.get_encoding(encoding)
+
+    def token_ends(self, text: str) -> Optional[Sequence[int]]:
+        tokens = self._encoding.encode(text, disallowed_special=())
+        _, starts = self._encoding.decode_with_offsets(tokens)
+        return starts[1:] + [len(text)]
+
+
+class TextSplitter:
+    """
+    Recursive-separator splitter that works on offsets.
+
+    Each document is tokenized at most once; chunk boundaries are found with
+    `str.rfind` inside the current budget window, so no intermediate strings
+    are built. Chunks come back as (start, end) offsets into the source text.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = settings.CHUNK_SIZE,
+        chunk_overlap: int = settings.CHUNK_OVERLAP,
+        separators: Sequence[str] = DEFAULT_SEPARATORS,
+        tokenizer: Optional[Tokenizer] = None,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+        self.tokenizer = tokenizer or CharTokenizer()
+
+    def split(self, text: str) -> List[Span]:
+        length = len(text)
+        ends = self.tokenizer.token_ends(text)
+        spans: List[Span] = []
+
+        start = _skip_space(text, 0, length)
+        previous_cut = 0
+        previous_end = 0
+        while start < length:
+            limit = self._window_end(ends, start, length)
+            # --- Cuts always move past the previous one, even inside an overlap ---
+            floor = max(start, previous_cut)
+            cut = limit if limit >= length else self._find_cut(text, floor, limit)
+            previous_cut = cut
+
+            end = cut
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            # --- A cut past only whitespace would repeat a piece of the previous chunk ---
+            if end > start and end > previous_end:
+                spans.append((start, end))
+                previous_end = end
+            if cut >= length:
+                break
+
+            next_start = self._overlap_start(text, ends, start, cut)
+            start = _skip_space(text, next_start, length)
+        return spans
+
+    def split_batch(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Split many documents; returns columnar (document index, start, end) arrays
+        """
+        documents: List[int] = []
+        starts: List[int] = []
+        ends: List[int] = []
+        for index, text in enumerate(texts):
+            for start, end in self.split(text):
+                documents.append(index)
+                starts.append(start)
+                ends.append(end)
+        return (
+            np.asarray(documents, dtype=np.int64),
+            np.asarray(starts, dtype=np.int64),
+            np.asarray(ends, dtype=np.int64),
+        )
+
+    def _window_end(self, ends: Optional[Sequence[int]], start: int, length: int) -> int:
+        """
+        Furthest offset such that [start, offset) stays within chunk_size tokens
+        """
+        if ends is None:
+            return min(start + self.chunk_size, length)
+        last = bisect_right(ends, start) + self.chunk_size - 1
+        return length if last >= len(ends) else ends[last]
+
+    def _find_cut(self, text: str, floor: int, limit: int) -> int:
+        # --- Highest-priority separator wins, as in a recursive splitter ---
+        for separator in self.separators:
+            position = text.rfind(separator, floor + 1, limit)
+            if position > floor:
+                return position + len(separator)
+        return limit
+
+    def _overlap_start(self, text: str, ends: Optional[Sequence[int]], start: int, cut: int) -> int:
+        if self.chunk_overlap <= 0:
+            return cut
+        if ends is None:
+            candidate = cut - self.chunk_overlap
+        else:
+            first = bisect_right(ends, cut) - self.chunk_overlap
+            candidate = ends[first - 1] if first > 0 else 0
+        if candidate <= start:
+            return cut
+        # --- Start the overlap on a word boundary (any whitespace, not only spaces) ---
+        space = _WHITESPACE.search(text, candidate, cut)
+        return space.end() if space is not None else candidate
+
+
+class ContentDefinedSplitter(TextSplitter):
+    """
+    Splitter whose boundaries depend only on nearby content.
+
+    Cut candidates are word starts; a candidate becomes a cut when a rolling
+    hash of the `window` characters before it matches a fixed pattern. An
+    edit therefore only moves the cuts around it, and every later chunk keeps
+    the same text (and hash), which is what incremental re-indexing relies on.
+
+    Cuts are kept between a quarter and all of `chunk_size - chunk_overlap`
+    characters apart; if no candidate in that range matches, the one with
+    the lowest hash is used, which is still decided by content. Sizes are in
+    characters.
+    """
+
+    _BASE = 0x100000001B3
+    _AVERAGE_WORD = 6
+
+    def __init__(
+        self,
+        chunk_size: int = settings.CHUNK_SIZE,
+        chunk_overlap: int = settings.CHUNK_OVERLAP,
+        window: int = 16,
+    ):
+        super().__init__(chunk_size, chunk_overlap)
+        self.window = window
+        self.max_step = chunk_size - chunk_overlap
+        self.min_step = max(1, self.max_step // 4)
+        # --- Aim for cuts ~60% of the way through the allowed range ---
+        target = int(0.6 * self.max_step) - self.min_step
+        self.divisor = max(1, target // self._AVERAGE_WORD)
+
+    def _candidates(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Word-start offsets and the hash of the window preceding each
+        """
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        length = len(codes)
+        space = np.isin(codes, np.array([9, 10, 11, 12, 13, 32, 0xA0], dtype=np.uint64))
+        positions = np.flatnonzero(space[:-1] & ~space[1:]) + 1
+
+        # --- Polynomial hash mod 2^64: window(p) = sum a_j * B^(p - j), from prefix sums ---
+        with np.errstate(over="ignore"):
+            base = np.uint64(self._BASE)
+            inverse = np.uint64(pow(self._BASE, -1, 2 ** 64))
+            powers = np.cumprod(np.full(length + 1, base, dtype=np.uint64))
+            powers = np.concatenate(([np.uint64(1)], powers[:-1]))
+            inverse_powers = np.cumprod(np.full(length, inverse, dtype=np.uint64))
+            inverse_powers = np.concatenate(([np.uint64(1)], inverse_powers[:-1]))
+            prefix = np.concatenate(([np.uint64(0)], np.cumsum(codes * inverse_powers, dtype=np.uint64)))
+            lower = np.maximum(positions - self.window, 0)
+            hashes = (prefix[positions] - prefix[lower]) * powers[positions]
+            # --- Final mix so low bits depend on every character ---
+            hashes ^= hashes >> np.uint64(31)
+            hashes *= np.uint64(0xBF58476D1CE4E5B9)
+            hashes ^= hashes >> np.uint64(29)
+        return positions, hashes
+
+    def split(self, text: str) -> List[Span]:
+        length = len(text)
+        if length <= self.chunk_size:
+            start, end = _skip_space(text, 0, length), length
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            return [(start, end)] if end > start else []
+
+        positions, hashes = self._candidates(text)
+        matches = np.flatnonzero(hashes % np.uint64(self.divisor) == 0)
+        spans: List[Span] = []
+        previous_cut = 0
+        previous_start = previous_end = 0
+        while previous_cut < length:
+            if length - previous_cut <= self.max_step:
+                cut = length
+            else:
+                low = np.searchsorted(positions, previous_cut + self.min_step, "left")
+                high = np.searchsorted(positions, previous_cut + self.max_step, "right")
+                first_match = np.searchsorted(matches, low, "left")
+                if first_match < len(matches) and matches[first_match] < high:
+                    cut = int(positions[matches[first_match]])
+                elif high > low:
+                    cut = int(positions[low + int(np.argmin(hashes[low:high]))])
+                else:
+                    cut = previous_cut + self.max_step
+
+            start = self._overlap_start(text, None, previous_start, previous_cut) if previous_cut else 0
+            start = _skip_space(text, start, cut)
+            end = cut
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start and end > previous_end:
+                spans.append((start, end))
+                previous_start, previous_end = start, end
+            previous_cut = cut
+        return spans
+
+
+def _skip_space(text: str, position: int, length: int) -> int:
+    while position < length and text[position].isspace():
+        position += 1
+    return position
+
+
+def build_tokenizer(name: str) -> Tokenizer:
+    """
+    Tokenizer by name: char | regex | tiktoken
+    """
+    tokenizers = {
+        "char": CharTokenizer,
+        "regex": RegexTokenizer,
+        "tiktoken": TiktokenTokenizer,
+    }
+    return tokenizers[name]()
+
+
+def get_splitter() -> TextSplitter:
+    """
+    Build the splitter configured by SPLITTER_MODE, CHUNK_SIZE, CHUNK_OVERLAP
+    and SPLITTER_TOKENIZER (recursive mode only)
+    """
+    if settings.SPLITTER_MODE == "content_defined":
+        return ContentDefinedSplitter(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    tokenizer = build_tokenizer(settings.SPLITTER_TOKENIZER)
+    return TextSplitter(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP, tokenizer=tokenizer)
@@ -0,0 +1,47 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Return float32 rows scaled to unit length (zero rows stay zero)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a (queries, candidates) score matrix, best first
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidate_scores, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], k: int, constant: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse ranked row lists (best first, -1 padded): score(row) = sum 1 / (constant + rank)
+    """
+    rows = np.concatenate([ranking[ranking >= 0] for ranking in rankings] or [np.zeros(0, dtype=np.int64)])
+    if not len(rows):
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    weights = np.concatenate(
+        [1.0 / (constant + 1 + np.arange(int((ranking >= 0).sum()))) for ranking in rankings]
+    )
+    unique, inverse = np.unique(rows, return_inverse=True)
+    fused = np.bincount(inverse, weights=weights).astype(np.float32)
+    order = np.argsort(-fused, kind="stable")[:k]
+    return fused[order], unique[order]
@@ -0,0 +1,1745 @@
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.rag.bm25 import BM25Index, CollectionStats, tokenize
+from app.rag.ivf import IVFIndex
+from app.rag.quantization import Quantizer, build_quantizer
+from app.rag.vector_ops import normalize, reciprocal_rank_fusion, top_k
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_MIN_CAPACITY = 1024
+_BLOCK = 65536
+# --- Files of a store saved before segments; they become its first segment ---
+_LEGACY_FILES = (
+    "vectors.f32", "text.bin", "document_codes.npy", "starts.npy", "ends.npy", "text_offsets.npy", "codes.npy", "ivf", "bm25",
+)
+
+
+@dataclass
+class SearchHit:
+    row: int
+    score: float
+    document_id: str
+    start: int
+    end: int
+    text: str
+
+
+@dataclass(eq=False)
+class Segment:
+    """
+    Immutable run of rows, sealed from the memtable or written by compaction.
+
+    Columns, vectors, codes and text are memory-mapped from the segment's
+    directory. Rows keep the global ids they were given on insert: a sealed
+    segment holds the contiguous range from `base`, a compacted one lists
+    its surviving ids in `rows`. Deletes and moved offsets are not written
+    here but kept by the IndexVersion referencing the segment. A view of
+    the memtable has the same shape (with no `segment_id`), so readers
+    treat both alike.
+    """
+    segment_id: Optional[int]
+    base: int
+    size: int
+    vectors: np.ndarray
+    document_codes: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    text_offsets: np.ndarray
+    text: np.ndarray
+    rows: Optional[np.ndarray] = None
+    codes: Optional[np.ndarray] = None
+    quantizer: Optional[Quantizer] = None
+    ann: Optional[IVFIndex] = None
+    lexical: Optional[BM25Index] = None
+    path: Optional[str] = None
+    # --- Per-document packed row bitmaps and the codes present, built on first use ---
+    bitmaps: Dict[int, np.ndarray] = field(default_factory=dict, repr=False)
+    present: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def first(self) -> int:
+        return int(self.rows[0]) if self.rows is not None else self.base
+
+    def global_rows(self, positions: np.ndarray) -> np.ndarray:
+        positions = np.asarray(positions, dtype=np.int64)
+        return np.asarray(self.rows[positions]) if self.rows is not None else positions + self.base
+
+    def positions(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Position of each global row in this segment, -1 where it is not here
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.rows is None:
+            positions = rows - self.base
+            return np.where((positions >= 0) & (positions < self.size), positions, -1)
+        if not self.size:
+            return np.full(len(rows), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self.rows, rows), self.size - 1)
+        return np.where(self.rows[found] == rows, found, -1)
+
+    def text_at(self, position: int) -> str:
+        begin, end = int(self.text_offsets[position]), int(self.text_offsets[position + 1])
+        return self.text[begin:end].tobytes().decode("utf-8")
+
+    def documents(self) -> np.ndarray:
+        if self.present is None:
+            self.present = np.unique(self.document_codes[: self.size])
+        return self.present
+
+    def union(self, codes: np.ndarray) -> np.ndarray:
+        union = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for code in codes.tolist():
+            bitmap = self.bitmaps.get(code)
+            if bitmap is None:
+                bitmap = self.bitmaps[code] = np.packbits(self.document_codes[: self.size] == code)
+            union |= bitmap
+        return union
+
+
+class Memtable:
+    """
+    Mutable buffer for new rows, read through prefix views.
+
+    Rows are only appended: `add` writes past the current size (into grown
+    copies when full) before raising it, and `view` slices every buffer at
+    the size it sees, so a reader holding a view never sees a row being
+    written. The BM25 index is shared by all views and searched with the
+    view's size as its limit.
+    """
+
+    def __init__(self, base: int, dimension: int, lexical: bool):
+        self.base = base
+        self.size = 0
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.document_codes = np.zeros(0, dtype=np.int32)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64)
+        self.text_offsets = np.zeros(1, dtype=np.int64)
+        self.text = np.zeros(0, dtype=np.uint8)
+        self.lexical: Optional[BM25Index] = BM25Index() if lexical else None
+
+    def add(
+        self,
+        code: int,
+        vectors: np.ndarray,
+        starts: Sequence[int],
+        ends: Sequence[int],
+        texts: Sequence[str],
+        encoded: Sequence[bytes],
+    ) -> None:
+        begin, end = self.size, self.size + len(vectors)
+        if end > len(self.document_codes):
+            capacity = max(end, 2 * len(self.document_codes), _MIN_CAPACITY)
+            self.vectors = _grow(self.vectors, begin, (capacity, self.vectors.shape[1]))
+            self.document_codes = _grow(self.document_codes, begin, (capacity,))
+            self.starts = _grow(self.starts, begin, (capacity,))
+            self.ends = _grow(self.ends, begin, (capacity,))
+            self.text_offsets = _grow(self.text_offsets, begin + 1, (capacity + 1,))
+        blob = b"".join(encoded)
+        text_begin = int(self.text_offsets[begin])
+        text_end = text_begin + len(blob)
+        if text_end > len(self.text):
+            self.text = _grow(self.text, text_begin, (max(text_end, 2 * len(self.text), 1 << 16),))
+        self.text[text_begin:text_end] = np.frombuffer(blob, dtype=np.uint8)
+        self.vectors[begin:end] = vectors
+        self.document_codes[begin:end] = code
+        self.starts[begin:end] = starts
+        self.ends[begin:end] = ends
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+        self.text_offsets[begin + 1:end + 1] = text_begin + np.cumsum(lengths)
+        if self.lexical is not None:
+            self.lexical.add(np.arange(begin, end, dtype=np.int64), texts)
+        self.size = end
+
+    def view(self) -> Segment:
+        size = self.size
+        return Segment(
+            segment_id=None,
+            base=self.base,
+            size=size,
+            vectors=self.vectors[:size],
+            document_codes=self.document_codes[:size],
+            starts=self.starts[:size],
+            ends=self.ends[:size],
+            text_offsets=self.text_offsets[: size + 1],
+            text=self.text,
+            lexical=self.lexical,
+        )
+
+
+@dataclass(frozen=True)
+class _SegmentState:
+    segment: Segment
+    tombstones: Optional[np.ndarray]
+    live: int
+    lexical_length: int
+
+
+def _unpack(tombstones: Optional[np.ndarray], size: int) -> np.ndarray:
+    """
+    Deleted-row mask of a segment; rows past the end of the bitmap are live
+    """
+    deleted = np.zeros(size, dtype=bool)
+    if tombstones is not None:
+        bits = np.unpackbits(tombstones, count=min(size, 8 * len(tombstones))).view(bool)
+        deleted[: len(bits)] = bits
+    return deleted
+
+
+def _state(segment: Segment, tombstones: Optional[np.ndarray] = None) -> _SegmentState:
+    deleted = _unpack(tombstones, segment.size)
+    lexical_length = 0
+    if segment.lexical is not None and segment.size:
+        lengths = segment.lexical.lengths()[: segment.size]
+        lexical_length = int(lengths[~deleted[: len(lengths)]].sum())
+    return _SegmentState(segment, tombstones, segment.size - int(deleted.sum()), lexical_length)
+
+
+@dataclass(frozen=True)
+class IndexVersion:
+    """
+    Immutable snapshot of a store, searched without locks.
+
+    `parts` are the sealed segments in row order followed by a view of the
+    memtable, each with its packed tombstone bitmap (one bit per deleted
+    row); `moved` maps rows to the offsets set after they were written;
+    `pending` lists rows written by a staged ingest, which search skips
+    until `commit_rows` makes them visible.
+    Writers never modify a version: they build the next one and swap the
+    store's reference, so a reader sees one consistent index for as long
+    as it holds it.
+    """
+    number: int
+    parts: Tuple[_SegmentState, ...]
+    moved: Dict[int, Tuple[int, int]]
+    firsts: np.ndarray
+    pending: np.ndarray
+
+    @classmethod
+    def build(
+        cls,
+        number: int,
+        parts: Sequence[_SegmentState],
+        moved: Dict[int, Tuple[int, int]],
+        pending: Optional[np.ndarray] = None,
+    ) -> "IndexVersion":
+        parts = tuple(parts)
+        firsts = np.array([part.segment.first for part in parts], dtype=np.int64)
+        return cls(number, parts, moved, firsts, np.zeros(0, dtype=np.int64) if pending is None else pending)
+
+    @property
+    def size(self) -> int:
+        return sum(part.segment.size for part in self.parts)
+
+    @property
+    def live_count(self) -> int:
+        return sum(part.live for part in self.parts)
+
+    def find(self, row: int) -> Tuple[Segment, int]:
+        index = int(np.searchsorted(self.firsts, row, side="right")) - 1
+        if index >= 0:
+            segment = self.parts[index].segment
+            position = int(segment.positions(np.array([row]))[0])
+            if position >= 0:
+                return segment, position
+        raise KeyError(f"Row {row} is not in the index")
+
+    def locate(self, rows: np.ndarray) -> Iterator[Tuple[Segment, np.ndarray, np.ndarray]]:
+        """
+        (segment, indexes into `rows`, positions in the segment) for every segment holding some of `rows`
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        owners = np.searchsorted(self.firsts, rows, side="right") - 1
+        for index in np.unique(owners[owners >= 0]).tolist():
+            selected = np.flatnonzero(owners == index)
+            segment = self.parts[index].segment
+            positions = segment.positions(rows[selected])
+            found = positions >= 0
+            yield segment, selected[found], positions[found]
+
+
+class VectorStore:
+    """
+    In-process vector store built from immutable segments.
+
+    New rows go to a small mutable memtable, which is sealed into a segment
+    once it holds VECTOR_MEMTABLE_ROWS rows or the store is saved. A segment
+    keeps its unit-length embeddings in one memory-mapped float32 matrix,
+    so cosine similarity is a matrix multiply, with per-chunk metadata in
+    mapped columns and chunk text in a mapped blob. Deletes set bits in a
+    per-segment tombstone bitmap. Row ids are global and never reused, and
+    compaction keeps them, so manifests can go on referring to rows.
+
+    Every change publishes a new IndexVersion. Readers take the current one
+    without a lock, search each of its segments and merge the per-segment
+    top-k; writers are serialized among themselves but never block readers.
+    `compact` merges runs of small adjacent segments and rewrites segments
+    with many deleted rows, purging their tombstones; PartitionedVectorStore
+    runs it in the background.
+
+    With VECTOR_COMPRESSION set, segments also store rows as int8 or PQ
+    codes: candidates are scored on the codes and only a short list is
+    re-ranked against the full-precision rows. With VECTOR_INDEX=ivf,
+    segments of at least ANN_MIN_ROWS rows get an IVF index. With
+    LEXICAL_INDEX, chunk text is indexed for BM25, scored with statistics
+    of the whole store so rankings from different segments compare, and
+    `hybrid_search` fuses both rankings with reciprocal-rank fusion.
+
+    Document filters are applied before scoring as packed bitmaps, built
+    once per document and segment: a filter ORs the smaller of the selected
+    or excluded documents present in the segment into one mask.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dimension: int = settings.EMBEDDING_DIM,
+        index_type: str = settings.VECTOR_INDEX,
+        compression: str = settings.VECTOR_COMPRESSION,
+        memtable_rows: int = settings.VECTOR_MEMTABLE_ROWS,
+    ):
+        self.path = path
+        self.dimension = dimension
+        self.index_type = index_type
+        self.compression = compression
+        self.memtable_rows = memtable_rows
+        self.lexical = settings.LEXICAL_INDEX
+        # --- Codes of every segment come from one trained quantizer; a new one gets a new generation ---
+        self._quantizer: Optional[Quantizer] = None
+        self._quantizer_generation = 0
+        # --- Document id <-> code; only appended to, so readers use it without a lock ---
+        self._documents: List[str] = []
+        self._document_index: Dict[str, int] = {}
+        # --- Writers are serialized; compaction and retraining replace segments one at a time ---
+        self._write_lock = threading.RLock()
+        self._maintenance_lock = threading.Lock()
+        self._next_segment = 0
+        self._generation = 0
+        self._retired: List[str] = []
+        self.compactions = 0
+        self.dirty = False
+
+        os.makedirs(self._file("segments"), exist_ok=True)
+        self._memtable = Memtable(0, dimension, self.lexical)
+        self._version = IndexVersion.build(0, [_state(self._memtable.view())], {})
+        meta = self._read_meta()
+        if meta is not None:
+            if "segments" not in meta:
+                meta = self._convert_legacy(meta)
+            self._load(meta)
+
+    def __len__(self) -> int:
+        return self._version.size
+
+    @property
+    def live_count(self) -> int:
+        return self._version.live_count
+
+    @property
+    def version(self) -> IndexVersion:
+        return self._version
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.path, "segments", f"{segment_id:06d}")
+
+    # --- Writes ---
+
+    def _publish(
+        self,
+        parts: Sequence[_SegmentState],
+        moved: Optional[Dict[int, Tuple[int, int]]] = None,
+        pending: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Swap in the next version (write lock held)
+        """
+        current = self._version
+        self._version = IndexVersion.build(
+            current.number + 1,
+            parts,
+            current.moved if moved is None else moved,
+            current.pending if pending is None else pending,
+        )
+
+    def _document_code(self, document_id: str) -> int:
+        code = self._document_index.get(document_id)
+        if code is None:
+            code = len(self._documents)
+            self._documents.append(document_id)
+            self._document_index[document_id] = code
+        return code
+
+    def add(
+        self,
+        document_id: str,
+        vectors: np.ndarray,
+        starts: Sequence[int],
+        ends: Sequence[int],
+        texts: Sequence[str],
+        pending: bool = False,
+    ) -> np.ndarray:
+        """
+        Append chunks for a document; returns their row ids.
+
+        Pending rows are stored but left out of search until `commit_rows`.
+        """
+        vectors = normalize(vectors)
+        count = vectors.shape[0]
+        if count == 0:
+            return np.zeros(0, dtype=np.int64)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-d vectors, got {vectors.shape[1]}")
+
+        encoded = [text.encode("utf-8") for text in texts]
+        with self._write_lock:
+            memtable = self._memtable
+            begin = memtable.base + memtable.size
+            memtable.add(self._document_code(document_id), vectors, starts, ends, texts, encoded)
+            version = self._version
+            rows = np.arange(begin, begin + count, dtype=np.int64)
+            self._publish(
+                version.parts[:-1] + (_state(memtable.view(), version.parts[-1].tombstones),),
+                pending=np.concatenate([version.pending, rows]) if pending else None,
+            )
+            self.dirty = True
+            if memtable.size >= self.memtable_rows:
+                self._seal()
+        return rows
+
+    def _seal(self) -> None:
+        """
+        Write the memtable's live rows as a segment and start an empty memtable (write lock held)
+        """
+        memtable = self._memtable
+        if not memtable.size:
+            return
+        version = self._version
+        current = version.parts[-1]
+        kept = np.flatnonzero(~_unpack(current.tombstones, current.segment.size))
+        segment = self._write_segment(self._allocate_segment(), [(current.segment, kept)], version.moved)
+        self._memtable = Memtable(memtable.base + memtable.size, self.dimension, self.lexical)
+        parts = list(version.parts[:-1])
+        if segment is not None:
+            parts.append(_state(segment))
+        parts.append(_state(self._memtable.view()))
+        self._publish(parts, _fold(version.moved, version.moved, [current.segment]))
+
+    def delete_document(self, document_id: str) -> int:
+        """
+        Mark every chunk of a document as deleted; returns how many were removed
+        """
+        with self._write_lock:
+            return self.delete_rows(self.document_rows(document_id))
+
+    def delete_rows(self, rows: np.ndarray) -> int:
+        """
+        Tombstone individual rows (e.g. chunks removed by an edit)
+        """
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        if not len(rows):
+            return 0
+        with self._write_lock:
+            version = self._version
+            parts, removed = _tombstoned(version.parts, rows)
+            if removed:
+                self._publish(parts, pending=_without(version.pending, rows))
+                self.dirty = True
+        return removed
+
+    def commit_rows(
+        self,
+        added: np.ndarray,
+        removed: np.ndarray,
+        moved: Optional[Tuple[np.ndarray, Sequence[int], Sequence[int]]] = None,
+    ) -> int:
+        """
+        Swap in a new version of a document as one index version: pending
+        `added` rows become searchable, `removed` rows are tombstoned and
+        kept rows move to their (rows, starts, ends) offsets, so no reader
+        sees a mix of old and new chunks. Returns how many rows were removed.
+        """
+        added = np.asarray(added, dtype=np.int64)
+        removed = np.unique(np.asarray(removed, dtype=np.int64))
+        with self._write_lock:
+            version = self._version
+            parts, count = _tombstoned(version.parts, removed)
+            offsets = None
+            if moved is not None and len(moved[0]):
+                rows, starts, ends = moved
+                offsets = dict(version.moved)
+                offsets.update(zip(np.asarray(rows).tolist(), zip(np.asarray(starts).tolist(), np.asarray(ends).tolist())))
+            self._publish(parts, offsets, _without(version.pending, np.concatenate([added, removed])))
+            self.dirty = True
+        return count
+
+    def _allocate_segment(self) -> int:
+        with self._write_lock:
+            segment_id = self._next_segment
+            self._next_segment += 1
+        return segment_id
+
+    def _write_segment(
+        self,
+        segment_id: int,
+        sources: Sequence[Tuple[Segment, np.ndarray]],
+        moved: Dict[int, Tuple[int, int]],
+    ) -> Optional[Segment]:
+        """
+        Write the given rows of each source, in order, as a new segment; None when there are no rows.
+        Vectors, codes and text are copied in blocks, so a merge never holds a whole segment in memory.
+        """
+        sources = [(segment, np.asarray(positions, dtype=np.int64)) for segment, positions in sources if len(positions)]
+        count = sum(len(positions) for _, positions in sources)
+        if not count:
+            return None
+        path = self._segment_path(segment_id)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+        rows = np.concatenate([segment.global_rows(positions) for segment, positions in sources])
+        columns = {
+            "document_codes": np.concatenate([segment.document_codes[positions] for segment, positions in sources]),
+            "starts": np.concatenate([segment.starts[positions] for segment, positions in sources]).astype(np.int64),
+            "ends": np.concatenate([segment.ends[positions] for segment, positions in sources]).astype(np.int64),
+        }
+        if moved:
+            moved_rows = np.fromiter(moved, dtype=np.int64, count=len(moved))
+            found = np.searchsorted(rows, moved_rows)
+            here = found < count
+            here[here] = rows[found[here]] == moved_rows[here]
+            offsets = np.array(list(moved.values()), dtype=np.int64).reshape(-1, 2)
+            columns["starts"][found[here]] = offsets[here, 0]
+            columns["ends"][found[here]] = offsets[here, 1]
+        lengths = np.concatenate([
+            segment.text_offsets[positions + 1] - segment.text_offsets[positions] for segment, positions in sources
+        ])
+        columns["text_offsets"] = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        if int(rows[-1] - rows[0]) != count - 1:
+            columns["rows"] = rows
+        for name, array in columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+
+        quantizer = self._quantizer
+        vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="w+", shape=(count, self.dimension))
+        codes = None
+        if quantizer is not None:
+            codes = np.lib.format.open_memmap(
+                os.path.join(path, f"codes-{self._quantizer_generation}.npy"),
+                mode="w+", dtype=np.uint8, shape=(count, quantizer.code_size),
+            )
+        with open(os.path.join(path, "text.bin"), "wb") as text_file:
+            at = 0
+            for segment, positions in sources:
+                for begin in range(0, len(positions), _BLOCK):
+                    block = positions[begin:begin + _BLOCK]
+                    end = at + len(block)
+                    vectors[at:end] = segment.vectors[block]
+                    if codes is not None:
+                        if segment.quantizer is quantizer and segment.codes is not None:
+                            codes[at:end] = segment.codes[block]
+                        else:
+                            codes[at:end] = quantizer.encode(np.asarray(vectors[at:end]))
+                    text_file.write(_gather_text(segment, block))
+                    at = end
+        vectors.flush()
+        if codes is not None:
+            codes.flush()
+        if self.lexical:
+            BM25Index.merge([(segment.lexical, positions) for segment, positions in sources]).save(
+                os.path.join(path, "bm25")
+            )
+        if self.index_type == "ivf" and count >= settings.ANN_MIN_ROWS:
+            ann = IVFIndex(nlist=settings.IVF_NLIST, nprobe=settings.IVF_NPROBE)
+            ann.train(vectors, np.arange(count))
+            ann.save(os.path.join(path, "ivf"))
+        del vectors, codes
+        # --- Written last: a directory without it is an interrupted write, removed on load ---
+        _write_json(os.path.join(path, "segment.json"), {"base": int(rows[0]), "size": count})
+        return self._open_segment(segment_id)
+
+    # --- Maintenance ---
+
+    def _quantizer_due(self) -> bool:
+        return (
+            self._quantizer is None
+            and self.compression != "none"
+            and self.live_count >= settings.COMPRESSION_MIN_ROWS
+        )
+
+    def needs_compaction(self) -> bool:
+        version = self._version
+        if self._quantizer_due() or self._plan(version) is not None:
+            return True
+        return self._quantizer is not None and any(
+            part.segment.quantizer is not self._quantizer for part in version.parts[:-1]
+        )
+
+    def compact(self, full: bool = False) -> int:
+        """
+        Merge segments until the policy finds nothing left to do; returns the
+        number of merges. Also trains the quantizer once the store is big
+        enough and encodes segments that lack codes. With `full`, merges
+        adjacent segments as far as VECTOR_SEGMENT_MAX_ROWS allows and purges
+        every tombstone.
+        """
+        with self._maintenance_lock:
+            if self._quantizer_due():
+                self._train_quantizer()
+            self._encode_segments()
+            return self._compact(full)
+
+    def _compact(self, full: bool) -> int:
+        merges = 0
+        while True:
+            version = self._version
+            plan = self._plan(version, full)
+            if plan is None:
+                break
+            self._merge(version, *plan)
+            merges += 1
+        if merges:
+            self.compactions += merges
+            with self._write_lock:
+                self._write_meta()
+        return merges
+
+    def _tier(self, rows: int) -> int:
+        factor = settings.VECTOR_MERGE_FACTOR
+        return max(0, int(math.log(max(rows, 1) / self.memtable_rows, factor)))
+
+    def _plan(self, version: IndexVersion, full: bool = False) -> Optional[Tuple[int, int]]:
+        """
+        Next run of sealed segments to merge, as (begin, end) indexes into `version.parts`.
+
+        A segment whose deleted share reaches VECTOR_COMPACTION_DELETED_RATIO
+        is rewritten on its own; otherwise VECTOR_MERGE_FACTOR adjacent
+        segments of the same size tier are merged (tier t holds segments of
+        memtable_rows * factor^t rows and up), as long as the result stays
+        under VECTOR_SEGMENT_MAX_ROWS. Only adjacent segments are merged, so
+        every segment keeps covering its own range of row ids.
+        """
+        sealed = version.parts[:-1]
+        limit = settings.VECTOR_SEGMENT_MAX_ROWS
+        if full:
+            begin = 0
+            while begin < len(sealed):
+                end, rows = begin, 0
+                while end < len(sealed) and rows + sealed[end].live <= limit:
+                    rows += sealed[end].live
+                    end += 1
+                end = max(end, begin + 1)
+                if end - begin > 1 or sealed[begin].live < sealed[begin].segment.size:
+                    return begin, end
+                begin = end
+            return None
+        for index, state in enumerate(sealed):
+            deleted = state.segment.size - state.live
+            if deleted and deleted >= settings.VECTOR_COMPACTION_DELETED_RATIO * state.segment.size:
+                return index, index + 1
+        factor = settings.VECTOR_MERGE_FACTOR
+        tiers = [self._tier(state.live) for state in sealed]
+        for begin in range(len(sealed) - factor + 1):
+            window = tiers[begin:begin + factor]
+            if window.count(window[0]) == factor and sum(s.live for s in sealed[begin:begin + factor]) <= limit:
+                return begin, begin + factor
+        return None
+
+    def _merge(self, version: IndexVersion, begin: int, end: int) -> None:
+        """
+        Write the live rows of parts[begin:end] as one segment, then swap it in (maintenance lock held).
+
+        The merge reads only the snapshot, so writers carry on meanwhile;
+        rows they delete from the inputs in the meantime are tombstoned in
+        the merged segment when it is swapped in.
+        """
+        states = version.parts[begin:end]
+        sources = [
+            (state.segment, np.flatnonzero(~_unpack(state.tombstones, state.segment.size))) for state in states
+        ]
+        merged = self._write_segment(self._allocate_segment(), sources, version.moved)
+        with self._write_lock:
+            current = self._version
+            index = next(i for i, part in enumerate(current.parts) if part.segment is states[0].segment)
+            now = current.parts[index:index + len(states)]
+            tombstones = None
+            if merged is not None:
+                deleted = [
+                    state.segment.global_rows(np.flatnonzero(
+                        _unpack(later.tombstones, state.segment.size) & ~_unpack(state.tombstones, state.segment.size)
+                    ))
+                    for state, later in zip(states, now)
+                    if later.tombstones is not state.tombstones
+                ]
+                if deleted:
+                    positions = merged.positions(np.concatenate(deleted))
+                    mask = np.zeros(merged.size, dtype=bool)
+                    mask[positions[positions >= 0]] = True
+                    tombstones = np.packbits(mask) if mask.any() else None
+            parts = list(current.parts[:index])
+            if merged is not None:
+                parts.append(_state(merged, tombstones))
+            parts.extend(current.parts[index + len(states):])
+            self._publish(parts, _fold(current.moved, version.moved, [state.segment for state in states]))
+            self._retired.extend(state.segment.path for state in states)
+
+    def _swap(self, replacements: Dict[Segment, Segment]) -> None:
+        """
+        Publish a version with segments replaced by rebuilt copies of the same rows (write lock held)
+        """
+        self._publish([
+            replace(part, segment=replacements[part.segment]) if part.segment in replacements else part
+            for part in self._version.parts
+        ])
+
+    def train_quantizer(self, sample_size: int = 65536) -> None:
+        """
+        Fit a new quantizer on a sample of live rows and encode every segment with it
+        """
+        if self.compression == "none":
+            return
+        with self._maintenance_lock:
+            with self._write_lock:
+                self._seal()
+            self._train_quantizer(sample_size)
+            self._encode_segments()
+            with self._write_lock:
+                self._write_meta()
+
+    def _train_quantizer(self, sample_size: int = 65536) -> None:
+        sample = self._sample(self._version, sample_size)
+        if not len(sample):
+            return
+        quantizer = build_quantizer(self.compression, self.dimension, settings.PQ_SUBVECTORS)
+        quantizer.train(sample)
+        quantizer.save(self._file(f"quantizer-{self._quantizer_generation + 1}"))
+        with self._write_lock:
+            self._quantizer = quantizer
+            self._quantizer_generation += 1
+
+    def _sample(self, version: IndexVersion, size: int) -> np.ndarray:
+        live = [np.flatnonzero(~_unpack(part.tombstones, part.segment.size)) for part in version.parts]
+        total = sum(len(positions) for positions in live)
+        if not total:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        picks = np.sort(np.random.default_rng(0).choice(total, min(size, total), replace=False))
+        bounds = np.cumsum([0] + [len(positions) for positions in live])
+        blocks = []
+        for part, positions, begin, end in zip(version.parts, live, bounds[:-1], bounds[1:]):
+            chosen = picks[(picks >= begin) & (picks < end)] - begin
+            if len(chosen):
+                blocks.append(np.asarray(part.segment.vectors[positions[chosen]]))
+        return np.concatenate(blocks)
+
+    def _encode_segments(self) -> None:
+        """
+        Write codes for sealed segments not yet encoded with the current quantizer (maintenance lock held)
+        """
+        quantizer = self._quantizer
+        if quantizer is None:
+            return
+        while True:
+            pending = [part.segment for part in self._version.parts[:-1] if part.segment.quantizer is not quantizer]
+            if not pending:
+                return
+            replacements = {}
+            for segment in pending:
+                name = f"codes-{self._quantizer_generation}.npy"
+                codes = np.lib.format.open_memmap(
+                    os.path.join(segment.path, f"{name}.tmp"), mode="w+", dtype=np.uint8,
+                    shape=(segment.size, quantizer.code_size),
+                )
+                for begin in range(0, segment.size, _BLOCK):
+                    codes[begin:begin + _BLOCK] = quantizer.encode(np.asarray(segment.vectors[begin:begin + _BLOCK]))
+                codes.flush()
+                del codes
+                os.replace(os.path.join(segment.path, f"{name}.tmp"), os.path.join(segment.path, name))
+                for stale in os.listdir(segment.path):
+                    if stale.startswith("codes-") and stale != name:
+                        os.remove(os.path.join(segment.path, stale))
+                replacements[segment] = replace(
+                    segment, codes=_mapped(os.path.join(segment.path, name)), quantizer=quantizer
+                )
+            with self._write_lock:
+                self._swap(replacements)
+
+    def train_index(self) -> None:
+        """
+        Merge segments as far as VECTOR_SEGMENT_MAX_ROWS allows and (re)build each one's approximate index
+        """
+        if self.index_type != "ivf":
+            return
+        with self._maintenance_lock:
+            with self._write_lock:
+                self._seal()
+            self._compact(full=True)
+            replacements = {}
+            for part in self._version.parts[:-1]:
+                live = np.flatnonzero(~_unpack(part.tombstones, part.segment.size))
+                if not len(live):
+                    continue
+                ann = IVFIndex(nlist=settings.IVF_NLIST, nprobe=settings.IVF_NPROBE)
+                ann.train(part.segment.vectors, live)
+                ann.save(os.path.join(part.segment.path, "ivf"))
+                replacements[part.segment] = replace(part.segment, ann=ann)
+            with self._write_lock:
+                self._swap(replacements)
+
+    @property
+    def compressed(self) -> bool:
+        return any(part.segment.codes is not None for part in self._version.parts)
+
+    def memory_stats(self) -> Dict[str, object]:
+        """
+        Bytes held by the full-precision rows vs the compressed codes
+        """
+        version = self._version
+        rows = version.size
+        vector_bytes = rows * self.dimension * 4
+        code_bytes = sum(part.segment.codes.nbytes for part in version.parts if part.segment.codes is not None)
+        return {
+            "rows": rows,
+            "compression": self.compression if code_bytes else "none",
+            "vector_bytes": vector_bytes,
+            "code_bytes": code_bytes,
+            "compression_ratio": round(vector_bytes / code_bytes, 2) if code_bytes else 1.0,
+        }
+
+    def stats(self) -> Dict[str, object]:
+        version = self._version
+        return {
+            "version": version.number,
+            "segments": len(version.parts) - 1,
+            "rows": version.size,
+            "live_rows": version.live_count,
+            "memtable_rows": version.parts[-1].segment.size,
+            "moved_rows": len(version.moved),
+            "pending_rows": len(version.pending),
+            "compactions": self.compactions,
+        }
+
+    # --- Reads ---
+
+    def _selected(self, document_ids: Optional[Sequence[str]]) -> Optional[np.ndarray]:
+        if document_ids is None:
+            return None
+        return np.array([self._document_index[d] for d in document_ids if d in self._document_index], dtype=np.int32)
+
+    def _row_mask(
+        self, state: _SegmentState, selected: Optional[np.ndarray], pending: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """
+        Boolean mask of a segment's rows that are live, not pending and belong to the
+        selected documents; None when every row qualifies, empty when none does
+        """
+        segment = state.segment
+        hidden = segment.positions(pending) if len(pending) else pending
+        hidden = hidden[hidden >= 0]
+        if selected is None and state.tombstones is None and not len(hidden):
+            return None
+        packed = np.full((segment.size + 7) // 8, 0xFF, dtype=np.uint8)
+        if state.tombstones is not None:
+            used = min(len(packed), len(state.tombstones))
+            packed[:used] &= ~state.tombstones[:used]
+        if selected is not None:
+            present = segment.documents()
+            chosen = present[np.isin(present, selected)]
+            if not len(chosen):
+                return np.zeros(0, dtype=bool)
+            if 2 * len(chosen) <= len(present):
+                packed &= segment.union(chosen)
+            else:
+                packed &= ~segment.union(np.setdiff1d(present, chosen))
+        mask = np.unpackbits(packed, count=segment.size).view(bool)
+        mask[hidden] = False
+        return mask
+
+    def search_rows(
+        self,
+        queries: np.ndarray,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched search returning (scores, rows) of shape (len(queries), <=k);
+        rows of -1 pad results when fewer than k matches exist.
+
+        Each segment returns its own top-k and the results are merged. Within
+        a segment, exact search is one (queries x rows) matrix multiply and a
+        row-wise argpartition. When the segment has a trained approximate
+        index and more than ANN_MIN_ROWS eligible rows, only its probed lists
+        are scored. With compressed codes, k * RERANK_FACTOR candidates are
+        scored on the codes and re-ranked against the full-precision rows.
+        """
+        return self._search_rows(self._version, queries, k, document_ids, nprobe, exact)
+
+    def _search_rows(
+        self,
+        version: IndexVersion,
+        queries: np.ndarray,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(queries)
+        selected = self._selected(document_ids)
+        found_scores, found_rows = [], []
+        for state in version.parts:
+            if not state.live:
+                continue
+            mask = self._row_mask(state, selected, version.pending)
+            if mask is not None and not mask.any():
+                continue
+            scores, positions = _search_segment(state.segment, queries, k, mask, nprobe, exact)
+            found_scores.append(scores)
+            found_rows.append(np.where(positions >= 0, state.segment.global_rows(np.maximum(positions, 0)), -1))
+        if not found_scores:
+            return np.zeros((len(queries), 0), dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64)
+        if len(found_scores) == 1:
+            return found_scores[0], found_rows[0]
+        scores, order = top_k(np.concatenate(found_scores, axis=1), k)
+        return scores, np.take_along_axis(np.concatenate(found_rows, axis=1), order, axis=1)
+
+    def lexical_search_rows(
+        self,
+        query: str,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 top-k as (scores, rows) for one query text
+        """
+        return self._lexical_search_rows(self._version, query, k, document_ids)
+
+    def _collection(self, version: IndexVersion, query: str) -> Optional[CollectionStats]:
+        parts = [part for part in version.parts if part.segment.lexical is not None and part.live]
+        count = sum(part.live for part in parts)
+        if not count:
+            return None
+        frequencies = {
+            term: sum(part.segment.lexical.document_frequency(term, part.segment.size) for part in parts)
+            for term in set(tokenize(query))
+        }
+        return CollectionStats(count, sum(part.lexical_length for part in parts) / count or 1.0, frequencies)
+
+    def _lexical_search_rows(
+        self,
+        version: IndexVersion,
+        query: str,
+        k: int,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        empty = np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        collection = self._collection(version, query) if self.lexical else None
+        if collection is None:
+            return empty
+        selected = self._selected(document_ids)
+        found_scores, found_rows = [], []
+        for state in version.parts:
+            segment = state.segment
+            if not state.live or segment.lexical is None:
+                continue
+            mask = self._row_mask(state, selected, version.pending)
+            if mask is not None and not mask.any():
+                continue
+            scores, positions = segment.lexical.search(query, k, mask, limit=segment.size, collection=collection)
+            found_scores.append(scores)
+            found_rows.append(segment.global_rows(positions))
+        if not found_scores:
+            return empty
+        scores, rows = np.concatenate(found_scores), np.concatenate(found_rows)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return scores[order], rows[order]
+
+    def hybrid_search(
+        self,
+        query: np.ndarray,
+        text: str,
+        k: int = 5,
+        document_ids: Optional[Sequence[str]] = None,
+        candidates: int = settings.HYBRID_CANDIDATES,
+    ) -> List[SearchHit]:
+        """
+        Dense and BM25 rankings fused with reciprocal-rank fusion; hit scores are fused scores
+        """
+        return self._hybrid_search(self._version, query, text, k, document_ids, candidates)
+
+    def _hybrid_search(
+        self,
+        version: IndexVersion,
+        query: np.ndarray,
+        text: str,
+        k: int,
+        document_ids: Optional[Sequence[str]],
+        candidates: int,
+    ) -> List[SearchHit]:
+        depth = max(k, candidates)
+        _, dense_rows = self._search_rows(version, query, depth, document_ids)
+        _, lexical_rows = self._lexical_search_rows(version, text, depth, document_ids)
+        scores, rows = reciprocal_rank_fusion([dense_rows[0], lexical_rows], k, settings.RRF_K)
+        return [self._hit(version, int(row), float(score)) for score, row in zip(scores, rows)]
+
+    def hybrid_candidates(
+        self,
+        query: np.ndarray,
+        text: str,
+        k: int = 5,
+        document_ids: Optional[Sequence[str]] = None,
+        candidates: int = settings.HYBRID_CANDIDATES,
+    ) -> Tuple[List[SearchHit], np.ndarray]:
+        """
+        Hybrid hits together with their stored embeddings, both read from one version
+        """
+        version = self._version
+        hits = self._hybrid_search(version, query, text, k, document_ids, candidates)
+        return hits, self._get_vectors(version, np.array([hit.row for hit in hits], dtype=np.int64))
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> List[List[SearchHit]]:
+        version = self._version
+        scores, rows = self._search_rows(version, queries, k, document_ids)
+        return [
+            [self._hit(version, int(row), float(score)) for score, row in zip(score_row, row_ids) if row >= 0]
+            for score_row, row_ids in zip(scores, rows)
+        ]
+
+    def hit(self, row: int, score: float = 0.0) -> SearchHit:
+        return self._hit(self._version, row, score)
+
+    def _hit(self, version: IndexVersion, row: int, score: float) -> SearchHit:
+        segment, position = version.find(row)
+        start, end = version.moved.get(row) or (int(segment.starts[position]), int(segment.ends[position]))
+        return SearchHit(
+            row=row,
+            score=score,
+            document_id=self._documents[int(segment.document_codes[position])],
+            start=start,
+            end=end,
+            text=segment.text_at(position),
+        )
+
+    def get_text(self, row: int) -> str:
+        segment, position = self._version.find(row)
+        return segment.text_at(position)
+
+    def get_vectors(self, rows: np.ndarray) -> np.ndarray:
+        return self._get_vectors(self._version, rows)
+
+    def _get_vectors(self, version: IndexVersion, rows: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(rows), self.dimension), dtype=np.float32)
+        for segment, selected, positions in version.locate(rows):
+            out[selected] = segment.vectors[positions]
+        return out
+
+    def document_rows(self, document_id: str) -> np.ndarray:
+        code = self._document_index.get(document_id)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        found = []
+        for state in self._version.parts:
+            segment = state.segment
+            if not state.live or code not in segment.documents():
+                continue
+            positions = np.flatnonzero(segment.document_codes[: segment.size] == code)
+            if state.tombstones is not None:
+                positions = positions[~_unpack(state.tombstones, segment.size)[positions]]
+            found.append(segment.global_rows(positions))
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    # --- Persistence ---
+
+    def save(self) -> None:
+        """
+        Seal the memtable and atomically swap in metadata listing the current
+        segments, tombstones and moved offsets; segments that compaction
+        replaced are deleted afterwards (open mappings stay valid).
+        """
+        with self._write_lock:
+            self._seal()
+            self._write_meta()
+            self.dirty = False
+
+    def _write_meta(self) -> None:
+        """
+        Persist the sealed part of the current version (write lock held)
+        """
+        version = self._version
+        sealed = version.parts[:-1]
+        self._generation += 1
+        arrays = {
+            f"tombstones_{part.segment.segment_id}": part.tombstones for part in sealed if part.tombstones is not None
+        }
+        if version.moved:
+            moved = np.array([[row, start, end] for row, (start, end) in version.moved.items()], dtype=np.int64)
+            arrays["moved"] = moved
+        if len(version.pending):
+            arrays["pending"] = version.pending
+        state = None
+        if arrays:
+            state = f"state-{self._generation:06d}.npz"
+            with open(self._file(f"{state}.tmp"), "wb") as fh:
+                np.savez(fh, **arrays)
+            os.replace(self._file(f"{state}.tmp"), self._file(state))
+        memtable = self._memtable
+        _write_json(self._file("meta.json"), {
+            "format": 2,
+            "dimension": self.dimension,
+            "documents": self._documents,
+            "segments": [part.segment.segment_id for part in sealed],
+            "next_segment": self._next_segment,
+            "next_row": memtable.base + memtable.size,
+            "generation": self._generation,
+            "quantizer": self._quantizer_generation if self._quantizer is not None else 0,
+            "state": state,
+        })
+        for path in self._retired:
+            shutil.rmtree(path, ignore_errors=True)
+        self._retired.clear()
+        self._remove_stale(state)
+
+    def _remove_stale(self, state: Optional[str]) -> None:
+        quantizer = f"quantizer-{self._quantizer_generation}"
+        for name in os.listdir(self.path):
+            stale_state = name.startswith("state-") and name != state
+            if stale_state or name.endswith(".tmp"):
+                os.remove(self._file(name))
+            elif name.startswith("quantizer-") and name != quantizer:
+                shutil.rmtree(self._file(name), ignore_errors=True)
+
+    def _read_meta(self) -> Optional[Dict]:
+        if not os.path.exists(self._file("meta.json")):
+            return None
+        with open(self._file("meta.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def _load(self, meta: Dict) -> None:
+        self.dimension = meta["dimension"]
+        self._documents = meta["documents"]
+        self._document_index = {d: i for i, d in enumerate(self._documents)}
+        self._next_segment = meta["next_segment"]
+        self._generation = meta["generation"]
+        if meta["quantizer"] and self.compression != "none":
+            self._quantizer = Quantizer.load(self._file(f"quantizer-{meta['quantizer']}"))
+            self._quantizer_generation = meta["quantizer"]
+        state = dict(np.load(self._file(meta["state"]))) if meta["state"] else {}
+        parts = [
+            _state(self._open_segment(segment_id), state.get(f"tombstones_{segment_id}"))
+            for segment_id in meta["segments"]
+        ]
+        moved = {}
+        if "moved" in state:
+            moved = {int(row): (int(start), int(end)) for row, start, end in state["moved"]}
+        self._memtable = Memtable(meta["next_row"], self.dimension, self.lexical)
+        parts.append(_state(self._memtable.view()))
+        self._version = IndexVersion.build(0, parts, moved, state.get("pending"))
+        # --- Drop what an interrupted seal, compaction or save left behind ---
+        kept = {f"{segment_id:06d}" for segment_id in meta["segments"]}
+        for name in os.listdir(self._file("segments")):
+            if name not in kept:
+                shutil.rmtree(os.path.join(self._file("segments"), name), ignore_errors=True)
+        self._remove_stale(meta["state"])
+
+    def _open_segment(self, segment_id: int) -> Segment:
+        path = self._segment_path(segment_id)
+        with open(os.path.join(path, "segment.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        size = meta["size"]
+        vectors = np.memmap(
+            os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(size, self.dimension)
+        ).view(np.ndarray)
+        text_path = os.path.join(path, "text.bin")
+        text = np.memmap(text_path, dtype=np.uint8, mode="r").view(np.ndarray) if os.path.getsize(text_path) else np.zeros(0, np.uint8)
+        codes = None
+        codes_path = os.path.join(path, f"codes-{self._quantizer_generation}.npy")
+        if self._quantizer is not None and os.path.exists(codes_path):
+            codes = _mapped(codes_path)
+        rows_path = os.path.join(path, "rows.npy")
+        segment = Segment(
+            segment_id=segment_id,
+            base=meta["base"],
+            size=size,
+            vectors=vectors,
+            document_codes=_mapped(os.path.join(path, "document_codes.npy")),
+            starts=_mapped(os.path.join(path, "starts.npy")),
+            ends=_mapped(os.path.join(path, "ends.npy")),
+            text_offsets=_mapped(os.path.join(path, "text_offsets.npy")),
+            text=text,
+            rows=_mapped(rows_path) if os.path.exists(rows_path) else None,
+            codes=codes,
+            quantizer=self._quantizer if codes is not None else None,
+            path=path,
+        )
+        if self.index_type == "ivf" and os.path.exists(os.path.join(path, "ivf", "ivf.json")):
+            segment.ann = IVFIndex.load(os.path.join(path, "ivf"))
+        if self.lexical:
+            if os.path.exists(os.path.join(path, "bm25", "bm25.json")):
+                segment.lexical = BM25Index.load(os.path.join(path, "bm25"))
+            else:
+                segment.lexical = BM25Index()
+            # --- Index rows written before the lexical index was (or while it was off) ---
+            for begin in range(segment.lexical.size, size, 4096):
+                positions = np.arange(begin, min(begin + 4096, size), dtype=np.int64)
+                segment.lexical.add(positions, [segment.text_at(int(p)) for p in positions])
+            if segment.lexical.size < size or not os.path.exists(os.path.join(path, "bm25", "bm25.json")):
+                segment.lexical.save(os.path.join(path, "bm25"))
+        return segment
+
+    def _convert_legacy(self, meta: Dict) -> Dict:
+        """
+        Move a store saved before segments into its first segment; rows keep their ids
+        """
+        if os.path.exists(self._file("vectors.npy")) and not os.path.exists(self._file("vectors.f32")):
+            self._migrate_vectors()
+        size = meta["size"]
+        path = self._segment_path(0)
+        alive = np.load(self._file("alive.npy"))[:size] if size else np.zeros(0, dtype=bool)
+        quantizer = 0
+        if size:
+            os.makedirs(path, exist_ok=True)
+            for name in _LEGACY_FILES:
+                if os.path.exists(self._file(name)):
+                    os.replace(self._file(name), os.path.join(path, name))
+            if not os.path.exists(os.path.join(path, "text.bin")):
+                open(os.path.join(path, "text.bin"), "wb").close()
+            codes_path = os.path.join(path, "codes.npy")
+            if os.path.exists(codes_path):
+                complete = len(np.load(codes_path, mmap_mode="r")) >= size
+                if complete and os.path.exists(os.path.join(self._file("quantizer"), "quantizer.json")):
+                    quantizer = 1
+                    os.replace(codes_path, os.path.join(path, "codes-1.npy"))
+                    os.replace(self._file("quantizer"), self._file("quantizer-1"))
+                else:
+                    # --- Rows saved after the codes were written; the compactor encodes the segment again ---
+                    os.remove(codes_path)
+            _write_json(os.path.join(path, "segment.json"), {"base": 0, "size": size})
+            if os.path.exists(os.path.join(path, "ivf", "ivf.json")):
+                # --- Index rows saved after the index itself was last written ---
+                ann = IVFIndex.load(os.path.join(path, "ivf"))
+                live = np.flatnonzero(alive)
+                missing = live[ann.missing(live)]
+                if len(missing):
+                    vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r",
+                                        shape=(size, meta["dimension"]))
+                    ann.add(missing, vectors[missing])
+                    ann.save(os.path.join(path, "ivf"))
+        state = None
+        if not alive.all():
+            state = "state-000001.npz"
+            with open(self._file(state), "wb") as fh:
+                np.savez(fh, tombstones_0=np.packbits(~alive))
+        converted = {
+            "format": 2,
+            "dimension": meta["dimension"],
+            "documents": meta["documents"],
+            "segments": [0] if size else [],
+            "next_segment": 1,
+            "next_row": size,
+            "generation": 1,
+            "quantizer": quantizer,
+            "state": state,
+        }
+        _write_json(self._file("meta.json"), converted)
+        for name in ("alive.npy", *_LEGACY_FILES):
+            if os.path.isdir(self._file(name)):
+                shutil.rmtree(self._file(name), ignore_errors=True)
+            elif os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+        shutil.rmtree(self._file("quantizer"), ignore_errors=True)
+        return converted
+
+    def _migrate_vectors(self) -> None:
+        """
+        Convert a store saved with vectors.npy to the raw mapped file
+        """
+        legacy = np.load(self._file("vectors.npy"), mmap_mode="r")
+        tmp_path = self._file("vectors.f32.tmp")
+        with open(tmp_path, "wb") as fh:
+            for begin in range(0, len(legacy), 65536):
+                fh.write(np.ascontiguousarray(legacy[begin:begin + 65536], dtype=np.float32).tobytes())
+        os.replace(tmp_path, self._file("vectors.f32"))
+        os.remove(self._file("vectors.npy"))
+
+    def close(self) -> None:
+        """
+        Nothing to release: segments are unmapped once no version references them
+        """
+
+
+def _search_segment(
+    segment: Segment,
+    queries: np.ndarray,
+    k: int,
+    mask: Optional[np.ndarray],
+    nprobe: Optional[int],
+    exact: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k of one segment as (scores, positions), positions of -1 padding
+    """
+    vectors = segment.vectors
+    codes = None if exact else segment.codes
+    compressed = codes is not None
+    shortlist = k * settings.RERANK_FACTOR if compressed else k
+
+    if compressed:
+        quantizer = segment.quantizer
+
+        def score(query: np.ndarray, positions: np.ndarray) -> np.ndarray:
+            return quantizer.score(query[None, :], codes[positions])[0]
+    else:
+        def score(query: np.ndarray, positions: np.ndarray) -> np.ndarray:
+            return vectors[positions] @ query
+
+    eligible = None if mask is None else np.flatnonzero(mask)
+    if (
+        not exact
+        and segment.ann is not None
+        and (segment.size if eligible is None else len(eligible)) > settings.ANN_MIN_ROWS
+    ):
+        scores, positions = segment.ann.search(queries, shortlist, score, mask, nprobe)
+    elif compressed:
+        candidate_codes = codes if eligible is None else codes[eligible]
+        scores, positions = top_k(segment.quantizer.score(queries, candidate_codes), shortlist)
+        if eligible is not None:
+            positions = eligible[positions]
+    elif eligible is not None:
+        scores, positions = top_k(queries @ vectors[eligible].T, k)
+        return scores, eligible[positions]
+    else:
+        return top_k(queries @ vectors.T, k)
+
+    if compressed:
+        return _rerank(queries, positions, k, vectors)
+    return scores, positions
+
+
+def _rerank(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    vectors: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact re-scoring of a short candidate list per query
+    """
+    out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    out_rows = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, query in enumerate(queries):
+        # --- Sorted rows keep reads from the mapped file sequential ---
+        rows = np.unique(candidates[i][candidates[i] >= 0])
+        if not len(rows):
+            continue
+        scores, positions = top_k((vectors[rows] @ query)[None, :], k)
+        found = scores.shape[1]
+        out_scores[i, :found] = scores[0]
+        out_rows[i, :found] = rows[positions[0]]
+    return out_scores, out_rows
+
+
+def _gather_text(segment: Segment, positions: np.ndarray) -> bytes:
+    """
+    Concatenated text of the rows at `positions`, read with one fancy index
+    """
+    begins = segment.text_offsets[positions]
+    lengths = segment.text_offsets[positions + 1] - begins
+    total = int(lengths.sum())
+    if not total:
+        return b""
+    # --- Byte index of every kept character: each row's first byte, then consecutive ---
+    shift = np.repeat(begins - (np.cumsum(lengths) - lengths), lengths)
+    return segment.text[shift + np.arange(total)].tobytes()
+
+
+def _tombstoned(parts: Sequence[_SegmentState], rows: np.ndarray) -> Tuple[List[_SegmentState], int]:
+    """
+    `parts` with `rows` (sorted, unique) tombstoned, and how many of them were live
+    """
+    parts = list(parts)
+    removed = 0
+    if not len(rows):
+        return parts, removed
+    for index, state in enumerate(parts):
+        positions = state.segment.positions(rows)
+        positions = positions[positions >= 0]
+        if not len(positions):
+            continue
+        deleted = _unpack(state.tombstones, state.segment.size)
+        positions = positions[~deleted[positions]]
+        if not len(positions):
+            continue
+        deleted[positions] = True
+        parts[index] = _state(state.segment, np.packbits(deleted))
+        removed += len(positions)
+    return parts, removed
+
+
+def _without(pending: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    return pending[~np.isin(pending, rows)] if len(pending) and len(rows) else pending
+
+
+def _fold(
+    moved: Dict[int, Tuple[int, int]],
+    written: Dict[int, Tuple[int, int]],
+    segments: Sequence[Segment],
+) -> Dict[int, Tuple[int, int]]:
+    """
+    `moved` without the entries for rows of `segments` that were written out with the offsets in `written`
+    """
+    if not moved or not written:
+        return moved
+    rows = np.fromiter(written, dtype=np.int64, count=len(written))
+    inside = np.zeros(len(rows), dtype=bool)
+    for segment in segments:
+        inside |= segment.positions(rows) >= 0
+    folded = {row for row in rows[inside].tolist() if moved.get(row) == written[row]}
+    if not folded:
+        return moved
+    return {row: offsets for row, offsets in moved.items() if row not in folded}
+
+
+def _mapped(path: str) -> np.ndarray:
+    """
+    A saved array mapped read-only, as a plain ndarray (memmap's subclass hooks cost on every slice)
+    """
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+def _write_json(path: str, data: Dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+def _grow(array: np.ndarray, used: int, shape: Tuple[int, ...]) -> np.ndarray:
+    grown = np.zeros(shape, dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
+
+
+_SAFE_PARTITION = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+@dataclass
+class _Partition:
+    store: VectorStore
+    pins: int = 0
+    last_used: float = 0.0
+
+
+class PartitionedVectorStore:
+    """
+    One VectorStore per owner under `root/<owner_id>`.
+
+    Every query is scoped to a single user, so search cost follows the
+    size of that user's partition rather than the whole corpus, and each
+    partition trains its own ANN index and quantizer once it is big enough.
+
+    Partitions are opened on first use and kept in an LRU of at most
+    `max_loaded`; unpinned partitions idle for `idle_seconds` are saved if
+    dirty and closed. A partition is pinned while in use (`acquire` /
+    `release` or `use`), so an ingestion and concurrent searches always
+    share one instance.
+
+    A compactor thread wakes every `compaction_interval` seconds and
+    compacts the loaded partitions that need it, pinning each while it
+    runs so it is not evicted mid-merge.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_loaded: int = settings.VECTOR_PARTITIONS_MAX_LOADED,
+        idle_seconds: float = settings.VECTOR_PARTITION_IDLE_SECONDS,
+        compaction_interval: float = settings.VECTOR_COMPACTION_INTERVAL_SECONDS,
+        **store_options,
+    ):
+        self.root = root
+        self.max_loaded = max_loaded
+        self.idle_seconds = idle_seconds
+        self.compaction_interval = compaction_interval
+        self.store_options = store_options
+        self._partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        # --- Set once an evicted partition is saved; a reload of that owner waits for it ---
+        self._closing: Dict[str, threading.Event] = {}
+        self._compactor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.loads = 0
+        self.evictions = 0
+        self.compactions = 0
+
+    def path(self, owner_id: str) -> str:
+        if not _SAFE_PARTITION.match(owner_id):
+            raise ValueError(f"Invalid partition id: {owner_id!r}")
+        return os.path.join(self.root, owner_id)
+
+    def exists(self, owner_id: str) -> bool:
+        return owner_id in self._partitions or os.path.exists(os.path.join(self.path(owner_id), "meta.json"))
+
+    # --- Pinning ---
+
+    def acquire(self, owner_id: str) -> VectorStore:
+        """
+        Load (if needed) and pin an owner's partition; pair with `release`
+        """
+        path = self.path(owner_id)
+        with self._lock:
+            loading = self._loading.setdefault(owner_id, threading.Lock())
+        # --- Load outside the registry lock so other tenants are not blocked ---
+        with loading:
+            while True:
+                with self._lock:
+                    partition = self._partitions.get(owner_id)
+                    if partition is not None:
+                        partition.pins += 1
+                    closing = self._closing.get(owner_id)
+                if partition is not None or closing is None:
+                    break
+                # --- Evicted but not saved yet: a second instance must not read or write the same files ---
+                closing.wait()
+            if partition is None:
+                store = VectorStore(path, **self.store_options)
+                with self._lock:
+                    partition = self._partitions[owner_id] = _Partition(store, pins=1)
+                    self.loads += 1
+                    self._start_compactor()
+        with self._lock:
+            partition.last_used = time.monotonic()
+            self._partitions.move_to_end(owner_id)
+            evicted = self._select_evictions()
+        for evicted_id, store in evicted:
+            self._close(evicted_id, store)
+        return partition.store
+
+    def release(self, owner_id: str) -> None:
+        with self._lock:
+            partition = self._partitions.get(owner_id)
+            if partition is not None:
+                partition.pins -= 1
+                partition.last_used = time.monotonic()
+
+    @contextmanager
+    def use(self, owner_id: str) -> Iterator[VectorStore]:
+        store = self.acquire(owner_id)
+        try:
+            yield store
+        finally:
+            self.release(owner_id)
+
+    # --- Eviction ---
+
+    def _select_evictions(self) -> List[Tuple[str, VectorStore]]:
+        """
+        Remove idle or least recently used unpinned partitions from the registry (lock held)
+        """
+        now = time.monotonic()
+        evicted = []
+        excess = len(self._partitions) - self.max_loaded
+        for owner_id, partition in list(self._partitions.items()):
+            if partition.pins > 0:
+                continue
+            if excess > 0 or now - partition.last_used > self.idle_seconds:
+                evicted.append((owner_id, self._retire(owner_id)))
+                excess -= 1
+        self.evictions += len(evicted)
+        return evicted
+
+    def _retire(self, owner_id: str) -> VectorStore:
+        """
+        Take a partition out of the registry, marking it as closing until `_close` is done (lock held)
+        """
+        self._closing[owner_id] = threading.Event()
+        return self._partitions.pop(owner_id).store
+
+    def _close(self, owner_id: str, store: VectorStore) -> None:
+        try:
+            if store.dirty:
+                store.save()
+            store.close()
+        finally:
+            with self._lock:
+                closing = self._closing.pop(owner_id, None)
+            if closing is not None:
+                closing.set()
+
+    def evict(self, owner_id: str) -> bool:
+        """
+        Save and close an owner's partition unless it is in use
+        """
+        with self._lock:
+            partition = self._partitions.get(owner_id)
+            if partition is None or partition.pins > 0:
+                return False
+            store = self._retire(owner_id)
+            self.evictions += 1
+        self._close(owner_id, store)
+        return True
+
+    # --- Compaction ---
+
+    def _start_compactor(self) -> None:
+        if self.compaction_interval > 0 and self._compactor is None and not self._stopping.is_set():
+            self._compactor = threading.Thread(target=self._compact_loop, name="vector-compactor", daemon=True)
+            self._compactor.start()
+
+    def _compact_loop(self) -> None:
+        while not self._stopping.wait(self.compaction_interval):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Vector store compaction failed")
+
+    def compact(self) -> int:
+        """
+        Compact every loaded partition that needs it; returns the number of merges
+        """
+        with self._lock:
+            due = [(owner_id, p) for owner_id, p in self._partitions.items() if p.store.needs_compaction()]
+            # --- Pinned without touching last_used, so compaction does not keep a partition from idling out ---
+            for _, partition in due:
+                partition.pins += 1
+        merges = 0
+        try:
+            for owner_id, partition in due:
+                if self._stopping.is_set():
+                    break
+                merges += partition.store.compact()
+        finally:
+            with self._lock:
+                for _, partition in due:
+                    partition.pins -= 1
+                self.compactions += merges
+        return merges
+
+    def preload(self, limit: int) -> int:
+        """
+        Load the `limit` most recently written partitions (at most `max_loaded`), e.g. at start-up
+        """
+        if limit <= 0 or not os.path.isdir(self.root):
+            return 0
+        recent: List[Tuple[float, str]] = []
+        for owner_id in os.listdir(self.root):
+            try:
+                if _SAFE_PARTITION.match(owner_id):
+                    recent.append((os.path.getmtime(os.path.join(self.root, owner_id, "meta.json")), owner_id))
+            except OSError:
+                continue
+        recent.sort(reverse=True)
+        owners = [owner_id for _, owner_id in recent[:min(limit, self.max_loaded)]]
+        for owner_id in owners:
+            self.acquire(owner_id)
+            self.release(owner_id)
+        return len(owners)
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            stores = [(owner_id, self._retire(owner_id)) for owner_id in list(self._partitions)]
+        for owner_id, store in stores:
+            self._close(owner_id, store)
+
+    # --- Reads ---
+
+    def hybrid_search(
+        self,
+        owner_id: str,
+        query: np.ndarray,
+        text: str,
+        k: int = 5,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> List[SearchHit]:
+        if not self.exists(owner_id):
+            return []
+        with self.use(owner_id) as store:
+            return store.hybrid_search(query, text, k, document_ids)
+
+    def hybrid_candidates(
+        self,
+        owner_id: str,
+        query: np.ndarray,
+        text: str,
+        k: int = 5,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[SearchHit], np.ndarray]:
+        """
+        Hybrid hits together with their stored embeddings, for context assembly
+        """
+        if not self.exists(owner_id):
+            return [], np.zeros((0, 0), dtype=np.float32)
+        with self.use(owner_id) as store:
+            return store.hybrid_candidates(query, text, k, document_ids)
+
+    def search(
+        self,
+        owner_id: str,
+        queries: np.ndarray,
+        k: int = 5,
+        document_ids: Optional[Sequence[str]] = None,
+    ) -> List[List[SearchHit]]:
+        if not self.exists(owner_id):
+            return [[] for _ in range(len(queries))]
+        with self.use(owner_id) as store:
+            return store.search(queries, k, document_ids)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            loaded = [
+                {
+                    "owner_id": owner_id,
+                    "rows": len(p.store),
+                    "segments": len(p.store.version.parts) - 1,
+                    "pinned": p.pins > 0,
+                    "dirty": p.store.dirty,
+                }
+                for owner_id, p in self._partitions.items()
+            ]
+        return {
+            "loaded": len(loaded),
+            "max_loaded": self.max_loaded,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+            "partitions": loaded,
+        }
+
+
+_partitioned_store: Optional[PartitionedVectorStore] = None
+
+
+def get_partitioned_store() -> PartitionedVectorStore:
+    """
+    Return the shared per-owner store; partitions are mapped on first use
+    """
+    global _partitioned_store
+    if _partitioned_store is None:
+        _partitioned_store = PartitionedVectorStore(settings.partitions_dir)
+    return _partitioned_store
@@ -0,0 +1,56 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+
+class ChatRequest(BaseModel):
+    message: str = Field(..., min_length=1, max_length=8000)
+    document_ids: Optional[List[str]] = None
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+    # --- Continue a conversation; omitted means a one-off question ---
+    conversation_id: Optional[str] = None
+
+class RetrievedChunk(BaseModel):
+    document_id: str
+    start: int
+    end: int
+    score: float
+    text: str
+
+class MessageRole(str, Enum):
+    USER = "user"
+    ASSISTANT = "assistant"
+
+class ChatMessage(BaseModel):
+    conversation_id: str
+    # --- Position in the conversation's append-only log, from 1 ---
+    seq: int = 0
+    role: MessageRole
+    content: str
+    # --- Counted once on append, never re-tokenized ---
+    tokens: int = 0
+    created_at: datetime
+
+class Conversation(BaseModel):
+    id: str
+    owner_id: str
+    title: Optional[str] = None
+    message_count: int = 0
+    # --- Running summary of messages 1..summarized_through ---
+    summary: str = ""
+    summary_tokens: int = 0
+    summarized_through: int = 0
+    # --- Tokens of the messages after summarized_through ---
+    recent_tokens: int = 0
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+class ConversationCreate(BaseModel):
+    title: Optional[str] = Field(None, max_length=200)
+
+class ConversationListResponse(BaseModel):
+    conversations: List[Conversation]
+
+class ConversationDetail(BaseModel):
+    conversation: Conversation
+    messages: List[ChatMessage]
@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+
+from app.schemas.job import JobInfo
+
+class DocumentStatus(str, Enum):
+    UPLOADED = "uploaded"
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+class DocumentInfo(BaseModel):
+    id: str
+    owner_id: str
+    filename: str
+    content_type: Optional[str] = None
+    size_bytes: int = 0
+    sha256: str
+    status: DocumentStatus = DocumentStatus.UPLOADED
+    chunk_count: int = 0
+    # --- Last ingestion: chunks embedded, reused from the previous version, tombstoned ---
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    chunks_removed: int = 0
+    error: Optional[str] = None
+    # --- Latest ingestion job, see /documents/jobs/{id} ---
+    job_id: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+class DocumentUploadResponse(BaseModel):
+    success: bool
+    document: DocumentInfo
+    job: Optional[JobInfo] = None
+
+class DocumentListResponse(BaseModel):
+    documents: List[DocumentInfo]
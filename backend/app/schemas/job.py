@@ -0,0 +1,37 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from enum import Enum
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class JobPriority(int, Enum):
+    LOW = -10
+    NORMAL = 0
+    HIGH = 10
+
+class JobInfo(BaseModel):
+    id: str
+    kind: str
+    owner_id: str
+    document_id: Optional[str] = None
+    priority: int = JobPriority.NORMAL
+    status: JobStatus = JobStatus.QUEUED
+    # --- Handler arguments (e.g. a staged upload path); not shown to clients ---
+    payload: Dict[str, Any] = Field(default_factory=dict, exclude=True)
+    attempts: int = 0
+    max_attempts: int = 1
+    # --- Estimated fraction done, plus stage counters reported by the handler ---
+    progress: float = 0.0
+    detail: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    run_after: Optional[datetime] = None
+
+class JobListResponse(BaseModel):
+    jobs: List[JobInfo]
@@ -0,0 +1,397 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import Depends, Request
+
+from app.core.config import get_settings
+from app.core.exceptions import RateLimitException
+from app.core.metrics import metrics
+from app.schemas.user import User
+from app.security.deps import get_current_user
+
+settings = get_settings()
+
+ADMISSION_DECISIONS = "admission_decisions_total"
+ADMISSION_WAIT = "admission_queue_wait_seconds"
+ADMISSION_ACTIVE = "admission_active_requests"
+ADMISSION_QUEUED = "admission_queued_requests"
+
+# --- Weight of the newest request in the average slot hold time ---
+_HOLD_EWMA = 0.1
+
+
+# --- Per-user token buckets ---
+
+class RateLimitBackend(ABC):
+    """
+    Token bucket state, keyed by route class and user.
+
+    The in-memory backend limits each worker separately, so N uvicorn
+    workers allow up to N times the rate; a shared backend (the SQLite one
+    for workers on one host, or e.g. Redis with the same arithmetic in a
+    Lua script) enforces one budget per user across them.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take one token from `key`'s bucket (refilled at `rate` per second, holding at
+        most `burst`); returns 0 when granted, else the seconds until one is available
+        """
+
+    def close(self) -> None:
+        pass
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> Tuple[float, float]:
+    """
+    Bucket level after refilling since `updated` and taking one token if possible, and the wait if not
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets of this process; the least recently used beyond `max_keys` are
+    dropped, which only forgets that a user was below a full bucket
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens, wait = _refill(tokens, updated, now, rate, burst)
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """
+    Buckets in a SQLite file shared by every worker on the host; each take
+    is one short write transaction, so concurrent workers serialize on it
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._db = db
+        return self._db
+
+    def _take(self, key: str, rate: float, burst: float) -> float:
+        with self._lock:
+            db = self._conn
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = db.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, wait = _refill(*(row or (burst, now)), now, rate, burst)
+                db.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        return await asyncio.to_thread(self._take, key, rate, burst)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def build_rate_limit_backend(kind: str = settings.RATE_LIMIT_BACKEND) -> RateLimitBackend:
+    if kind == "memory":
+        return InMemoryRateLimitBackend()
+    if kind == "sqlite":
+        return SQLiteRateLimitBackend(os.path.join(settings.DATA_DIR, "rate_limits.sqlite3"))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {kind}")
+
+
+# --- Per-class concurrency ---
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    concurrency: int
+    queue_slo: float
+    rate_per_minute: float = 0.0
+    burst: int = 1
+
+
+class ConcurrencyLimit:
+    """
+    At most `limit` requests of a class at once; the rest wait in FIFO order.
+
+    A request that would wait longer than `queue_slo` seconds is shed: at
+    once when the queue is full or the expected wait (queue position times
+    the average hold time, divided by `limit`) is already over the SLO,
+    otherwise when the SLO passes. Slots are handed straight to the next
+    waiter on release, so a new arrival cannot overtake the queue.
+    """
+
+    def __init__(self, route_class: RouteClass, max_queue: int):
+        self.route_class = route_class
+        self.limit = route_class.concurrency
+        self.queue_slo = route_class.queue_slo
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.hold_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def expected_wait(self, position: int) -> float:
+        return position * self.hold_seconds / self.limit
+
+    def retry_after(self) -> float:
+        return max(1.0, self.expected_wait(self.queued + 1))
+
+    async def acquire(self) -> float:
+        """
+        Take a slot; returns the seconds spent queued or raises RateLimitException
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return 0.0
+        position = self.queued + 1
+        if position > self.max_queue:
+            raise _shed(self.route_class.name, "queue_full", self.retry_after())
+        if self.expected_wait(position) > self.queue_slo:
+            raise _shed(self.route_class.name, "slo_predicted", self.retry_after())
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_slo)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            raise _shed(self.route_class.name, "slo_exceeded", self.retry_after())
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # --- The slot was handed over as the client went away ---
+                self.release(0.0)
+            raise
+        return time.perf_counter() - started
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, held: float) -> None:
+        if held > 0:
+            self.hold_seconds += _HOLD_EWMA * (held - self.hold_seconds) if self.hold_seconds else held
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "queue_slo_ms": round(1000 * self.queue_slo, 1),
+            "avg_hold_ms": round(1000 * self.hold_seconds, 1),
+        }
+
+
+def _shed(route_class: str, reason: str, retry_after: float) -> RateLimitException:
+    metrics.inc(ADMISSION_DECISIONS, (("class", route_class), ("outcome", reason)))
+    return RateLimitException("Server is busy, retry later", retry_after)
+
+
+# --- Controller ---
+
+class AdmissionController:
+    """
+    Admission control in front of expensive routes.
+
+    Each route class (auth, chat, ingestion) has its own concurrency limit
+    and queue SLO, so a burst of chat generations queues and sheds on its
+    own while auth calls keep their slots, and each user has a token
+    bucket per class (`rate_per_minute`, `burst`; 0 disables it) checked
+    before queueing. Rejections are 429 with Retry-After. Outcomes, queue
+    waits, active and queued requests are exported as metrics.
+    """
+
+    def __init__(
+        self,
+        classes: Optional[Dict[str, RouteClass]] = None,
+        backend: Optional[RateLimitBackend] = None,
+        max_queue: int = settings.ADMISSION_MAX_QUEUE,
+        enabled: bool = settings.ADMISSION_ENABLED,
+    ):
+        self.classes = classes or default_route_classes()
+        self._backend = backend
+        self.enabled = enabled
+        self.limits = {name: ConcurrencyLimit(route_class, max_queue) for name, route_class in self.classes.items()}
+        self._waits = {name: metrics.histogram(ADMISSION_WAIT, (("class", name),)) for name in self.classes}
+        self.backend_errors = 0
+        metrics.describe(ADMISSION_DECISIONS, "counter", "Admission outcomes by route class")
+        metrics.describe(ADMISSION_WAIT, "histogram", "Time admitted requests waited for a slot")
+        metrics.gauge(ADMISSION_ACTIVE, "Requests holding a slot, by route class",
+                      lambda: {(("class", n),): float(l.active) for n, l in self.limits.items()})
+        metrics.gauge(ADMISSION_QUEUED, "Requests waiting for a slot, by route class",
+                      lambda: {(("class", n),): float(l.queued) for n, l in self.limits.items()})
+
+    @property
+    def backend(self) -> RateLimitBackend:
+        if self._backend is None:
+            self._backend = build_rate_limit_backend()
+        return self._backend
+
+    async def check_rate(self, route_class: RouteClass, key: str) -> None:
+        if route_class.rate_per_minute <= 0:
+            return
+        try:
+            wait = await self.backend.take(f"{route_class.name}:{key}", route_class.rate_per_minute / 60, route_class.burst)
+        except Exception:
+            # --- Fail open: a broken limiter store must not take the API down ---
+            self.backend_errors += 1
+            return
+        if wait > 0:
+            metrics.inc(ADMISSION_DECISIONS, (("class", route_class.name), ("outcome", "rate_limited")))
+            raise RateLimitException("Rate limit exceeded", wait)
+
+    @asynccontextmanager
+    async def admit(self, name: str, key: str) -> AsyncIterator[None]:
+        """
+        Hold a slot of route class `name` for the block, on behalf of `key` (user id or client address)
+        """
+        if not self.enabled:
+            yield
+            return
+        limit = self.limits[name]
+        await self.check_rate(limit.route_class, key)
+        waited = await limit.acquire()
+        self._waits[name].observe(waited)
+        metrics.inc(ADMISSION_DECISIONS, (("class", name), ("outcome", "queued" if waited else "admitted")))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            limit.release(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "backend_errors": self.backend_errors,
+            "classes": {
+                name: {
+                    **limit.stats(),
+                    "rate_per_minute": limit.route_class.rate_per_minute,
+                    "burst": limit.route_class.burst,
+                }
+                for name, limit in self.limits.items()
+            },
+        }
+
+    def close(self) -> None:
+        if self._backend is not None:
+            self._backend.close()
+
+
+def default_route_classes() -> Dict[str, RouteClass]:
+    return {
+        "auth": RouteClass("auth", settings.ADMISSION_AUTH_CONCURRENCY, settings.ADMISSION_AUTH_QUEUE_SLO_MS / 1000,
+                           settings.RATE_LIMIT_AUTH_PER_MINUTE, settings.RATE_LIMIT_AUTH_BURST),
+        "chat": RouteClass("chat", settings.ADMISSION_CHAT_CONCURRENCY, settings.ADMISSION_CHAT_QUEUE_SLO_MS / 1000,
+                           settings.RATE_LIMIT_CHAT_PER_MINUTE, settings.RATE_LIMIT_CHAT_BURST),
+        "ingestion": RouteClass("ingestion", settings.ADMISSION_INGESTION_CONCURRENCY,
+                                settings.ADMISSION_INGESTION_QUEUE_SLO_MS / 1000,
+                                settings.RATE_LIMIT_INGESTION_PER_MINUTE, settings.RATE_LIMIT_INGESTION_BURST),
+    }
+
+
+# --- Dependencies ---
+
+def client_address(request: Request) -> str:
+    """
+    Address a signed-out request is limited by: the peer, or when the peer is one of
+    ADMISSION_TRUSTED_PROXIES, the nearest X-Forwarded-For hop that is not a trusted proxy
+    """
+    peer = request.client.host if request.client else "unknown"
+    trusted = settings.trusted_proxies_list
+    if peer not in trusted:
+        return peer
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in trusted:
+            return hop
+    return peer
+
+
+def admitted_user(route_class: str) -> Callable[..., AsyncIterator[User]]:
+    """
+    Dependency yielding the current user once admitted to `route_class`; the slot is held until the
+    response is finished, streaming included
+    """
+    async def dependency(current_user: User = Depends(get_current_user)) -> AsyncIterator[User]:
+        async with admission_controller.admit(route_class, current_user.id):
+            yield current_user
+
+    dependency.__name__ = f"admit_{route_class}"
+    return dependency
+
+
+def admitted_client(route_class: str) -> Callable[..., AsyncIterator[None]]:
+    """
+    Like `admitted_user` for routes without a signed-in user; buckets are per client address
+    """
+    async def dependency(request: Request) -> AsyncIterator[None]:
+        async with admission_controller.admit(route_class, client_address(request)):
+            yield
+
+    dependency.__name__ = f"admit_{route_class}_client"
+    return dependency
+
+
+def get_admission_controller() -> AdmissionController:
+    return admission_controller
+
+
+# Singleton instance
+admission_controller = AdmissionController()
+
+admit_auth = admitted_user("auth")
+admit_auth_client = admitted_client("auth")
+admit_chat = admitted_user("chat")
+admit_ingestion = admitted_user("ingestion")
@@ -2,7 +2,11 @@ from typing import Optional
 from fastapi import Depends, Request, HTTPException, status
 from app.schemas.user import User
 from app.security.jwks import jwks_verifier
+from app.core.config import get_settings
 from app.core.exceptions import AuthException
+from app.core.metrics import span
+
+settings = get_settings()
 
 async def get_token_from_request(request: Request) -> Optional[str]:
     """
@@ -32,12 +36,22 @@ async def get_current_user(
         raise AuthException("Not authenticated")
     
     try:
-        payload = await jwks_verifier.verify_token(token)
-        user_data = payload.get("user") or payload
-        return User.from_supabase(user_data)
+        with span("auth"):
+            return await jwks_verifier.get_user(token)
     except Exception as e:
         raise AuthException(str(e))
 
+def is_admin(user: User) -> bool:
+    return user.role == "admin" or user.email.lower() in settings.admin_emails_list
+
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """
+        Current user, who must be an admin
+    """
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 async def get_optional_user(
     request: Request,
     token: Optional[str] = Depends(get_token_from_request)
@@ -50,8 +64,6 @@ async def get_optional_user(
         return None
     
     try:
-        payload = await jwks_verifier.verify_token(token)
-        user_data = payload.get("user") or payload
-        return User.from_supabase(user_data)
+        return await jwks_verifier.get_user(token)
     except:
         return None
\ No newline at end of file
@@ -1,39 +1,185 @@
-import httpx
-import jwt
-from typing import Dict, Optional
-from datetime import datetime, timedelta
-from functools import lru_cache
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+from app.core.cache import LRUCache
 from app.core.config import get_settings
 from app.core.exceptions import TokenException
+from app.core.http_client import UpstreamClient, http_client
+from app.schemas.user import User
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+def parse_max_age(cache_control: Optional[str]) -> Optional[int]:
+    """
+    Extract max-age (seconds) from a Cache-Control header, if present
+    """
+    if not cache_control:
+        return None
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+class _VerifiedToken:
+    """
+    Cache entry for a token whose signature and claims were already checked
+    """
+    __slots__ = ("payload", "user")
+
+    def __init__(self, payload: Dict):
+        self.payload = payload
+        self.user: Optional[User] = None
 
 class JWKSVerifier:
-    def __init__(self):
-        self._jwks_cache = None
-        self._cache_time = None
-        self._cache_duration = timedelta(hours=1)
+    def __init__(self, client: Optional[UpstreamClient] = None):
+        self.http_client = client or http_client
+        self._jwks_cache: Optional[Dict] = None
+        self._fetched_at: Optional[float] = None
+        self._max_age: float = settings.JWKS_CACHE_TTL_SECONDS
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._last_forced_refresh: float = 0.0
+        # --- After a failed refresh, stale keys are served without refetching until _retry_at ---
+        self._backoff: float = 0.0
+        self._retry_at: float = 0.0
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        # --- Verified tokens, each entry expires at the token's own `exp` ---
+        self._token_cache: LRUCache[_VerifiedToken] = LRUCache(settings.TOKEN_CACHE_MAX_SIZE)
+        # --- Parsed public keys per kid, rebuilt when the JWKS document changes ---
+        self._public_keys: Dict[str, Any] = {}
+        self._public_keys_source: Optional[Dict] = None
+        self.key_cache_hits = 0
+        self.key_cache_misses = 0
     
     async def get_jwks(self) -> Dict:
         """
-        Fetch and cache JWKS
+        Return cached JWKS, serving stale keys while a background refresh runs
         """
-        now = datetime.utcnow()
-        
-        if self._jwks_cache and self._cache_time:
-            if now - self._cache_time < self._cache_duration:
-                return self._jwks_cache
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(settings.supabase_jwks_url)
-            response.raise_for_status()
-            self._jwks_cache = response.json()
-            self._cache_time = now
-            
-        return self._jwks_cache
+        if self._jwks_cache is None or self._fetched_at is None:
+            return await self._refresh()
+
+        age = time.monotonic() - self._fetched_at
+        if age < self._max_age:
+            return self._jwks_cache
+
+        if age < self._max_age + settings.JWKS_MAX_STALE_SECONDS:
+            # --- Stale-while-revalidate: never block a request on a refresh ---
+            if time.monotonic() >= self._retry_at:
+                self._start_refresh()
+            return self._jwks_cache
+
+        return await self._refresh()
+
+    async def force_refresh(self) -> Dict:
+        """
+        Refresh JWKS for an unknown kid, at most once per JWKS_MIN_REFRESH_SECONDS
+        """
+        import httpx
+
+        now = time.monotonic()
+        if (
+            self._jwks_cache is not None
+            and now - self._last_forced_refresh < settings.JWKS_MIN_REFRESH_SECONDS
+        ):
+            return self._jwks_cache
+        self._last_forced_refresh = now
+        try:
+            return await self._refresh()
+        except httpx.HTTPError:
+            if self._jwks_cache is None:
+                raise
+            return self._jwks_cache
+
+    def _start_refresh(self) -> asyncio.Task:
+        """
+        Start a refresh unless one is already in flight (single-flight)
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_jwks())
+            self._refresh_task.add_done_callback(self._on_refresh_done)
+        return self._refresh_task
+
+    async def _refresh(self) -> Dict:
+        # --- Shield so a cancelled waiter does not cancel the shared fetch ---
+        return await asyncio.shield(self._start_refresh())
+
+    def _on_refresh_done(self, task: asyncio.Task) -> None:
+        # --- Failures are counted and logged in _refresh_jwks; only mark the exception as retrieved ---
+        if not task.cancelled():
+            task.exception()
+
+    async def _refresh_jwks(self) -> Dict:
+        try:
+            jwks = await self._fetch_jwks()
+        except Exception as error:
+            # --- Back off from JWKS_MIN_REFRESH_SECONDS, doubling up to the cap, so an outage is not hammered;
+            # set before the task completes, so no request can start another fetch in between ---
+            self.refresh_failures += 1
+            self._backoff = min(
+                max(2 * self._backoff, settings.JWKS_MIN_REFRESH_SECONDS),
+                settings.JWKS_MAX_REFRESH_BACKOFF_SECONDS,
+            )
+            self._retry_at = time.monotonic() + self._backoff
+            logger.warning("JWKS refresh failed, retrying in %.0f s: %s", self._backoff, error)
+            raise
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        return jwks
+
+    async def _fetch_jwks(self) -> Dict:
+        response = await self.http_client.get(settings.supabase_jwks_url, endpoint="jwks")
+        response.raise_for_status()
+        jwks = response.json()
+
+        max_age = parse_max_age(response.headers.get("Cache-Control"))
+        if max_age is None:
+            max_age = settings.JWKS_CACHE_TTL_SECONDS
+        self._max_age = max(max_age, settings.JWKS_MIN_REFRESH_SECONDS)
+        self._jwks_cache = jwks
+        self._fetched_at = time.monotonic()
+        self.refresh_count += 1
+        return jwks
     
-    async def verify_token(self, token: str) -> Dict:
-        """Verify JWT token with JWKS"""
+    def _get_public_key(self, jwks: Dict, kid: str) -> Optional[Any]:
+        """
+        Return the parsed RSA key for `kid`, parsing it at most once per JWKS document
+        """
+        if jwks != self._public_keys_source:
+            self._public_keys = {}
+            self._public_keys_source = jwks
+
+        public_key = self._public_keys.get(kid)
+        if public_key is not None:
+            self.key_cache_hits += 1
+            return public_key
+
+        self.key_cache_misses += 1
+        import jwt
+
+        for key in jwks.get("keys", []):
+            if key.get("kid") == kid:
+                public_key = jwt.algorithms.RSAAlgorithm.from_jwk(key)
+                self._public_keys[kid] = public_key
+                return public_key
+        return None
+
+    async def preload(self) -> int:
+        """
+        Fetch the key set and parse its keys before the first request needs them
+        """
+        jwks = await self.get_jwks()
+        kids = [key["kid"] for key in jwks.get("keys", []) if key.get("kid")]
+        return sum(1 for kid in kids if self._get_public_key(jwks, kid) is not None)
+
+    async def _decode(self, token: str) -> Dict:
+        # --- PyJWT and cryptography load with the first token to verify, not with the app ---
+        import jwt
+
         try:
             # ---  Decode without verification to get kid --- 
             unverified = jwt.get_unverified_header(token)
@@ -49,22 +195,71 @@ class JWKSVerifier:
             
             # ---  Get JWKS and find matching key ---
             jwks = await self.get_jwks()
-            for key in jwks.get("keys", []):
-                if key.get("kid") == kid:
-                    # ---  Verify with RS256 ---
-                    public_key = jwt.algorithms.RSAAlgorithm.from_jwk(key)
-                    return jwt.decode(
-                        token,
-                        public_key,
-                        algorithms=["RS256"],
-                        audience="authenticated"
-                    )
+            public_key = self._get_public_key(jwks, kid)
+            if public_key is None:
+                # --- Unknown kid: keys may have rotated, refresh (rate-limited) ---
+                jwks = await self.force_refresh()
+                public_key = self._get_public_key(jwks, kid)
+            if public_key is not None:
+                # ---  Verify with RS256 ---
+                return jwt.decode(
+                    token,
+                    public_key,
+                    algorithms=["RS256"],
+                    audience="authenticated"
+                )
             
             raise TokenException("No matching key found in JWKS")
             
+        except TokenException:
+            raise
         except jwt.ExpiredSignatureError:
             raise TokenException("Token has expired")
-        except jwt.JWTError as e:
+        except jwt.PyJWTError as e:
             raise TokenException(f"Invalid token: {str(e)}")
 
-jwks_verifier = JWKSVerifier()
\ No newline at end of file
+    async def _verify_cached(self, token: str) -> _VerifiedToken:
+        entry = self._token_cache.get(token)
+        if entry is not None:
+            return entry
+
+        payload = await self._decode(token)
+        entry = _VerifiedToken(payload)
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            self._token_cache.set(token, entry, expires_at=float(exp))
+        return entry
+
+    async def verify_token(self, token: str) -> Dict:
+        """Verify JWT token with JWKS"""
+        entry = await self._verify_cached(token)
+        return entry.payload
+
+    async def get_user(self, token: str) -> User:
+        """
+        Verify the token and return its User, reusing the cached principal when possible
+        """
+        entry = await self._verify_cached(token)
+        if entry.user is None:
+            user_data = entry.payload.get("user") or entry.payload
+            entry.user = User.from_supabase(user_data)
+        return entry.user
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jwks": {
+                "refreshes": self.refresh_count,
+                "refresh_failures": self.refresh_failures,
+                "max_age": self._max_age,
+                "refreshing": self._refresh_task is not None and not self._refresh_task.done(),
+                "retry_in_seconds": round(max(0.0, self._retry_at - time.monotonic()), 1),
+            },
+            "token_cache": self._token_cache.stats(),
+            "key_cache": {
+                "size": len(self._public_keys),
+                "hits": self.key_cache_hits,
+                "misses": self.key_cache_misses,
+            },
+        }
+
+jwks_verifier = JWKSVerifier()
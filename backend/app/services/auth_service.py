@@ -1,9 +1,12 @@
-from typing import Optional
+import hashlib
+from typing import Dict, Optional
 from datetime import timedelta
 import httpx
 from fastapi import Request, Response
 from app.core.config import get_settings
 from app.core.exceptions import AuthException, OAuthException, TokenException
+from app.core.http_client import UpstreamClient, http_client
+from app.core.singleflight import ResultBackend, SingleFlight, SingleFlightError
 from app.security.oauth import OAuthHandler
 from app.security.jwks import jwks_verifier
 from app.schemas.auth import AuthResponse, LoginResponse, LogoutResponse, RefreshTokenResponse, SessionRequest, SessionResponse
@@ -16,8 +19,19 @@ class AuthService:
     Authentication service handling OAuth flows, token management, and sessions
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[UpstreamClient] = None,
+        refresh_backend: Optional[ResultBackend] = None,
+    ):
         self.oauth_handler = OAuthHandler()
+        self.http_client = client or http_client
+        # --- Concurrent refreshes of the same token share one upstream exchange ---
+        self.refresh_flight = SingleFlight(
+            backend=refresh_backend,
+            result_ttl=settings.REFRESH_COALESCE_TTL_SECONDS,
+            wait_timeout=settings.HTTP_TIMEOUT_TOKEN_SECONDS,
+        )
         self.supabase_token_url = f"{settings.SUPABASE_URL}/auth/v1/token"
         self.supabase_logout_url = f"{settings.SUPABASE_URL}/auth/v1/logout"
     
@@ -99,6 +113,28 @@ class AuthService:
             **cookie_config
         )
     
+    async def _exchange_refresh_token(self, refresh_token: str) -> Dict:
+        """
+        Call the Supabase token endpoint with a refresh token
+        """
+        token_response = await self.http_client.post(
+            self.supabase_token_url,
+            endpoint="token",
+            json={
+                "grant_type": "refresh_token",
+                "refresh_token": refresh_token
+            },
+            headers={
+                "Authorization": f"Bearer {settings.SUPABASE_ANON_KEY}",
+                "Content-Type": "application/json"
+            },
+        )
+
+        if token_response.status_code != 200:
+            raise AuthException("Token refresh failed")
+
+        return token_response.json()
+
     async def refresh_access_token(
         self,
         request: Request,
@@ -113,57 +149,46 @@ class AuthService:
             if not refresh_token:
                 raise AuthException("No refresh token found")
             
-            # --- Call Supabase token endpoint ---
-            async with httpx.AsyncClient() as client:
-                token_response = await client.post(
-                    self.supabase_token_url,
-                    json={
-                        "grant_type": "refresh_token",
-                        "refresh_token": refresh_token
-                    },
-                    headers={
-                        "Authorization": f"Bearer {settings.SUPABASE_ANON_KEY}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=10.0
-                )
-
-                if token_response.status_code != 200:
-                    raise AuthException("Token refresh failed")
-
-                data = token_response.json()
+            # --- Exchange it with Supabase, coalesced per refresh token ---
+            key = hashlib.sha256(refresh_token.encode()).hexdigest()
+            data = await self.refresh_flight.do(
+                key, lambda: self._exchange_refresh_token(refresh_token)
+            )
 
-                # Update access token cookie
-                cookie_config = {
-                    "httponly": settings.COOKIE_HTTPONLY,
-                    "secure": settings.COOKIE_SECURE,
-                    "samesite": settings.COOKIE_SAMESITE,
-                    "domain": settings.COOKIE_DOMAIN if settings.COOKIE_DOMAIN != "localhost" else None,
-                }
-                
+            # Update access token cookie
+            cookie_config = {
+                "httponly": settings.COOKIE_HTTPONLY,
+                "secure": settings.COOKIE_SECURE,
+                "samesite": settings.COOKIE_SAMESITE,
+                "domain": settings.COOKIE_DOMAIN if settings.COOKIE_DOMAIN != "localhost" else None,
+            }
+            
+            response.set_cookie(
+                key="sb-access-token",
+                value=data["access_token"],
+                max_age=data["expires_in"],
+                **cookie_config
+            )
+            
+            # If new refresh token provided, update it too
+            if "refresh_token" in data:
                 response.set_cookie(
-                    key="sb-access-token",
-                    value=data["access_token"],
-                    max_age=data["expires_in"],
+                    key="sb-refresh-token",
+                    value=data["refresh_token"],
+                    max_age=int(timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS).total_seconds()),
                     **cookie_config
                 )
-                
-                # If new refresh token provided, update it too
-                if "refresh_token" in data:
-                    response.set_cookie(
-                        key="sb-refresh-token",
-                        value=data["refresh_token"],
-                        max_age=int(timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS).total_seconds()),
-                        **cookie_config
-                    )
-                
-                return RefreshTokenResponse(
-                    access_token=data["access_token"],
-                    expires_in=data["expires_in"]
-                )
+            
+            return RefreshTokenResponse(
+                access_token=data["access_token"],
+                expires_in=data["expires_in"]
+            )
                 
         except httpx.RequestError as e:
             raise AuthException(f"Network error during token refresh: {str(e)}")
+        except SingleFlightError as e:
+            # --- Another worker's exchange of this token failed or stalled; do not exchange it twice ---
+            raise AuthException(str(e))
     
     async def logout(self, request: Request, response: Response) -> LogoutResponse:
         """
@@ -176,14 +201,13 @@ class AuthService:
             # --- Optionally call Supabase logout endpoint to revoke tokens ---
             if refresh_token:
                 try:
-                    async with httpx.AsyncClient() as client:
-                        await client.post(
-                            self.supabase_logout_url,
-                            headers={
-                                "Authorization": f"Bearer {refresh_token}"
-                            },
-                            timeout=5.0
-                        )
+                    await self.http_client.post(
+                        self.supabase_logout_url,
+                        endpoint="logout",
+                        headers={
+                            "Authorization": f"Bearer {refresh_token}"
+                        },
+                    )
                 except:
                     # Don't fail logout if revocation fails
                     pass
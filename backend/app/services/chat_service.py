@@ -0,0 +1,311 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.sse import format_event, with_heartbeat
+from app.rag.chain import ChainEvent, RAGChain
+from app.rag.embedding_cache import normalize_text
+from app.rag.vector_ops import normalize
+from app.schemas.chat import ChatRequest, Conversation, RetrievedChunk
+from app.schemas.document import DocumentInfo, DocumentStatus
+from app.schemas.user import User
+from app.services.conversation_service import ConversationService, conversation_service
+from app.services.document_service import DocumentService, document_service
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    scope: str
+    vector: np.ndarray
+    answer: str
+    chunks: List[Dict[str, Any]]
+    document_ids: Sequence[str]
+    expires_at: float
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    Reuses answers to questions that mean the same thing over the same documents.
+
+    Entries are grouped by scope: the exact set of documents searched, each
+    with its version, plus the retrieval depth and model. Within a scope the
+    query embedding is compared with every cached question in one matrix
+    product, and the best match at or above `threshold` cosine similarity
+    is reused. Re-indexing a document changes its version, so older entries
+    can no longer match; `invalidate_document` also drops them right away.
+    Entries expire after `ttl` seconds and the least recently used go first
+    beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.CHAT_CACHE_MAX_ENTRIES,
+        ttl: float = settings.CHAT_CACHE_TTL_SECONDS,
+        threshold: float = settings.CHAT_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._scopes: Dict[str, List[str]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def scope_key(documents: Sequence[DocumentInfo], k: int) -> str:
+        versions = sorted(f"{d.id}:{d.sha256}:{d.updated_at.isoformat() if d.updated_at else ''}" for d in documents)
+        digest = hashlib.sha256(f"{settings.LLM_MODEL}\0{k}\0{'|'.join(versions)}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, scope: str, query: np.ndarray) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+        query = normalize(query)[0]
+        with self._lock:
+            ids = self._scopes.get(scope)
+            if ids:
+                matrix = self._matrices.get(scope)
+                if matrix is None:
+                    matrix = self._matrices[scope] = np.stack([self._entries[i].vector for i in ids])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id = ids[best]
+                    entry = self._entries[entry_id]
+                    if entry.expires_at > time.time():
+                        self._entries.move_to_end(entry_id)
+                        entry.hits += 1
+                        self.hits += 1
+                        return entry
+                    self._remove(entry_id)
+                    self.expirations += 1
+            self.misses += 1
+        return None
+
+    def put(
+        self,
+        scope: str,
+        query: np.ndarray,
+        answer: str,
+        chunks: List[Dict[str, Any]],
+        document_ids: Sequence[str],
+    ) -> None:
+        if not self.enabled:
+            return
+        entry = CachedAnswer(
+            scope=scope,
+            vector=normalize(query)[0].astype(np.float32),
+            answer=answer,
+            chunks=chunks,
+            document_ids=list(document_ids),
+            expires_at=time.time() + self.ttl,
+        )
+        with self._lock:
+            entry_id = uuid.uuid4().hex
+            self._entries[entry_id] = entry
+            self._scopes.setdefault(scope, []).append(entry_id)
+            self._matrices.pop(scope, None)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_document(self, document: DocumentInfo) -> int:
+        """
+        Drop every entry whose scope includes `document`
+        """
+        with self._lock:
+            stale = [i for i, entry in self._entries.items() if document.id in entry.document_ids]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._scopes[entry.scope]
+        ids.remove(entry_id)
+        self._matrices.pop(entry.scope, None)
+        if not ids:
+            del self._scopes[entry.scope]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._matrices.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "scopes": len(self._scopes),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class ChatService:
+    """
+    Streams RAG answers to the client as Server-Sent Events.
+
+    Completed answers are kept in a semantic cache; a repeated question over
+    unchanged documents is answered from it without retrieval or generation.
+    Questions asked within a conversation carry its history and are not
+    answered from the cache once there is history to consider.
+    """
+
+    def __init__(
+        self,
+        chain: Optional[RAGChain] = None,
+        documents: Optional[DocumentService] = None,
+        cache: Optional[SemanticAnswerCache] = None,
+        conversations: Optional[ConversationService] = None,
+    ):
+        self._chain = chain
+        self.documents = documents or document_service
+        self.cache = cache or SemanticAnswerCache()
+        self.conversations = conversations or conversation_service
+        self.documents.index_listeners.append(self.cache.invalidate_document)
+
+    @property
+    def chain(self) -> RAGChain:
+        if self._chain is None:
+            self._chain = RAGChain()
+        return self._chain
+
+    def _documents(self, user: User, requested: Optional[List[str]]) -> List[DocumentInfo]:
+        """
+        The user's ready documents, narrowed to `requested` when given
+        """
+        ready = [
+            document
+            for document in self.documents.list_documents(user.id)
+            if document.status == DocumentStatus.READY
+        ]
+        if requested is None:
+            return ready
+        wanted = set(requested)
+        return [document for document in ready if document.id in wanted]
+
+    async def _frames(
+        self,
+        user: User,
+        chat_request: ChatRequest,
+        conversation: Optional[Conversation] = None,
+    ) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        events: Optional[AsyncGenerator[ChainEvent, None]] = None
+        chunks: List[Dict[str, Any]] = []
+        answer: List[str] = []
+        try:
+            # --- Embedding, history and cache lookups fail like generation does: with an error frame ---
+            documents = self._documents(user, chat_request.document_ids)
+            document_ids = [document.id for document in documents]
+            scope = self.cache.scope_key(documents, chat_request.top_k or self.chain.top_k)
+            query = await self.chain.embed_query(normalize_text(chat_request.message))
+            history = await self.conversations.history(conversation) if conversation is not None else []
+            turn = {"conversation_id": conversation.id} if conversation is not None else {}
+
+            cached = self.cache.get(scope, query) if document_ids and not history else None
+            if cached is not None:
+                if conversation is not None:
+                    await self.conversations.record(conversation, chat_request.message, cached.answer)
+                yield format_event("retrieval", {"chunks": cached.chunks})
+                yield format_event("token", {"text": cached.answer})
+                yield format_event(
+                    "done", {"cached": True, **turn, "total_ms": round(1000 * (time.perf_counter() - started), 2)}
+                )
+                return
+
+            events = self.chain.stream(
+                user.id, chat_request.message, document_ids, chat_request.top_k, query, history
+            )
+            async for event in events:
+                if event.type == "token":
+                    answer.append(event.data)
+                    yield format_event("token", {"text": event.data})
+                elif event.type == "retrieval":
+                    chunks = [
+                        RetrievedChunk(
+                            document_id=hit.document_id,
+                            start=hit.start,
+                            end=hit.end,
+                            score=hit.score,
+                            text=hit.text,
+                        ).model_dump()
+                        for hit in event.data
+                    ]
+                    yield format_event("retrieval", {"chunks": chunks})
+                elif event.type == "done":
+                    # --- Only complete answers are cached and recorded ---
+                    if chunks and not history:
+                        self.cache.put(scope, query, "".join(answer), chunks, document_ids)
+                    if conversation is not None:
+                        await self.conversations.record(conversation, chat_request.message, "".join(answer))
+                    yield format_event("done", {**event.data, **turn})
+                else:
+                    yield format_event(event.type, event.data)
+        except Exception:
+            logger.exception("Chat stream failed")
+            yield format_event("error", {"detail": "Failed to generate a response"})
+        finally:
+            if events is not None:
+                await events.aclose()
+
+    def stream_chat(
+        self,
+        user: User,
+        chat_request: ChatRequest,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        conversation: Optional[Conversation] = None,
+    ) -> AsyncIterator[str]:
+        """
+        SSE frames: retrieval, then token..., then done (or error), with
+        heartbeat comments while idle. Stops when the client disconnects.
+        Within a `conversation` the turn is answered with its history and
+        appended to it once complete.
+        """
+        return with_heartbeat(
+            self._frames(user, chat_request, conversation),
+            settings.CHAT_HEARTBEAT_SECONDS,
+            is_disconnected,
+        )
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    return chat_service.cache
+
+
+# Singleton instance
+chat_service = ChatService()
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import uuid
+import weakref
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import status
+
+from app.core.config import get_settings
+from app.core.exceptions import ConversationException
+from app.rag.context import TokenCounter
+from app.rag.llm import LLM, Message, get_llm
+from app.schemas.chat import ChatMessage, Conversation, ConversationDetail, MessageRole
+from app.services.conversation_store import ConversationStore, build_conversation_store
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Update the summary with the new messages. Keep names, facts, numbers, decisions and open "
+    "questions; drop pleasantries. Reply with the updated summary only."
+)
+
+_TITLE_CHARS = 80
+
+
+class ConversationService:
+    """
+    Chat history with a bounded prompt cost.
+
+    Every message is stored once, with its token count. When the messages
+    after the running summary exceed `history_tokens`, the oldest of them
+    are folded into the summary by the model in the background, until at
+    most half the budget remains. A prompt is the summary plus the recent
+    messages, so turn N reads one conversation row and the recent tail of
+    the log instead of all N turns.
+    """
+
+    def __init__(
+        self,
+        store: Optional[ConversationStore] = None,
+        llm: Optional[LLM] = None,
+        counter: Optional[TokenCounter] = None,
+        history_tokens: int = settings.CHAT_HISTORY_TOKENS,
+        summary_tokens: int = settings.CHAT_HISTORY_SUMMARY_TOKENS,
+    ):
+        self._store = store
+        self._llm = llm
+        self.counter = counter or TokenCounter()
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._summarizing: Dict[str, asyncio.Task] = {}
+        self.summaries = 0
+        self.summary_failures = 0
+        self.messages_folded = 0
+
+    @property
+    def store(self) -> ConversationStore:
+        if self._store is None:
+            self._store = build_conversation_store()
+        return self._store
+
+    @property
+    def llm(self) -> LLM:
+        if self._llm is None:
+            self._llm = get_llm()
+        return self._llm
+
+    def _lock(self, conversation_id: str) -> asyncio.Lock:
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = self._locks[conversation_id] = asyncio.Lock()
+        return lock
+
+    # --- Conversations ---
+
+    async def create(self, owner_id: str, title: Optional[str] = None) -> Conversation:
+        conversation = Conversation(
+            id=uuid.uuid4().hex,
+            owner_id=owner_id,
+            title=title,
+            created_at=datetime.now(timezone.utc),
+        )
+        await asyncio.to_thread(self.store.create, conversation)
+        return conversation
+
+    async def get(self, owner_id: str, conversation_id: str) -> Conversation:
+        conversation = await asyncio.to_thread(self.store.get, conversation_id)
+        if conversation is None or conversation.owner_id != owner_id:
+            raise ConversationException("Conversation not found", status.HTTP_404_NOT_FOUND)
+        return conversation
+
+    async def list(self, owner_id: str, limit: int = 100) -> List[Conversation]:
+        return await asyncio.to_thread(self.store.list, owner_id, limit)
+
+    async def detail(self, owner_id: str, conversation_id: str, after: int = 0, limit: int = 100) -> ConversationDetail:
+        conversation = await self.get(owner_id, conversation_id)
+        messages = await asyncio.to_thread(self.store.messages, conversation_id, after, limit)
+        return ConversationDetail(conversation=conversation, messages=messages)
+
+    async def delete(self, owner_id: str, conversation_id: str) -> None:
+        await self.get(owner_id, conversation_id)
+        task = self._summarizing.pop(conversation_id, None)
+        if task is not None:
+            task.cancel()
+        await asyncio.to_thread(self.store.delete, conversation_id)
+
+    # --- Turns ---
+
+    async def history(self, conversation: Conversation) -> List[Message]:
+        """
+        Prompt messages standing for the conversation so far: the summary, then recent turns
+        """
+        recent = await asyncio.to_thread(self.store.messages, conversation.id, conversation.summarized_through)
+        # --- Summarizing lags behind a fast chat; send only the newest turns that fit ---
+        kept: List[ChatMessage] = []
+        used = 0
+        for message in reversed(recent):
+            if used + message.tokens > self.history_tokens:
+                break
+            kept.append(message)
+            used += message.tokens
+        history: List[Message] = []
+        if conversation.summary:
+            history.append({"role": "system", "content": f"Summary of the earlier conversation:\n{conversation.summary}"})
+        history.extend({"role": message.role.value, "content": message.content} for message in reversed(kept))
+        return history
+
+    async def record(self, conversation: Conversation, question: str, answer: str) -> Conversation:
+        """
+        Append a completed turn; starts summarizing once the recent log is over budget
+        """
+        async with self._lock(conversation.id):
+            current = await asyncio.to_thread(self.store.get, conversation.id) or conversation
+            if current.title is None:
+                current.title = " ".join(question.split())[:_TITLE_CHARS]
+            now = datetime.now(timezone.utc)
+            messages = [
+                self._message(current.id, MessageRole.USER, question, now),
+                self._message(current.id, MessageRole.ASSISTANT, answer, now),
+            ]
+            await asyncio.to_thread(self.store.append, current, messages)
+        if current.recent_tokens > self.history_tokens:
+            self._schedule_summary(current.id)
+        return current
+
+    def _message(self, conversation_id: str, role: MessageRole, content: str, created_at: datetime) -> ChatMessage:
+        return ChatMessage(
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            tokens=self.counter.count(content),
+            created_at=created_at,
+        )
+
+    # --- Summaries ---
+
+    def _schedule_summary(self, conversation_id: str) -> None:
+        if conversation_id in self._summarizing:
+            return
+        task = asyncio.create_task(self._summarize(conversation_id))
+        self._summarizing[conversation_id] = task
+        task.add_done_callback(lambda _: self._summarizing.pop(conversation_id, None))
+
+    async def _summarize(self, conversation_id: str) -> None:
+        try:
+            conversation = await asyncio.to_thread(self.store.get, conversation_id)
+            if conversation is None:
+                return
+            through = conversation.summarized_through
+            recent = await asyncio.to_thread(self.store.messages, conversation_id, through)
+            # --- Fold the oldest messages until at most half the budget remains ---
+            remaining = conversation.recent_tokens
+            folded: List[ChatMessage] = []
+            for message in recent:
+                if remaining <= self.history_tokens // 2:
+                    break
+                folded.append(message)
+                remaining -= message.tokens
+            if not folded:
+                return
+            summary = await self.summarize(conversation.summary, folded)
+
+            async with self._lock(conversation_id):
+                current = await asyncio.to_thread(self.store.get, conversation_id)
+                if current is None or current.summarized_through != through:
+                    return
+                current.summary = summary
+                current.summary_tokens = self.counter.count(summary)
+                current.summarized_through = folded[-1].seq
+                current.recent_tokens -= sum(message.tokens for message in folded)
+                current.updated_at = datetime.now(timezone.utc)
+                await asyncio.to_thread(self.store.save_summary, current)
+            self.summaries += 1
+            self.messages_folded += len(folded)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.summary_failures += 1
+            logger.exception("Summarizing conversation %s failed", conversation_id)
+
+    async def summarize(self, previous: str, messages: Sequence[ChatMessage]) -> str:
+        """
+        The running summary extended with `messages`, capped at `summary_tokens`
+        """
+        turns = "\n".join(f"{message.role.value}: {message.content}" for message in messages)
+        prompt: List[Message] = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n{turns}"},
+        ]
+        parts: List[str] = []
+        tokens = self.llm.stream(prompt)
+        try:
+            async for token in tokens:
+                parts.append(token)
+        finally:
+            await tokens.aclose()
+        return self.counter.truncate("".join(parts).strip(), self.summary_tokens)
+
+    async def close(self) -> None:
+        tasks = list(self._summarizing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(self.store.close)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": self.store.stats(),
+            "history_tokens": self.history_tokens,
+            "summary_tokens": self.summary_tokens,
+            "summarizing": len(self._summarizing),
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+            "messages_folded": self.messages_folded,
+            "token_counts": self.counter.stats(),
+        }
+
+
+def get_conversation_service() -> ConversationService:
+    return conversation_service
+
+
+# Singleton instance
+conversation_service = ConversationService()
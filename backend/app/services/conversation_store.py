@@ -0,0 +1,255 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import get_settings
+from app.schemas.chat import ChatMessage, Conversation
+
+settings = get_settings()
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "db", "conversations.sql")
+
+# --- Columns written when messages are appended and when the summary moves ---
+_APPEND_FIELDS = ("title", "message_count", "recent_tokens", "updated_at")
+_SUMMARY_FIELDS = ("summary", "summary_tokens", "summarized_through", "recent_tokens", "updated_at")
+
+
+class ConversationStore(ABC):
+    """
+    Conversations and their append-only message logs.
+
+    The conversation row carries what the next prompt needs (the running
+    summary, the last message it covers and the tokens since) so building
+    a turn reads one row plus the messages after the summary, however long
+    the conversation has become.
+    """
+
+    @abstractmethod
+    def create(self, conversation: Conversation) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        ...
+
+    @abstractmethod
+    def list(self, owner_id: str, limit: int = 100) -> List[Conversation]:
+        """
+        Most recently updated first
+        """
+
+    @abstractmethod
+    def append(self, conversation: Conversation, messages: Sequence[ChatMessage]) -> None:
+        """
+        Number `messages` after the log's last one, store them and update the counters
+        """
+
+    @abstractmethod
+    def save_summary(self, conversation: Conversation) -> None:
+        """
+        Persist the summary fields after older messages were folded in
+        """
+
+    @abstractmethod
+    def messages(self, conversation_id: str, after: int = 0, limit: Optional[int] = None) -> List[ChatMessage]:
+        """
+        Messages with seq > `after`, oldest first
+        """
+
+    @abstractmethod
+    def delete(self, conversation_id: str) -> bool:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+def _sequence(conversation: Conversation, messages: Sequence[ChatMessage]) -> None:
+    for message in messages:
+        conversation.message_count += 1
+        conversation.recent_tokens += message.tokens
+        message.seq = conversation.message_count
+    conversation.updated_at = datetime.now(timezone.utc)
+
+
+@dataclass
+class _Log:
+    conversation: Conversation
+    messages: List[ChatMessage] = field(default_factory=list)
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Process-local store; beyond `max_conversations` the least recently used
+    conversation is dropped with its log
+    """
+
+    def __init__(self, max_conversations: int = settings.CONVERSATION_MEMORY_MAX):
+        self.max_conversations = max_conversations
+        self._logs: "OrderedDict[str, _Log]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def create(self, conversation: Conversation) -> None:
+        with self._lock:
+            self._logs[conversation.id] = _Log(conversation)
+            while len(self._logs) > self.max_conversations:
+                self._logs.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        with self._lock:
+            log = self._logs.get(conversation_id)
+            if log is None:
+                return None
+            self._logs.move_to_end(conversation_id)
+            return log.conversation
+
+    def list(self, owner_id: str, limit: int = 100) -> List[Conversation]:
+        with self._lock:
+            owned = [log.conversation for log in self._logs.values() if log.conversation.owner_id == owner_id]
+        owned.sort(key=lambda c: c.updated_at or c.created_at, reverse=True)
+        return owned[:limit]
+
+    def append(self, conversation: Conversation, messages: Sequence[ChatMessage]) -> None:
+        with self._lock:
+            log = self._logs.get(conversation.id)
+            if log is None:
+                raise KeyError(conversation.id)
+            _sequence(conversation, messages)
+            log.conversation = conversation
+            log.messages.extend(messages)
+            self._logs.move_to_end(conversation.id)
+
+    def save_summary(self, conversation: Conversation) -> None:
+        with self._lock:
+            log = self._logs.get(conversation.id)
+            if log is not None:
+                log.conversation = conversation
+
+    def messages(self, conversation_id: str, after: int = 0, limit: Optional[int] = None) -> List[ChatMessage]:
+        with self._lock:
+            log = self._logs.get(conversation_id)
+            if log is None:
+                return []
+            # --- seq n lives at index n - 1, so the tail is a slice ---
+            end = len(log.messages) if limit is None else after + limit
+            return log.messages[after:end]
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._logs.pop(conversation_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "conversations": len(self._logs),
+            "max_conversations": self.max_conversations,
+            "evictions": self.evictions,
+        }
+
+
+class PostgresConversationStore(ConversationStore):
+    """
+    Conversations in Postgres through the Supabase table API.
+
+    Works with any client exposing the supabase-py `table()` query builder:
+    the service-role Supabase client in production, or `LocalTableClient`
+    (SQLite, same schema from app/db/conversations.sql) locally. Appends
+    are one batched insert plus one row update; (conversation_id, seq) is
+    the primary key, so concurrent appends cannot reuse a position.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        conversations_table: str = "chat_conversations",
+        messages_table: str = "chat_messages",
+    ):
+        self._client = client
+        self.conversations_table = conversations_table
+        self.messages_table = messages_table
+        self.requests = 0
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            from app.db.supabase_client import get_supabase_service_client
+
+            self._client = get_supabase_service_client()
+        return self._client
+
+    def _conversations(self):
+        self.requests += 1
+        return self.client.table(self.conversations_table)
+
+    def _messages(self):
+        self.requests += 1
+        return self.client.table(self.messages_table)
+
+    def create(self, conversation: Conversation) -> None:
+        self._conversations().insert(conversation.model_dump(mode="json")).execute()
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        rows = self._conversations().select("*").eq("id", conversation_id).limit(1).execute().data
+        return Conversation.model_validate(rows[0]) if rows else None
+
+    def list(self, owner_id: str, limit: int = 100) -> List[Conversation]:
+        rows = (
+            self._conversations().select("*").eq("owner_id", owner_id)
+            .order("updated_at", desc=True).limit(limit).execute().data
+        )
+        return [Conversation.model_validate(row) for row in rows]
+
+    def append(self, conversation: Conversation, messages: Sequence[ChatMessage]) -> None:
+        if not messages:
+            return
+        _sequence(conversation, messages)
+        self._messages().insert([message.model_dump(mode="json") for message in messages]).execute()
+        self._update(conversation, _APPEND_FIELDS)
+
+    def save_summary(self, conversation: Conversation) -> None:
+        self._update(conversation, _SUMMARY_FIELDS)
+
+    def _update(self, conversation: Conversation, fields: Sequence[str]) -> None:
+        values = conversation.model_dump(mode="json", include=set(fields))
+        self._conversations().update(values).eq("id", conversation.id).execute()
+
+    def messages(self, conversation_id: str, after: int = 0, limit: Optional[int] = None) -> List[ChatMessage]:
+        query = self._messages().select("*").eq("conversation_id", conversation_id).gt("seq", after).order("seq")
+        if limit is not None:
+            query = query.limit(limit)
+        return [ChatMessage.model_validate(row) for row in query.execute().data]
+
+    def delete(self, conversation_id: str) -> bool:
+        self._messages().delete().eq("conversation_id", conversation_id).execute()
+        return bool(self._conversations().delete().eq("id", conversation_id).execute().data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self.client).__name__, "requests": self.requests}
+
+    def close(self) -> None:
+        close = getattr(self._client, "close", None)
+        if callable(close):
+            close()
+
+
+def build_conversation_store(kind: str = settings.CONVERSATION_STORE) -> ConversationStore:
+    if kind == "memory":
+        return InMemoryConversationStore()
+    if kind == "supabase":
+        return PostgresConversationStore()
+    if kind == "local":
+        from app.db.local_tables import LocalTableClient
+
+        with open(SCHEMA_PATH, encoding="utf-8") as fh:
+            schema = fh.read()
+        return PostgresConversationStore(LocalTableClient(os.path.join(settings.DATA_DIR, "conversations.sqlite3"), schema))
+    raise ValueError(f"Unknown CONVERSATION_STORE: {kind}")
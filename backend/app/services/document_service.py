@@ -0,0 +1,490 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import UploadFile, status
+
+from app.core.config import get_settings
+from app.core.exceptions import DocumentException
+from app.rag.embeddings import Embedder, get_embedder
+from app.rag.loader import TEXT_EXTENSIONS, is_supported, load_sections
+from app.rag.manifest import ChunkManifest, ManifestDiff, splitter_signature
+from app.rag.parser_pool import ParserPool, get_parser_pool
+from app.rag.pipeline import ChunkBatch, IngestionPipeline, IngestStats
+from app.rag.splitter import TextSplitter, get_splitter
+from app.rag.vector_store import PartitionedVectorStore, VectorStore, get_partitioned_store
+from app.schemas.document import DocumentInfo, DocumentStatus
+from app.schemas.job import JobInfo, JobPriority
+from app.services.job_scheduler import JobScheduler, ProgressReporter, get_job_scheduler
+
+settings = get_settings()
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+INGEST_JOB = "document.ingest"
+
+
+class VectorStoreSink:
+    """
+    Pipeline sink appending embedded chunks of one document to the vector store;
+    pending chunks stay out of search until the store commits them
+    """
+
+    def __init__(
+        self, store: VectorStore, document_id: str, diff: Optional[ManifestDiff] = None, pending: bool = False
+    ):
+        self.store = store
+        self.document_id = document_id
+        self.diff = diff
+        self.pending = pending
+        self.count = 0
+
+    async def write(self, batch: ChunkBatch) -> None:
+        rows = self.store.add(
+            self.document_id, batch.vectors, batch.starts, batch.ends, batch.texts, pending=self.pending
+        )
+        if self.diff is not None:
+            self.diff.assign(rows)
+        self.count += len(batch)
+
+
+class DocumentService:
+    """
+    Document upload, storage and ingestion.
+
+    Each document keeps a manifest of its chunk hashes, so re-uploading an
+    edited version only embeds the chunks that changed. Ingestion runs as
+    a background job: uploads are stored, queued and answered right away.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        stores: Optional[PartitionedVectorStore] = None,
+        root: Optional[str] = None,
+        splitter: Optional[TextSplitter] = None,
+        parser_pool: Optional[ParserPool] = None,
+        scheduler: Optional[JobScheduler] = None,
+    ):
+        self.embedder = embedder or get_embedder()
+        self._stores = stores
+        self.root = root or settings.documents_dir
+        self.splitter = splitter or get_splitter()
+        self.parser_pool = parser_pool or get_parser_pool()
+        self.scheduler = scheduler or get_job_scheduler()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # --- Called with each document after it is (re-)indexed ---
+        self.index_listeners: List[Callable[[DocumentInfo], None]] = []
+
+    @property
+    def stores(self) -> PartitionedVectorStore:
+        # --- Per-owner index partitions, mapped on first use rather than at import ---
+        if self._stores is None:
+            self._stores = get_partitioned_store()
+        return self._stores
+
+    # --- Paths ---
+
+    def _owner_dir(self, owner_id: str) -> str:
+        if not _SAFE_ID.match(owner_id):
+            raise DocumentException("Invalid owner id")
+        return os.path.join(self.root, owner_id)
+
+    def _document_dir(self, owner_id: str, document_id: str) -> str:
+        if not _SAFE_ID.match(document_id):
+            raise DocumentException("Document not found", status.HTTP_404_NOT_FOUND)
+        return os.path.join(self._owner_dir(owner_id), document_id)
+
+    def source_path(self, document: DocumentInfo) -> str:
+        extension = os.path.splitext(document.filename)[1].lower()
+        return os.path.join(self._document_dir(document.owner_id, document.id), f"source{extension}")
+
+    def _manifest_path(self, document: DocumentInfo) -> str:
+        return os.path.join(self._document_dir(document.owner_id, document.id), "manifest.json")
+
+    # --- Upload ---
+
+    async def save_upload(self, owner_id: str, upload: UploadFile) -> DocumentInfo:
+        """
+        Copy the spooled upload to durable storage as a new document
+        """
+        filename = self._check_filename(upload)
+        document = DocumentInfo(
+            id=uuid.uuid4().hex,
+            owner_id=owner_id,
+            filename=filename,
+            content_type=upload.content_type,
+            sha256="",
+            created_at=datetime.now(timezone.utc),
+        )
+        directory = self._document_dir(owner_id, document.id)
+        os.makedirs(directory, exist_ok=True)
+        try:
+            document.size_bytes, document.sha256 = await self._receive(upload, self.source_path(document))
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        self._save_info(document)
+        return document
+
+    async def replace_upload(self, owner_id: str, document_id: str, upload: UploadFile) -> DocumentInfo:
+        """
+        Store a new version of a document and re-index only the chunks that changed
+        """
+        document = self.get_document(owner_id, document_id)
+        staged = await self._stage_replacement(document, upload)
+        if staged is None:
+            return document
+        return await self._apply_replacement(*staged)
+
+    async def _stage_replacement(
+        self, document: DocumentInfo, upload: UploadFile
+    ) -> Optional[Tuple[DocumentInfo, str]]:
+        """
+        Receive a new version next to the current one; returns its metadata
+        and staging path, or None when the content is unchanged
+        """
+        filename = self._check_filename(upload)
+        staging = os.path.join(
+            self._document_dir(document.owner_id, document.id),
+            f"incoming-{uuid.uuid4().hex}{os.path.splitext(filename)[1].lower()}",
+        )
+        try:
+            size, digest = await self._receive(upload, staging)
+        except BaseException:
+            _remove(staging)
+            raise
+        if digest == document.sha256 and document.status == DocumentStatus.READY:
+            _remove(staging)
+            return None
+
+        updated = document.model_copy(
+            update={
+                "filename": filename,
+                "content_type": upload.content_type,
+                "size_bytes": size,
+                "sha256": digest,
+            }
+        )
+        return updated, staging
+
+    async def _apply_replacement(
+        self,
+        updated: DocumentInfo,
+        staging: str,
+        report: Optional[ProgressReporter] = None,
+        final: bool = True,
+    ) -> DocumentInfo:
+        """
+        Index a staged version and swap it in; the staged file is kept for a
+        retry unless this is the `final` attempt
+        """
+        document = self.get_document(updated.owner_id, updated.id)
+        try:
+            updated = await self.ingest(
+                updated, source=staging, report=report, staged=document.status == DocumentStatus.READY
+            )
+        except DocumentException as e:
+            # --- The previous version is still indexed and served ---
+            if document.status == DocumentStatus.READY:
+                document.error = e.detail
+                self._save_info(document)
+            if final:
+                _remove(staging)
+            raise
+
+        previous_source = self.source_path(document)
+        os.replace(staging, self.source_path(updated))
+        if previous_source != self.source_path(updated):
+            _remove(previous_source)
+        return updated
+
+    def _check_filename(self, upload: UploadFile) -> str:
+        filename = os.path.basename(upload.filename or "")
+        if not filename or not is_supported(filename):
+            raise DocumentException(
+                "Unsupported file type",
+                status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        return filename
+
+    async def _receive(self, upload: UploadFile, path: str) -> Tuple[int, str]:
+        """
+        Copy the spooled upload to `path` in fixed-size blocks, hashing as it
+        goes and enforcing UPLOAD_MAX_BYTES; returns (size, sha256)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "wb") as out:
+            while True:
+                block = await upload.read(settings.UPLOAD_READ_CHUNK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > settings.UPLOAD_MAX_BYTES:
+                    raise DocumentException(
+                        "File too large",
+                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    )
+                digest.update(block)
+                await asyncio.to_thread(out.write, block)
+        return size, digest.hexdigest()
+
+    # --- Ingestion ---
+
+    async def ingest(
+        self,
+        document: DocumentInfo,
+        source: Optional[str] = None,
+        report: Optional[ProgressReporter] = None,
+        staged: bool = False,
+    ) -> DocumentInfo:
+        """
+        Stream a stored file through the ingestion pipeline.
+
+        Chunks are diffed against the document's manifest: unchanged chunks
+        keep their rows, new ones are embedded and appended, and rows of
+        removed chunks are tombstoned, so the cost of re-indexing an edited
+        version scales with the size of the edit. A `staged` version of a
+        ready document leaves the stored record on the current version and
+        its new chunks out of search until it is indexed; only success
+        writes its record and swaps the chunks in, in one index version.
+        """
+        lock = self._locks.setdefault(document.id, asyncio.Lock())
+        async with lock:
+            return await self._ingest(document, source or self.source_path(document), report, staged)
+
+    async def _ingest(
+        self,
+        document: DocumentInfo,
+        source: str,
+        report: Optional[ProgressReporter] = None,
+        staged: bool = False,
+    ) -> DocumentInfo:
+        if not staged:
+            self._set_status(document, DocumentStatus.PROCESSING)
+        # --- Pinned for the whole run so the owner's partition is not evicted mid-write ---
+        store = await asyncio.to_thread(self.stores.acquire, document.owner_id)
+        try:
+            return await self._index(document, source, store, report, staged)
+        finally:
+            self.stores.release(document.owner_id)
+
+    async def _index(
+        self,
+        document: DocumentInfo,
+        source: str,
+        store: VectorStore,
+        report: Optional[ProgressReporter] = None,
+        staged: bool = False,
+    ) -> DocumentInfo:
+        previous = ChunkManifest.load(self._manifest_path(document))
+        diff = ManifestDiff(previous, splitter_signature(self.splitter))
+        # --- A staged version's chunks stay hidden until it replaces the served one ---
+        sink = VectorStoreSink(store, document.id, diff, pending=staged)
+        pipeline = IngestionPipeline(
+            self.embedder,
+            splitter=self.splitter,
+            chunk_filter=diff,
+            on_progress=self._progress(document, report) if report else None,
+        )
+        try:
+            sections = load_sections(source, document.filename, self.splitter, self.parser_pool)
+            stats = await pipeline.run(sections, sink)
+        except Exception as e:
+            store.delete_rows(np.asarray(diff.added, dtype=np.int64))
+            if not staged:
+                document.error = str(e)
+                self._set_status(document, DocumentStatus.FAILED)
+            raise DocumentException(f"Failed to process document: {str(e)}")
+
+        # --- Show new chunks, move kept ones and tombstone every row not in the new manifest in one version ---
+        current = store.document_rows(document.id)
+        removed = current[~np.isin(current, diff.manifest.rows)]
+        store.commit_rows(np.asarray(diff.added, dtype=np.int64), removed, diff.kept_offsets())
+        await asyncio.to_thread(store.save)
+        diff.manifest.save(self._manifest_path(document))
+
+        document.chunk_count = len(diff.manifest)
+        document.chunks_embedded = stats.embedded
+        document.chunks_reused = len(diff.kept)
+        document.chunks_removed = len(removed)
+        document.error = None
+        self._set_status(document, DocumentStatus.READY)
+        for listener in self.index_listeners:
+            listener(document)
+        return document
+
+    def _progress(self, document: DocumentInfo, report: ProgressReporter):
+        # --- Characters read track bytes closely only for plain text ---
+        extension = os.path.splitext(document.filename)[1].lower()
+        total = document.size_bytes if extension in TEXT_EXTENSIONS else 0
+
+        def on_progress(stats: IngestStats) -> None:
+            report(
+                min(0.99, stats.characters / total) if total else None,
+                sections=stats.sections,
+                chunks=stats.chunks,
+                embedded=stats.embedded,
+            )
+
+        return on_progress
+
+    # --- Background jobs ---
+
+    async def enqueue_ingest(self, document: DocumentInfo) -> JobInfo:
+        """
+        Queue ingestion of a stored document; large files go to the back of the line
+        """
+        priority = JobPriority.LOW if document.size_bytes > settings.JOB_LARGE_FILE_BYTES else JobPriority.NORMAL
+        job = await self.scheduler.submit(INGEST_JOB, document.owner_id, document.id, priority=priority)
+        document.job_id = job.id
+        self._save_info(document)
+        return job
+
+    async def enqueue_replacement(
+        self, owner_id: str, document_id: str, upload: UploadFile
+    ) -> Tuple[DocumentInfo, Optional[JobInfo]]:
+        """
+        Stage a new version and queue its re-index ahead of new uploads, since
+        only changed chunks are embedded. Returns no job for identical content.
+        """
+        document = self.get_document(owner_id, document_id)
+        staged = await self._stage_replacement(document, upload)
+        if staged is None:
+            return document, None
+        updated, staging = staged
+        job = await self.scheduler.submit(
+            INGEST_JOB,
+            owner_id,
+            document_id,
+            payload={"version": updated.model_dump(mode="json"), "staging": staging},
+            priority=JobPriority.HIGH,
+        )
+        document.job_id = job.id
+        self._save_info(document)
+        return document, job
+
+    async def run_job(self, job: JobInfo, report: ProgressReporter) -> None:
+        """
+        Scheduler handler for INGEST_JOB
+        """
+        staging = job.payload.get("staging")
+        if staging:
+            updated = DocumentInfo.model_validate(job.payload["version"])
+            updated.job_id = job.id
+            final = job.attempts >= job.max_attempts
+            await self._apply_replacement(updated, staging, report, final)
+        else:
+            await self.ingest(self.get_document(job.owner_id, job.document_id), report=report)
+
+    def get_job(self, owner_id: str, job_id: str) -> JobInfo:
+        job = self.scheduler.get(job_id)
+        if job is None or job.owner_id != owner_id:
+            raise DocumentException("Job not found", status.HTTP_404_NOT_FOUND)
+        return job
+
+    def list_jobs(self, owner_id: str) -> List[JobInfo]:
+        return self.scheduler.list(owner_id=owner_id)
+
+    # --- Legacy index ---
+
+    def migrate_global_index(self, path: Optional[str] = None) -> int:
+        """
+        Split an index written before per-owner partitioning into partitions.
+
+        Rows of each stored document are copied into its owner's partition
+        and manifest rows are remapped; the old index is renamed to
+        `<path>.migrated`. Returns the number of rows moved.
+        """
+        path = path or os.path.join(settings.DATA_DIR, "index")
+        if not os.path.exists(os.path.join(path, "meta.json")) or not os.path.isdir(self.root):
+            return 0
+        legacy = VectorStore(path)
+        moved = 0
+        for owner_id in os.listdir(self.root):
+            if not _SAFE_ID.match(owner_id):
+                continue
+            with self.stores.use(owner_id) as store:
+                for document in self.list_documents(owner_id):
+                    moved += self._migrate_document(legacy, store, document)
+                store.save()
+        legacy.close()
+        os.replace(path, f"{path}.migrated")
+        return moved
+
+    def _migrate_document(self, legacy: VectorStore, store: VectorStore, document: DocumentInfo) -> int:
+        rows = legacy.document_rows(document.id)
+        mapping: Dict[int, int] = {}
+        for begin in range(0, len(rows), 4096):
+            part = rows[begin:begin + 4096]
+            hits = [legacy.hit(int(row)) for row in part]
+            added = store.add(
+                document.id,
+                legacy.get_vectors(part),
+                [hit.start for hit in hits],
+                [hit.end for hit in hits],
+                [hit.text for hit in hits],
+            )
+            mapping.update(zip(part.tolist(), added.tolist()))
+        manifest_path = self._manifest_path(document)
+        manifest = ChunkManifest.load(manifest_path)
+        if manifest is not None:
+            if all(row in mapping for row in manifest.rows):
+                manifest.rows = [mapping[row] for row in manifest.rows]
+                manifest.save(manifest_path)
+            else:
+                # --- Out of step with the index: the next upload re-embeds everything ---
+                _remove(manifest_path)
+        return len(rows)
+
+    # --- Registry ---
+
+    def get_document(self, owner_id: str, document_id: str) -> DocumentInfo:
+        path = os.path.join(self._document_dir(owner_id, document_id), "document.json")
+        if not os.path.exists(path):
+            raise DocumentException("Document not found", status.HTTP_404_NOT_FOUND)
+        with open(path, encoding="utf-8") as fh:
+            return DocumentInfo.model_validate_json(fh.read())
+
+    def list_documents(self, owner_id: str) -> List[DocumentInfo]:
+        directory = self._owner_dir(owner_id)
+        if not os.path.isdir(directory):
+            return []
+        documents = []
+        for document_id in os.listdir(directory):
+            try:
+                documents.append(self.get_document(owner_id, document_id))
+            except DocumentException:
+                continue
+        return sorted(documents, key=lambda d: d.created_at, reverse=True)
+
+    def _set_status(self, document: DocumentInfo, new_status: DocumentStatus) -> None:
+        document.status = new_status
+        document.updated_at = datetime.now(timezone.utc)
+        self._save_info(document)
+
+    def _save_info(self, document: DocumentInfo) -> None:
+        path = os.path.join(self._document_dir(document.owner_id, document.id), "document.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(document.model_dump_json())
+        os.replace(tmp_path, path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Singleton instance
+document_service = DocumentService()
+document_service.scheduler.register(INGEST_JOB, document_service.run_job)
@@ -0,0 +1,308 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.schemas.job import JobInfo, JobPriority, JobStatus
+from app.services.job_store import JobStore, build_job_store
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+ProgressReporter = Callable[..., None]
+JobHandler = Callable[[JobInfo, ProgressReporter], Awaitable[None]]
+
+_PROGRESS_SAVE_INTERVAL = 0.5
+
+
+class JobScheduler:
+    """
+    Background job queue with priorities, fair sharing and retries.
+
+    At most `concurrency` jobs run at once and at most `per_user` of them
+    belong to the same owner. Ready jobs wait in one priority heap per
+    owner; the dispatcher takes the highest priority available and breaks
+    ties round-robin across owners, so a user with 500 queued files gets
+    one turn per round like everyone else. Failed jobs are retried with
+    exponential backoff and jitter up to `max_attempts`.
+
+    Every state change is written to the job store. On start, jobs the
+    store still lists as queued or running are queued again.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        concurrency: int = settings.JOB_CONCURRENCY,
+        per_user: int = settings.JOB_PER_USER_CONCURRENCY,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        retry_base: float = settings.JOB_RETRY_BASE_SECONDS,
+        retry_max: float = settings.JOB_RETRY_MAX_SECONDS,
+    ):
+        self._store = store
+        self.concurrency = concurrency
+        self.per_user = per_user
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._handlers: Dict[str, JobHandler] = {}
+        self._jobs: Dict[str, JobInfo] = {}
+        self._ready: Dict[str, List[Tuple[int, int, str]]] = {}
+        self._owners: Deque[str] = deque()
+        self._delayed: List[Tuple[float, int, str]] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._running_per_owner: Counter = Counter()
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.recovered = 0
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = build_job_store()
+        return self._store
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        """
+        Requeue jobs left over from a previous run and start dispatching
+        """
+        if self._wakeup is not None:
+            return
+        self._wakeup = asyncio.Event()
+        for job in await asyncio.to_thread(self.store.active):
+            if job.id in self._jobs:
+                continue
+            if job.status == JobStatus.RUNNING:
+                # --- Interrupted mid-run; the attempt does not count ---
+                job.attempts = max(0, job.attempts - 1)
+                job.status = JobStatus.QUEUED
+                self.store.save(job)
+            self.recovered += 1
+            self._enqueue(job)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self) -> None:
+        """
+        Stop dispatching and cancel running jobs; they stay active in the store
+        """
+        tasks = list(self._running.values())
+        if self._dispatcher is not None:
+            tasks.append(self._dispatcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._wakeup = None
+        self._jobs.clear()
+        self._ready.clear()
+        self._owners.clear()
+        self._delayed.clear()
+        self._running.clear()
+        self._running_per_owner.clear()
+        self.store.close()
+
+    # --- Submission and queries ---
+
+    async def submit(
+        self,
+        kind: str,
+        owner_id: str,
+        document_id: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None,
+        priority: int = JobPriority.NORMAL,
+    ) -> JobInfo:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+        await self.start()
+        job = JobInfo(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            owner_id=owner_id,
+            document_id=document_id,
+            priority=int(priority),
+            payload=payload or {},
+            max_attempts=self.max_attempts,
+            created_at=datetime.now(timezone.utc),
+        )
+        self.store.save(job)
+        self.submitted += 1
+        self._enqueue(job)
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        # --- Active jobs are served live so progress is current ---
+        return self._jobs.get(job_id) or self.store.get(job_id)
+
+    def list(self, owner_id: Optional[str] = None, limit: int = 100) -> List[JobInfo]:
+        return [self._jobs.get(job.id, job) for job in self.store.list(owner_id=owner_id, limit=limit)]
+
+    def stats(self) -> Dict[str, Any]:
+        queued = Counter()
+        for owner, heap in self._ready.items():
+            queued[owner] = len(heap)
+        return {
+            "concurrency": self.concurrency,
+            "per_user": self.per_user,
+            "running": len(self._running),
+            "queued": sum(queued.values()),
+            "delayed": len(self._delayed),
+            "owners_waiting": len(self._owners),
+            "busiest_owners": [
+                {"owner_id": owner, "queued": count, "running": self._running_per_owner[owner]}
+                for owner, count in queued.most_common(10)
+            ],
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "recovered": self.recovered,
+        }
+
+    # --- Queues ---
+
+    def _enqueue(self, job: JobInfo) -> None:
+        self._jobs[job.id] = job
+        due = job.run_after.timestamp() if job.run_after else 0.0
+        if due > time.time():
+            heapq.heappush(self._delayed, (due, next(self._seq), job.id))
+            return
+        heap = self._ready.get(job.owner_id)
+        if heap is None:
+            heap = self._ready[job.owner_id] = []
+            self._owners.append(job.owner_id)
+        heapq.heappush(heap, (-job.priority, next(self._seq), job.id))
+
+    def _promote_delayed(self) -> Optional[float]:
+        """
+        Move due retries to the ready queues; returns seconds until the next one
+        """
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, job_id = heapq.heappop(self._delayed)
+            job = self._jobs[job_id]
+            job.run_after = None
+            self._enqueue(job)
+        return self._delayed[0][0] - now if self._delayed else None
+
+    def _next(self) -> Optional[JobInfo]:
+        # --- Highest priority first; ties go to the owner waiting longest for a turn ---
+        chosen: Optional[str] = None
+        for owner in self._owners:
+            if self._running_per_owner[owner] >= self.per_user:
+                continue
+            if chosen is None or self._ready[owner][0][0] < self._ready[chosen][0][0]:
+                chosen = owner
+        if chosen is None:
+            return None
+        heap = self._ready[chosen]
+        _, _, job_id = heapq.heappop(heap)
+        self._owners.remove(chosen)
+        if heap:
+            self._owners.append(chosen)
+        else:
+            del self._ready[chosen]
+        return self._jobs[job_id]
+
+    async def _dispatch(self) -> None:
+        while True:
+            delay = self._promote_delayed()
+            while len(self._running) < self.concurrency:
+                job = self._next()
+                if job is None:
+                    break
+                self._launch(job)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- Execution ---
+
+    def _launch(self, job: JobInfo) -> None:
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.updated_at = datetime.now(timezone.utc)
+        self.store.save(job)
+        self._running_per_owner[job.owner_id] += 1
+        self._running[job.id] = asyncio.create_task(self._run(job))
+
+    def _reporter(self, job: JobInfo) -> ProgressReporter:
+        last_saved = 0.0
+
+        def report(progress: Optional[float] = None, **detail: Any) -> None:
+            nonlocal last_saved
+            if progress is not None:
+                job.progress = round(min(1.0, max(0.0, progress)), 4)
+            job.detail.update(detail)
+            now = time.monotonic()
+            if now - last_saved >= _PROGRESS_SAVE_INTERVAL:
+                last_saved = now
+                job.updated_at = datetime.now(timezone.utc)
+                self.store.save(job)
+
+        return report
+
+    async def _run(self, job: JobInfo) -> None:
+        handler = self._handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job.kind}")
+            await handler(job, self._reporter(job))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.error = str(getattr(e, "detail", None) or e)
+            if job.attempts < job.max_attempts:
+                delay = min(self.retry_max, self.retry_base * 2 ** (job.attempts - 1)) * random.uniform(0.5, 1.0)
+                job.status = JobStatus.QUEUED
+                job.run_after = datetime.now(timezone.utc) + timedelta(seconds=delay)
+                self.retried += 1
+                logger.warning("Job %s failed (attempt %d), retrying in %.1fs: %s", job.id, job.attempts, delay, job.error)
+            else:
+                job.status = JobStatus.FAILED
+                self.failed += 1
+        else:
+            job.status = JobStatus.SUCCEEDED
+            job.progress = 1.0
+            job.error = None
+            self.succeeded += 1
+        finally:
+            self._running.pop(job.id, None)
+            self._running_per_owner[job.owner_id] -= 1
+            if self._running_per_owner[job.owner_id] <= 0:
+                del self._running_per_owner[job.owner_id]
+
+        job.updated_at = datetime.now(timezone.utc)
+        self.store.save(job)
+        if job.status == JobStatus.QUEUED:
+            self._enqueue(job)
+        else:
+            self._jobs.pop(job.id, None)
+        self._wakeup.set()
+
+
+def get_job_scheduler() -> JobScheduler:
+    return job_scheduler
+
+
+# Singleton instance
+job_scheduler = JobScheduler()
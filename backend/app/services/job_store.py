@@ -0,0 +1,167 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+from app.schemas.job import JobInfo, JobStatus
+
+settings = get_settings()
+
+ACTIVE_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+
+
+class JobStore(ABC):
+    """
+    Where job state lives. The scheduler keeps its run queues in memory and
+    writes every state change through here, so a persistent store lets
+    queued and interrupted jobs be picked up again after a restart.
+    """
+
+    @abstractmethod
+    def save(self, job: JobInfo) -> None:
+        """
+        Insert or update a job
+        """
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        ...
+
+    @abstractmethod
+    def list(
+        self,
+        owner_id: Optional[str] = None,
+        statuses: Optional[Iterable[JobStatus]] = None,
+        limit: int = 100,
+    ) -> List[JobInfo]:
+        """
+        Most recent jobs first
+        """
+
+    def active(self) -> List[JobInfo]:
+        """
+        Jobs that are queued or were running, oldest first
+        """
+        return sorted(self.list(statuses=ACTIVE_STATUSES, limit=-1), key=lambda job: job.created_at)
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: Dict[str, JobInfo] = {}
+
+    def save(self, job: JobInfo) -> None:
+        self._jobs[job.id] = job
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        return self._jobs.get(job_id)
+
+    def list(
+        self,
+        owner_id: Optional[str] = None,
+        statuses: Optional[Iterable[JobStatus]] = None,
+        limit: int = 100,
+    ) -> List[JobInfo]:
+        statuses = set(statuses) if statuses is not None else None
+        jobs = [
+            job for job in self._jobs.values()
+            if (owner_id is None or job.owner_id == owner_id) and (statuses is None or job.status in statuses)
+        ]
+        jobs.sort(key=lambda job: job.created_at, reverse=True)
+        return jobs if limit < 0 else jobs[:limit]
+
+
+class SQLiteJobStore(JobStore):
+    """
+    One row per job: indexed columns for lookups plus the job as JSON
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # --- Opened on first use so importing the module touches no files ---
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, owner_id TEXT NOT NULL, status TEXT NOT NULL, "
+                "created_at TEXT NOT NULL, data TEXT NOT NULL, payload TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner_id, created_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            db.commit()
+            self._db = db
+        return self._db
+
+    def save(self, job: JobInfo) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, owner_id, status, created_at, data, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.owner_id,
+                    job.status.value,
+                    job.created_at.isoformat(),
+                    job.model_dump_json(),
+                    json.dumps(job.payload),
+                ),
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            row = self._conn.execute("SELECT data, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _from_row(row) if row else None
+
+    def list(
+        self,
+        owner_id: Optional[str] = None,
+        statuses: Optional[Iterable[JobStatus]] = None,
+        limit: int = 100,
+    ) -> List[JobInfo]:
+        clauses, params = [], []
+        if owner_id is not None:
+            clauses.append("owner_id = ?")
+            params.append(owner_id)
+        if statuses is not None:
+            statuses = [status.value for status in statuses]
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data, payload FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [_from_row(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _from_row(row) -> JobInfo:
+    job = JobInfo.model_validate_json(row[0])
+    job.payload = json.loads(row[1])
+    return job
+
+
+def build_job_store(kind: str = settings.JOB_STORE) -> JobStore:
+    if kind == "memory":
+        return InMemoryJobStore()
+    if kind == "sqlite":
+        return SQLiteJobStore(os.path.join(settings.DATA_DIR, "jobs.sqlite3"))
+    raise ValueError(f"Unknown JOB_STORE: {kind}")
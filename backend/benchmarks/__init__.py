@@ -0,0 +1,19 @@
+"""
+Benchmarks for the backend. Run from the backend directory, e.g.
+
+    python -m benchmarks.bench_ingestion
+
+Required settings get harmless defaults so the scripts run without a .env.
+"""
+import os
+
+for _key, _value in {
+    "BACKEND_URL": "http://localhost:8000",
+    "FRONTEND_URL": "http://localhost:3000",
+    "SUPABASE_URL": "http://127.0.0.1:54321",
+    "SUPABASE_ANON_KEY": "benchmark-anon-key",
+    "SUPABASE_SERVICE_KEY": "benchmark-service-key",
+    "SESSION_SECRET": "benchmark-session-secret-benchmark-session",
+    "JWT_SECRET_KEY": "benchmark-jwt-secret-benchmark-jwt-secret",
+}.items():
+    os.environ.setdefault(_key, _value)
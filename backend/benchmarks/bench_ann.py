@@ -0,0 +1,98 @@
+"""
+Approximate (IVF) versus exact search on synthetic clustered embeddings.
+
+    python -m benchmarks.bench_ann --rows 200000 --dim 128
+
+Reports build time, recall@k against exact search and queries per second
+for a range of nprobe values, plus save / cold-load time of the index.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from app.rag.vector_ops import normalize
+from app.rag.vector_store import VectorStore
+
+
+def make_data(rows: int, dim: int, clusters: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.normal(size=(clusters, dim)))
+    labels = rng.integers(0, clusters, size=rows + queries)
+    points = centers[labels] + rng.normal(scale=1.4 / np.sqrt(dim), size=(rows + queries, dim))
+    points = normalize(points)
+    return points[:rows], points[rows:]
+
+
+def recall(approx: np.ndarray, exact: np.ndarray) -> float:
+    hits = sum(len(set(a[a >= 0]) & set(e)) for a, e in zip(approx, exact))
+    return hits / exact.size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    vectors, queries = make_data(args.rows, args.dim, args.clusters, args.queries)
+    results = {"rows": args.rows, "dim": args.dim, "k": args.k, "runs": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(tmp, args.dim, index_type="ivf")
+        started = time.perf_counter()
+        for begin in range(0, args.rows, 10_000):
+            batch = vectors[begin:begin + 10_000]
+            offsets = np.arange(len(batch))
+            store.add(f"doc-{begin}", batch, offsets, offsets + 1, [""] * len(batch))
+        results["ingest_seconds"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        store.train_index()
+        results["build_seconds"] = round(time.perf_counter() - started, 2)
+        print(f"ingest {results['ingest_seconds']}s (incremental), full rebuild {results['build_seconds']}s")
+
+        started = time.perf_counter()
+        _, exact_rows = store.search_rows(queries, args.k, exact=True)
+        exact_seconds = time.perf_counter() - started
+        results["exact_qps"] = round(args.queries / exact_seconds, 1)
+        print(f"exact    recall 1.000  {results['exact_qps']:>9} qps")
+
+        for nprobe in args.nprobe:
+            started = time.perf_counter()
+            _, rows = store.search_rows(queries, args.k, nprobe=nprobe)
+            seconds = time.perf_counter() - started
+            run = {
+                "nprobe": nprobe,
+                "recall": round(recall(rows, exact_rows), 4),
+                "qps": round(args.queries / seconds, 1),
+            }
+            results["runs"].append(run)
+            print(f"nprobe {nprobe:>3} recall {run['recall']:.3f}  {run['qps']:>9} qps")
+
+        started = time.perf_counter()
+        store.save()
+        results["save_seconds"] = round(time.perf_counter() - started, 2)
+        started = time.perf_counter()
+        loaded = VectorStore(tmp, args.dim, index_type="ivf")
+        results["load_seconds"] = round(time.perf_counter() - started, 3)
+        _, rows = loaded.search_rows(queries, args.k, nprobe=args.nprobe[-1])
+        print(
+            f"save {results['save_seconds']}s, cold load {results['load_seconds']}s, "
+            f"recall after load {recall(rows, exact_rows):.3f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
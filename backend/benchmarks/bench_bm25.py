@@ -0,0 +1,98 @@
+"""
+BM25 query latency with MaxScore pruning versus exhaustive scoring.
+
+    python -m benchmarks.bench_bm25 --chunks 1000000
+
+Builds the inverted index over synthetic chunks (Zipf-distributed words
+plus product and error identifiers) in ingestion-sized batches, then runs
+mixed queries (common words + an identifier) and reports per-query
+latency, how many postings were skipped and whether the top-k matched.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.rag.bm25 import BM25Index
+
+
+def make_chunks(count: int, begin: int, vocabulary: np.ndarray, rng: np.random.Generator, words: int = 60):
+    ranks = np.minimum(rng.zipf(1.2, size=(count, words)) - 1, len(vocabulary) - 1)
+    identifiers = rng.integers(0, count * 4, size=count)
+    texts = []
+    for i in range(count):
+        texts.append(f"{' '.join(vocabulary[ranks[i]])} SKU-{identifiers[i]:07d} ERR_{(begin + i) % 5000}")
+    return texts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vocabulary = np.array([f"w{i}" for i in range(args.vocabulary)])
+    index = BM25Index()
+    started = time.perf_counter()
+    for begin in range(0, args.chunks, 10_000):
+        count = min(10_000, args.chunks - begin)
+        index.add(np.arange(begin, begin + count), make_chunks(count, begin, vocabulary, rng))
+    build_seconds = time.perf_counter() - started
+    postings = int(index._sizes.sum())
+    print(f"indexed {args.chunks} chunks, {len(index._terms)} terms, {postings} postings in {build_seconds:.1f}s")
+
+    queries = [
+        f"{vocabulary[rng.integers(0, 50)]} {vocabulary[rng.integers(0, 500)]} "
+        f"{vocabulary[rng.integers(0, 5000)]} SKU-{rng.integers(0, args.chunks * 4):07d}"
+        for _ in range(args.queries)
+    ]
+    mask = np.ones(index.size, dtype=bool)
+    results = {"chunks": args.chunks, "postings": postings, "build_seconds": round(build_seconds, 1)}
+    tops = {}
+    for prune in (False, True):
+        latencies = []
+        tops[prune] = []
+        for query in queries:
+            started = time.perf_counter()
+            scores, rows = index.search(query, args.k, mask, prune=prune)
+            latencies.append(1000 * (time.perf_counter() - started))
+            tops[prune].append(set(rows.tolist()))
+        name = "maxscore" if prune else "exhaustive"
+        results[name] = {
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        }
+        print(f"{name:>10}: p50 {results[name]['p50_ms']:>7} ms  p95 {results[name]['p95_ms']:>7} ms")
+    agreement = np.mean([len(a & b) / max(1, len(a)) for a, b in zip(tops[False], tops[True])])
+    results["topk_agreement"] = round(float(agreement), 4)
+    print(f"top-{args.k} agreement with exhaustive: {agreement:.4f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bm25")
+        started = time.perf_counter()
+        index.save(path)
+        save_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        loaded = BM25Index.load(path)
+        load_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for query in queries:
+            loaded.search(query, args.k, mask)
+        cold_ms = 1000 * (time.perf_counter() - started) / len(queries)
+    results.update(save_seconds=round(save_seconds, 2), load_seconds=round(load_seconds, 2), loaded_query_ms=round(cold_ms, 2))
+    print(f"save {save_seconds:.2f}s, load {load_seconds:.2f}s, mean query after load {cold_ms:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
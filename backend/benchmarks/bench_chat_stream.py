@@ -0,0 +1,136 @@
+"""
+Time-to-first-token of the streaming chat endpoint against a fake LLM.
+
+    python -m benchmarks.bench_chat_stream --clients 20 --first-token-ms 300 --token-ms 20
+
+Starts the app under uvicorn with a seeded document index and the fake
+model, then streams answers over real HTTP. Reports when the retrieval
+event, the first token and the final event arrive (p50 / p95). The final
+event is what a blocking endpoint would have shown first. Also checks that
+disconnecting mid-answer stops generation, and times a repeated question
+with the semantic answer cache enabled (the timed runs have it disabled).
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import tempfile
+import time
+from typing import Dict, List
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def read_stream(client, url: str, question: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    marks: Dict[str, float] = {}
+    async with client.stream("POST", url, json={"message": question}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+                key = "first_token" if event == "token" else event
+                marks.setdefault(key, 1000 * (time.perf_counter() - started))
+    return marks
+
+
+async def run(args: argparse.Namespace, data_dir: str) -> dict:
+    import httpx
+    import uvicorn
+    from fastapi import UploadFile
+
+    from app.main import app
+    from app.rag.chain import RAGChain
+    from app.rag.embeddings import HashingEmbedder
+    from app.rag.llm import FakeLLM
+    from app.rag.vector_store import PartitionedVectorStore
+    from app.schemas.user import User
+    from app.security.deps import get_current_user
+    from app.services import chat_service as chat_module
+    from app.services.document_service import DocumentService
+    from benchmarks.bench_ingestion import write_corpus
+
+    # --- Seed one user's index and wire the fake model in ---
+    stores = PartitionedVectorStore(os.path.join(data_dir, "partitions"))
+    documents = DocumentService(embedder=HashingEmbedder(), stores=stores, root=os.path.join(data_dir, "documents"))
+    corpus = os.path.join(data_dir, "corpus.txt")
+    write_corpus(corpus, args.corpus_mb)
+    with open(corpus, "rb") as fh:
+        document = await documents.save_upload("bench", UploadFile(io.BytesIO(fh.read()), filename="corpus.txt"))
+    await documents.ingest(document)
+
+    llm = FakeLLM(args.first_token_ms, args.token_ms, args.max_tokens)
+    chat_module.chat_service._chain = RAGChain(store=stores, llm=llm)
+    chat_module.chat_service.documents = documents
+    chat_module.chat_service.cache = chat_module.SemanticAnswerCache(max_entries=0)
+    app.dependency_overrides[get_current_user] = lambda: User(id="bench", email="bench@example.com")
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/api/v1/chat/stream"
+    results: dict = {"clients": args.clients, "first_token_ms": args.first_token_ms, "token_ms": args.token_ms}
+    try:
+        async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=args.clients)) as client:
+            await read_stream(client, url, "warm up")
+            runs = await asyncio.gather(
+                *[read_stream(client, url, f"what does clause {i} say about payment?") for i in range(args.clients)]
+            )
+            for key in ("retrieval", "first_token", "done"):
+                values = [run[key] for run in runs]
+                results[key] = {"p50_ms": round(percentile(values, 0.5), 1), "p95_ms": round(percentile(values, 0.95), 1)}
+                print(f"{key:>12}: p50 {results[key]['p50_ms']:>8} ms   p95 {results[key]['p95_ms']:>8} ms")
+
+            # --- Disconnect after the first token; generation should stop ---
+            before = llm.tokens_generated
+            async with client.stream("POST", url, json={"message": "disconnect test"}) as response:
+                async for line in response.aiter_lines():
+                    if line == "event: token":
+                        break
+            await asyncio.sleep(max(0.5, 20 * args.token_ms / 1000))
+            generated = llm.tokens_generated - before
+            results["tokens_after_disconnect"] = generated
+            print(f"disconnect after first token: {generated} token(s) generated (answer has {args.max_tokens})")
+
+            # --- Same question twice: generated, then served from the answer cache ---
+            chat_module.chat_service.cache = chat_module.SemanticAnswerCache()
+            question = "which party pays for delivery?"
+            first = await read_stream(client, url, question)
+            repeat = await read_stream(client, url, "  Which party pays for delivery? ")
+            results["cache"] = {"miss_done_ms": round(first["done"], 1), "hit_done_ms": round(repeat["done"], 1)}
+            print(f"answer cache: miss {first['done']:.1f} ms, hit {repeat['done']:.1f} ms")
+    finally:
+        server.should_exit = True
+        await server_task
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--corpus-mb", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        results = asyncio.run(run(args, data_dir))
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Prompt tokens and assembly time of the chat context stage.
+
+    python -m benchmarks.bench_context --corpus-mb 4 --queries 200 --top-k 5
+
+Ingests a corpus with repeated boilerplate paragraphs (as contracts and
+manuals have) into one user's partition, then for every query compares
+the raw top-k hybrid hits with the assembled context: once packed from
+the same top-k chunks (overlap merged, duplicates dropped; the pure
+saving) and once from the wider candidate list (redundant chunks replaced
+by the next most relevant, diverse ones). Reports prompt tokens, the
+reduction, and assembly time per query with a cold and a warm token-count
+cache. Retrieval itself is not timed.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+from typing import List
+
+from benchmarks.bench_ingestion import WORDS
+
+BOILERPLATE = [
+    "This agreement is governed by the laws of the state in which the supplier has its principal place of business "
+    "and any dispute shall be resolved by binding arbitration under the rules then in effect.",
+    "Neither party shall be liable for any failure or delay in performance caused by events beyond its reasonable "
+    "control including fire flood strike war or acts of government.",
+    "All notices under this agreement must be in writing and are deemed given when delivered personally or three "
+    "business days after mailing by registered post to the address stated above.",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def write_corpus(path: str, size_mb: int, seed: int = 0) -> List[str]:
+    """
+    Random paragraphs with boilerplate repeated every few; returns the paragraphs
+    """
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    paragraphs: List[str] = []
+    written = 0
+    with open(path, "w", encoding="utf-8") as fh:
+        while written < target:
+            if rng.random() < 0.3:
+                paragraph = rng.choice(BOILERPLATE)
+            else:
+                paragraph = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + "."
+            paragraphs.append(paragraph)
+            fh.write(paragraph + "\n\n")
+            written += len(paragraph) + 2
+    return paragraphs
+
+
+async def run(args: argparse.Namespace, data_dir: str) -> dict:
+    from fastapi import UploadFile
+
+    from app.rag.context import ContextAssembler
+    from app.rag.embeddings import HashingEmbedder
+    from app.rag.vector_store import PartitionedVectorStore
+    from app.services.document_service import DocumentService
+
+    embedder = HashingEmbedder()
+    stores = PartitionedVectorStore(os.path.join(data_dir, "partitions"))
+    documents = DocumentService(embedder=embedder, stores=stores, root=os.path.join(data_dir, "documents"))
+    corpus = os.path.join(data_dir, "corpus.txt")
+    paragraphs = write_corpus(corpus, args.corpus_mb)
+    with open(corpus, "rb") as fh:
+        document = await documents.save_upload("bench", UploadFile(io.BytesIO(fh.read()), filename="corpus.txt"))
+    await documents.ingest(document)
+
+    # --- Questions quote a few words of a random paragraph, some of them boilerplate ---
+    rng = random.Random(1)
+    questions = []
+    for _ in range(args.queries):
+        words = rng.choice(paragraphs).split()
+        begin = rng.randrange(max(1, len(words) - 12))
+        questions.append(" ".join(words[begin:begin + 12]))
+    queries = await embedder.embed(questions)
+    depth = max(args.top_k, args.candidates)
+    retrieved = [
+        stores.hybrid_candidates("bench", query[None, :], question, depth)
+        for question, query in zip(questions, queries)
+    ]
+
+    assembler = ContextAssembler(budget=args.budget, mmr_lambda=args.mmr_lambda)
+    results: dict = {
+        "corpus_mb": args.corpus_mb,
+        "queries": args.queries,
+        "top_k": args.top_k,
+        "candidates": depth,
+        "budget": args.budget,
+        "tokenizer": type(assembler.counter.tokenizer).__name__,
+    }
+    for label in ("cold", "warm"):
+        packs = [assembler.assemble(hits, vectors, args.top_k) for hits, vectors in retrieved]
+        times = [pack.assembly_ms for pack in packs]
+        results[f"assembly_{label}"] = {
+            "p50_ms": round(percentile(times, 0.5), 3),
+            "p95_ms": round(percentile(times, 0.95), 3),
+            "mean_ms": round(sum(times) / len(times), 3),
+        }
+        print(
+            f"assembly ({label} token cache): p50 {results[f'assembly_{label}']['p50_ms']} ms   "
+            f"p95 {results[f'assembly_{label}']['p95_ms']} ms"
+        )
+
+    raw = sum(pack.raw_tokens for pack in packs) / len(packs)
+    results["raw_tokens_per_query"] = round(raw, 1)
+    same_k = [assembler.assemble(hits[:args.top_k], vectors[:args.top_k], args.top_k) for hits, vectors in retrieved]
+    for label, runs in (("same_top_k", same_k), ("candidates", packs)):
+        packed = sum(pack.tokens for pack in runs) / len(runs)
+        results[label] = {
+            "tokens_per_query": round(packed, 1),
+            "token_reduction": round(1 - packed / raw, 4) if raw else 0.0,
+            "passages_per_query": round(sum(len(pack.hits) for pack in runs) / len(runs), 2),
+            "merged_per_query": round(sum(pack.merged for pack in runs) / len(runs), 2),
+            "duplicates_per_query": round(sum(pack.duplicates for pack in runs) / len(runs), 2),
+        }
+        print(
+            f"packed from {label:>10}: {packed:>6.0f} tokens vs raw {raw:.0f} "
+            f"({100 * results[label]['token_reduction']:.1f}% fewer), {results[label]['passages_per_query']} passages, "
+            f"{results[label]['merged_per_query']} chunks merged, {results[label]['duplicates_per_query']} duplicates dropped"
+        )
+    results["token_cache"] = assembler.counter.stats()
+    stores.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-mb", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--budget", type=int, default=3000, help="context token budget")
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ.setdefault("DATA_DIR", data_dir)
+        results = asyncio.run(run(args, data_dir))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
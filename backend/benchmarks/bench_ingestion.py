@@ -0,0 +1,89 @@
+"""
+Peak memory of the ingestion pipeline versus input size.
+
+    python -m benchmarks.bench_ingestion --sizes 16 64 256
+
+Writes synthetic text files of the given sizes (MB), streams each through
+loader -> splitter -> embedder -> sink and reports the tracemalloc peak.
+Peak memory should stay flat as the file grows.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+
+from app.rag.embeddings import HashingEmbedder
+from app.rag.loader import load_sections
+from app.rag.pipeline import ChunkBatch, IngestionPipeline
+
+WORDS = (
+    "invoice contract clause payment delivery warranty liability customer "
+    "supplier schedule amendment termination notice party agreement section"
+).split()
+
+
+class CountingSink:
+    def __init__(self):
+        self.chunks = 0
+
+    async def write(self, batch: ChunkBatch) -> None:
+        self.chunks += len(batch)
+
+
+def write_corpus(path: str, size_mb: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as fh:
+        while written < target:
+            paragraph = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + ".\n\n"
+            fh.write(paragraph)
+            written += len(paragraph)
+
+
+async def run_once(path: str) -> dict:
+    sink = CountingSink()
+    pipeline = IngestionPipeline(HashingEmbedder())
+    tracemalloc.start()
+    stats = await pipeline.run(load_sections(path), sink)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    return {
+        "size_mb": round(size_mb, 1),
+        "chunks": sink.chunks,
+        "seconds": round(stats.seconds, 2),
+        "mb_per_s": round(size_mb / stats.seconds, 2),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256], help="file sizes in MB")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes:
+            path = os.path.join(tmp, f"corpus-{size_mb}.txt")
+            write_corpus(path, size_mb)
+            result = asyncio.run(run_once(path))
+            results.append(result)
+            os.remove(path)
+            print(
+                f"{result['size_mb']:>8} MB  {result['chunks']:>9} chunks  "
+                f"{result['seconds']:>7}s  {result['mb_per_s']:>6} MB/s  peak {result['peak_mb']} MB"
+            )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
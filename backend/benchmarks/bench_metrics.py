@@ -0,0 +1,116 @@
+"""
+Per-request cost of the metrics middleware and stage spans.
+
+    python -m benchmarks.bench_metrics --requests 200000
+
+Calls a trivial ASGI app directly (no server, no sockets) with and
+without MetricsMiddleware, the profiler hook included, so the difference
+is the instrumentation alone. Also times an empty `with span(...)` block
+and rendering the Prometheus text for a realistic number of series.
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+from typing import Callable
+
+from app.core.metrics import MetricsMiddleware, MetricsRegistry, span
+from app.core.profiling import RequestProfiler
+
+
+class FakeRoute:
+    def __init__(self, path: str):
+        self.path = path
+        self.path_regex = re.compile("^" + re.sub(r"{[^}]+}", "[^/]+", path) + "$")
+
+
+ROUTES = [FakeRoute(f"/api/v1/resource{i}/{{item_id}}") for i in range(20)]
+
+
+async def endpoint(scope, receive, send) -> None:
+    scope["route"] = ROUTES[scope["route_index"]]
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message) -> None:
+    pass
+
+
+async def drive(app: Callable, requests: int) -> float:
+    headers = [(b"host", b"localhost"), (b"user-agent", b"bench"), (b"accept", b"*/*"), (b"authorization", b"Bearer x")]
+    started = time.perf_counter()
+    for i in range(requests):
+        index = i % len(ROUTES)
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": f"/api/v1/resource{index}/{i}",
+            "headers": headers,
+            "route_index": index,
+        }
+        await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+def time_spans(iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with span("bench"):
+            pass
+    spans = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):
+        pass
+    return spans - (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=3, help="best of N for each variant")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    instrumented = MetricsMiddleware(endpoint, registry=registry, profiler=RequestProfiler(enabled=True))
+
+    async def measure() -> dict:
+        await drive(endpoint, 1000)
+        await drive(instrumented, 1000)
+        bare = min([await drive(endpoint, args.requests) for _ in range(args.rounds)])
+        wrapped = min([await drive(instrumented, args.requests) for _ in range(args.rounds)])
+        return {"bare": bare, "wrapped": wrapped}
+
+    timings = asyncio.run(measure())
+    span_seconds = min(time_spans(args.requests) for _ in range(args.rounds))
+
+    started = time.perf_counter()
+    text = registry.render()
+    render_ms = 1000 * (time.perf_counter() - started)
+
+    results = {
+        "requests": args.requests,
+        "bare_us_per_request": round(1e6 * timings["bare"] / args.requests, 3),
+        "instrumented_us_per_request": round(1e6 * timings["wrapped"] / args.requests, 3),
+        "middleware_overhead_us": round(1e6 * (timings["wrapped"] - timings["bare"]) / args.requests, 3),
+        "span_overhead_us": round(1e6 * span_seconds / args.requests, 3),
+        "render_ms": round(render_ms, 3),
+        "rendered_lines": text.count("\n"),
+    }
+    print(f"bare app:          {results['bare_us_per_request']:>7.3f} us/request")
+    print(f"with middleware:   {results['instrumented_us_per_request']:>7.3f} us/request")
+    print(f"middleware cost:   {results['middleware_overhead_us']:>7.3f} us/request")
+    print(f"span cost:         {results['span_overhead_us']:>7.3f} us/span")
+    print(f"scrape render:     {results['render_ms']:>7.3f} ms ({results['rendered_lines']} lines)")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
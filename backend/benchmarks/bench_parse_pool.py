@@ -0,0 +1,120 @@
+"""
+API latency and ingestion throughput while documents are being parsed.
+
+    python -m benchmarks.bench_parse_pool --documents 4 --size-mb 8 --workers 0 2 4
+
+Ingests HTML documents concurrently through the pipeline while a probe
+coroutine stands in for API traffic: every few milliseconds it records how
+late the event loop ran it, which is the delay an auth or chat request would
+see. `--workers 0` parses in threads of the API process (the GIL is held by
+the parser); higher counts parse and split in the worker pool. Reports
+ingestion MB/s and probe lag p50 / p99 per configuration.
+"""
+import argparse
+import asyncio
+import html
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+from app.rag.embeddings import HashingEmbedder
+from app.rag.loader import load_sections
+from app.rag.parser_pool import ParserPool
+from app.rag.pipeline import IngestionPipeline
+from app.rag.splitter import get_splitter
+from benchmarks.bench_ingestion import CountingSink, write_corpus
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def write_html(path: str, size_mb: int, seed: int) -> None:
+    text_path = path + ".txt"
+    write_corpus(text_path, size_mb, seed)
+    with open(text_path, encoding="utf-8") as src, open(path, "w", encoding="utf-8") as fh:
+        fh.write("<html><head><style>p { margin: 0 }</style></head><body>\n")
+        for paragraph in src.read().split("\n\n"):
+            if paragraph:
+                fh.write(f'<div class="clause"><p>{html.escape(paragraph)}</p></div>\n')
+        fh.write("</body></html>\n")
+    os.remove(text_path)
+
+
+async def probe(stop: asyncio.Event, interval: float, lags: List[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(1000 * max(0.0, loop.time() - expected))
+
+
+async def run_once(paths: List[str], workers: int, interval: float) -> dict:
+    pool = ParserPool(workers=workers)
+    splitter = get_splitter()
+    if pool.enabled:
+        # --- Start the workers outside the measurement ---
+        await asyncio.gather(*[pool.run(time.sleep, 0.1) for _ in range(workers)])
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, interval, lags))
+
+    async def ingest(path: str) -> int:
+        sink = CountingSink()
+        pipeline = IngestionPipeline(HashingEmbedder(), splitter=splitter)
+        await pipeline.run(load_sections(path, path, splitter, pool), sink)
+        return sink.chunks
+
+    started = time.perf_counter()
+    chunks = await asyncio.gather(*[ingest(path) for path in paths])
+    seconds = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    pool.close()
+
+    size_mb = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+    return {
+        "workers": workers,
+        "chunks": sum(chunks),
+        "seconds": round(seconds, 2),
+        "mb_per_s": round(size_mb / seconds, 2),
+        "lag_p50_ms": round(percentile(lags, 0.5), 2),
+        "lag_p99_ms": round(percentile(lags, 0.99), 2),
+        "lag_max_ms": round(max(lags), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, os.cpu_count() or 1])
+    parser.add_argument("--probe-ms", type=float, default=5.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"doc-{i}.html") for i in range(args.documents)]
+        for seed, path in enumerate(paths):
+            write_html(path, args.size_mb, seed)
+        print(f"{os.cpu_count()} CPU(s), {args.documents} x {args.size_mb} MB HTML")
+        for workers in dict.fromkeys(args.workers):
+            result = asyncio.run(run_once(paths, workers, args.probe_ms / 1000))
+            results.append(result)
+            print(
+                f"workers {result['workers']:>2}  {result['seconds']:>7}s  {result['mb_per_s']:>6} MB/s  "
+                f"lag p50 {result['lag_p50_ms']:>7} ms  p99 {result['lag_p99_ms']:>7} ms  max {result['lag_max_ms']} ms"
+            )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Partition eviction under load: acquire/evict churn and that no write is lost.
+
+    python -m benchmarks.bench_partition_churn --owners 2 --writers 6 --max-loaded 1 --seconds 10
+
+Writer threads add documents to a few owners' partitions and delete some
+of them without saving, so partitions are usually dirty when they are
+evicted. An evictor thread keeps evicting those owners while the writers
+reacquire them, and `max_loaded` is below the owner count, so loads also
+evict each other. At the end every partition is reopened from disk and
+its documents must match what the writers left. Reports acquires and
+evictions per second; exits non-zero on any mismatch.
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, List, Set
+
+import numpy as np
+
+from app.rag.vector_store import PartitionedVectorStore, VectorStore
+
+DIM = 16
+
+
+def writer(
+    stores: PartitionedVectorStore,
+    owners: List[str],
+    seed: int,
+    stop: threading.Event,
+    expected: Dict[str, Set[str]],
+    created: Dict[str, Set[str]],
+    counts: List[int],
+) -> None:
+    pick = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    mine: Dict[str, List[str]] = {owner_id: [] for owner_id in owners}
+    n = 0
+    while not stop.is_set():
+        owner_id = pick.choice(owners)
+        with stores.use(owner_id) as store:
+            document_id = f"w{seed}-{n}"
+            n += 1
+            chunks = pick.randint(1, 20)
+            offsets = np.arange(chunks)
+            store.add(document_id, rng.normal(size=(chunks, DIM)), offsets, offsets + 1, [document_id] * chunks)
+            expected[owner_id].add(document_id)
+            created[owner_id].add(document_id)
+            mine[owner_id].append(document_id)
+            # --- Deletes only tombstone rows; the partition stays dirty until it is saved on eviction ---
+            if len(mine[owner_id]) > 3 and pick.random() < 0.4:
+                victim = mine[owner_id].pop(pick.randrange(len(mine[owner_id])))
+                store.delete_document(victim)
+                expected[owner_id].discard(victim)
+        counts[0] += 1
+
+
+def evictor(stores: PartitionedVectorStore, owners: List[str], stop: threading.Event, counts: List[int]) -> None:
+    pick = random.Random(-1)
+    while not stop.is_set():
+        if stores.evict(pick.choice(owners)):
+            counts[0] += 1
+        time.sleep(0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--owners", type=int, default=2)
+    parser.add_argument("--writers", type=int, default=6)
+    parser.add_argument("--max-loaded", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    owners = [f"owner{i}" for i in range(args.owners)]
+    expected: Dict[str, Set[str]] = {owner_id: set() for owner_id in owners}
+    created: Dict[str, Set[str]] = {owner_id: set() for owner_id in owners}
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = PartitionedVectorStore(
+            tmp, max_loaded=args.max_loaded, compaction_interval=0, dimension=DIM, memtable_rows=64
+        )
+        stop = threading.Event()
+        acquires, evictions = [0], [0]
+        threads = [
+            threading.Thread(target=writer, args=(stores, owners, seed, stop, expected, created, acquires))
+            for seed in range(args.writers)
+        ]
+        threads.append(threading.Thread(target=evictor, args=(stores, owners, stop, evictions)))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        stores.close()
+
+        mismatches = {}
+        for owner_id in owners:
+            store = VectorStore(stores.path(owner_id), DIM)
+            found = {document_id for document_id in created[owner_id] if len(store.document_rows(document_id))}
+            if found != expected[owner_id]:
+                mismatches[owner_id] = {
+                    "missing": sorted(expected[owner_id] - found)[:5],
+                    "unexpected": sorted(found - expected[owner_id])[:5],
+                }
+
+    results = {
+        "seconds": round(seconds, 2),
+        "acquires_per_second": round(acquires[0] / seconds, 1),
+        "evictions_per_second": round(evictions[0] / seconds, 1),
+        "documents": sum(len(documents) for documents in expected.values()),
+        "mismatched_partitions": mismatches,
+    }
+    print(f"{results['acquires_per_second']} acquires/s, {results['evictions_per_second']} evictions/s, "
+          f"{results['documents']} documents, {len(mismatches)} mismatched partitions")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if mismatches:
+        raise SystemExit(f"partitions lost or resurrected documents: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compressed (int8 / PQ) candidate scoring with exact re-ranking versus flat
+float32 search on synthetic clustered embeddings.
+
+    python -m benchmarks.bench_quantization --rows 200000 --dim 384
+
+Reports per-row memory, compression ratio, recall@k against exact search
+and query latency for each compression mode, plus cold-load time.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.rag.vector_store import VectorStore
+from benchmarks.bench_ann import make_data, recall
+
+
+def build(path: str, vectors: np.ndarray, compression: str) -> VectorStore:
+    store = VectorStore(path, vectors.shape[1], index_type="flat", compression=compression)
+    for begin in range(0, len(vectors), 10_000):
+        batch = vectors[begin:begin + 10_000]
+        offsets = np.arange(len(batch))
+        store.add(f"doc-{begin}", batch, offsets, offsets + 1, [""] * len(batch))
+    store.train_quantizer()
+    return store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=["none", "int8", "pq"])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    vectors, queries = make_data(args.rows, args.dim, args.clusters, args.queries)
+    results = {
+        "rows": args.rows,
+        "dim": args.dim,
+        "k": args.k,
+        "rerank_factor": get_settings().RERANK_FACTOR,
+        "runs": [],
+    }
+    exact_rows = None
+
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            store = build(tmp, vectors, mode)
+            build_seconds = time.perf_counter() - started
+            if exact_rows is None:
+                _, exact_rows = store.search_rows(queries, args.k, exact=True)
+
+            started = time.perf_counter()
+            _, rows = store.search_rows(queries, args.k)
+            seconds = time.perf_counter() - started
+
+            store.save()
+            store.close()
+            started = time.perf_counter()
+            loaded = VectorStore(tmp, args.dim, index_type="flat", compression=mode)
+            load_seconds = time.perf_counter() - started
+
+            memory = loaded.memory_stats()
+            run = {
+                "mode": mode,
+                "bytes_per_row": memory["code_bytes"] // args.rows if memory["code_bytes"] else args.dim * 4,
+                "compression_ratio": memory["compression_ratio"],
+                "recall": round(recall(rows, exact_rows), 4),
+                "latency_ms": round(1000 * seconds / args.queries, 3),
+                "build_seconds": round(build_seconds, 2),
+                "load_seconds": round(load_seconds, 3),
+            }
+            results["runs"].append(run)
+            loaded.close()
+            print(
+                f"{mode:>5}  {run['bytes_per_row']:>5} B/row  x{run['compression_ratio']:<6} "
+                f"recall {run['recall']:.3f}  {run['latency_ms']:>8} ms/query  "
+                f"build {run['build_seconds']}s  load {run['load_seconds']}s"
+            )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Read latency of the vector index while it is being written to and compacted.
+
+    python -m benchmarks.bench_segments --rows 100000 --readers 4 --seconds 10
+
+Fills a store with synthetic chunks, then runs reader threads issuing
+hybrid searches in three phases: reads alone, reads while a writer adds
+documents, deletes older ones and saves, and the same with a compactor
+merging segments in the background. Reports read p50/p95/p99 and queries
+per second per phase, the writer's rows per second and the segment count
+at the end of each phase. Uses only the public store API, so the numbers
+compare across index layouts.
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.rag.vector_ops import normalize
+from app.rag.vector_store import VectorStore
+
+WORDS = [f"term{i}" for i in range(2000)]
+
+
+def make_document(rng: np.random.Generator, chunks: int, dim: int):
+    vectors = normalize(rng.normal(size=(chunks, dim)))
+    texts = [" ".join(WORDS[w] for w in rng.zipf(1.3, size=40) % len(WORDS)) for _ in range(chunks)]
+    offsets = np.arange(chunks)
+    return vectors, offsets, offsets + 1, texts
+
+
+def percentile(values: List[float], q: float) -> float:
+    return round(1000 * float(np.quantile(values, q)), 2) if values else 0.0
+
+
+def reader(store: VectorStore, dim: int, k: int, seed: int, stop: threading.Event, latencies: List[float]) -> None:
+    rng = np.random.default_rng(seed)
+    while not stop.is_set():
+        query = normalize(rng.normal(size=(1, dim)))
+        text = " ".join(WORDS[w] for w in rng.integers(0, 50, size=3))
+        started = time.perf_counter()
+        store.hybrid_search(query, text, k)
+        latencies.append(time.perf_counter() - started)
+
+
+def writer(store: VectorStore, args: argparse.Namespace, stop: threading.Event, documents: List[str], written: List[int]) -> None:
+    rng = np.random.default_rng(1)
+    pick = random.Random(1)
+    while not stop.is_set():
+        document_id = f"live-{len(documents)}-{pick.random()}"
+        store.add(document_id, *make_document(rng, args.chunks, args.dim))
+        documents.append(document_id)
+        written[0] += args.chunks
+        if pick.random() < args.delete_ratio:
+            store.delete_document(documents.pop(pick.randrange(len(documents))))
+        if pick.random() < 0.05:
+            store.save()
+
+
+def compactor(store: VectorStore, stop: threading.Event) -> None:
+    compact = getattr(store, "compact", None)
+    while compact is not None and not stop.is_set():
+        if not compact():
+            time.sleep(0.05)
+
+
+def run_phase(store: VectorStore, args: argparse.Namespace, documents: List[str], write: bool, compact: bool) -> Dict:
+    stop = threading.Event()
+    latencies: List[List[float]] = [[] for _ in range(args.readers)]
+    written = [0]
+    threads = [
+        threading.Thread(target=reader, args=(store, args.dim, args.k, seed, stop, latencies[seed]))
+        for seed in range(args.readers)
+    ]
+    if write:
+        threads.append(threading.Thread(target=writer, args=(store, args, stop, documents, written)))
+    if compact:
+        threads.append(threading.Thread(target=compactor, args=(store, stop)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    merged = [value for values in latencies for value in values]
+    stats: Optional[Dict] = store.stats() if hasattr(store, "stats") else None
+    return {
+        "read_qps": round(len(merged) / seconds, 1),
+        "read_p50_ms": percentile(merged, 0.5),
+        "read_p95_ms": percentile(merged, 0.95),
+        "read_p99_ms": percentile(merged, 0.99),
+        "write_rows_per_second": round(written[0] / seconds, 1),
+        "rows": len(store),
+        "segments": stats.get("segments") if stats else None,
+        "compactions": stats.get("compactions") if stats else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows loaded before the phases")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--chunks", type=int, default=50, help="chunks per written document")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each phase")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--delete-ratio", type=float, default=0.3, help="chance of deleting a document per write")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results: Dict = {"rows": args.rows, "dim": args.dim, "readers": args.readers, "phases": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(tmp, args.dim)
+        documents: List[str] = []
+        started = time.perf_counter()
+        for begin in range(0, args.rows, args.chunks):
+            document_id = f"doc-{begin}"
+            store.add(document_id, *make_document(rng, min(args.chunks, args.rows - begin), args.dim))
+            documents.append(document_id)
+        store.save()
+        results["load_seconds"] = round(time.perf_counter() - started, 2)
+        print(f"loaded {len(store)} rows in {results['load_seconds']}s")
+
+        phases = (("reads", False, False), ("reads+writes", True, False), ("reads+writes+compaction", True, True))
+        for name, write, compact in phases:
+            phase = run_phase(store, args, documents, write, compact)
+            results["phases"][name] = phase
+            print(
+                f"{name:<24} {phase['read_qps']:>8} qps  p50 {phase['read_p50_ms']:>7} ms  "
+                f"p95 {phase['read_p95_ms']:>7} ms  p99 {phase['read_p99_ms']:>7} ms  "
+                f"writes {phase['write_rows_per_second']:>9} rows/s  segments {phase['segments']}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Splitter throughput: offset-based TextSplitter versus a naive recursive splitter.
+
+    python -m benchmarks.bench_splitter --size-mb 16
+
+The naive splitter mirrors the usual recursive approach: split on the
+separator into strings, recurse into oversized pieces and re-join pieces
+into chunks. TextSplitter only returns (start, end) offsets; those are
+checked to move forward (no chunk ends at or before the previous one).
+"""
+import argparse
+import json
+import random
+import re
+import time
+from typing import List, Sequence, Tuple
+
+from app.rag.splitter import DEFAULT_SEPARATORS, ContentDefinedSplitter, RegexTokenizer, TextSplitter
+from benchmarks.bench_ingestion import WORDS
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def naive_split(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    separators: Sequence[str] = DEFAULT_SEPARATORS,
+    length=len,
+) -> List[str]:
+    """
+    The common recursive splitter: regex-split keeping separators, measure
+    every piece, recurse into oversized pieces and merge pieces back into
+    overlapping chunks by joining strings
+    """
+    separator = ""
+    remaining: Sequence[str] = ()
+    for index, candidate in enumerate(separators):
+        if re.search(re.escape(candidate), text):
+            separator, remaining = candidate, separators[index + 1:]
+            break
+
+    pattern = re.escape(separator)
+    if separator:
+        parts = re.split(f"({pattern})", text)
+        pieces = [parts[i] + parts[i + 1] for i in range(0, len(parts) - 1, 2)]
+        if len(parts) % 2 == 1:
+            pieces.append(parts[-1])
+        pieces = [piece for piece in pieces if piece]
+    else:
+        pieces = list(text)
+
+    chunks: List[str] = []
+    good: List[str] = []
+    for piece in pieces:
+        if length(piece) < chunk_size:
+            good.append(piece)
+            continue
+        if good:
+            chunks.extend(_merge(good, chunk_size, chunk_overlap, length))
+            good = []
+        if remaining:
+            chunks.extend(naive_split(piece, chunk_size, chunk_overlap, remaining, length))
+        else:
+            chunks.append(piece)
+    if good:
+        chunks.extend(_merge(good, chunk_size, chunk_overlap, length))
+    return chunks
+
+
+def _merge(pieces: List[str], chunk_size: int, chunk_overlap: int, length) -> List[str]:
+    chunks: List[str] = []
+    current: List[str] = []
+    total = 0
+    for piece in pieces:
+        piece_length = length(piece)
+        if total + piece_length > chunk_size and current:
+            chunk = "".join(current).strip()
+            if chunk:
+                chunks.append(chunk)
+            # --- Drop pieces from the front until only the overlap remains ---
+            while total > chunk_overlap or (total + piece_length > chunk_size and total > 0):
+                total -= length(current.pop(0))
+        current.append(piece)
+        total += piece_length
+    chunk = "".join(current).strip()
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def make_text(size_mb: int, layout: str = "paragraphs", seed: int = 0) -> str:
+    """
+    `paragraphs`: prose with blank lines; `lines`: PDF-style 80-column lines;
+    `flat`: one long run of sentences with no line breaks; `ragged`: words
+    separated by runs of mixed whitespace (tabs, newlines, spaces)
+    """
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size_mb * 1024 * 1024:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize() + "."
+            for _ in range(rng.randint(2, 8))
+        ]
+        if layout == "ragged":
+            words = " ".join(sentences).split(" ")
+            paragraph = "".join(word + rng.choice((" ", "\t", "\n", "  ", " \t\n ", "\n\n")) for word in words)
+        elif layout == "paragraphs":
+            paragraph = " ".join(sentences) + ("\n\n" if rng.random() < 0.7 else "\n")
+        else:
+            paragraph = " ".join(sentences) + " "
+        parts.append(paragraph)
+        total += len(paragraph)
+    text = "".join(parts)
+    if layout == "lines":
+        text = "\n".join(text[i:i + 80] for i in range(0, len(text), 80))
+    return text
+
+
+def check_forward(label: str, spans: List[Tuple[int, int]]) -> None:
+    """
+    Consecutive chunks must start no earlier and end strictly later than the one before
+    """
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        if next_start < start or next_end <= end:
+            raise SystemExit(f"{label}: chunk {(next_start, next_end)} does not move past {(start, end)}")
+
+
+def measure(label: str, fn, text: str, repeat: int) -> dict:
+    best = float("inf")
+    chunks = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = len(fn(text))
+        best = min(best, time.perf_counter() - started)
+    size_mb = len(text) / 1024 / 1024
+    result = {"splitter": label, "chunks": chunks, "seconds": round(best, 3), "mb_per_s": round(size_mb / best, 1)}
+    print(f"{label:<26} {chunks:>9} chunks  {best:>7.3f}s  {result['mb_per_s']:>7} MB/s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=16)
+    parser.add_argument("--layout", choices=["paragraphs", "lines", "flat", "ragged"], nargs="+",
+                        default=["paragraphs", "lines", "flat", "ragged"])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for layout in args.layout:
+        print(f"--- {layout} ---")
+        text = make_text(args.size_mb, layout)
+        for result in (
+            measure("naive recursive", lambda t: naive_split(t, args.chunk_size, args.chunk_overlap), text, args.repeat),
+            measure("TextSplitter (chars)", TextSplitter(args.chunk_size, args.chunk_overlap).split, text, args.repeat),
+            measure(
+                "naive recursive (regex)",
+                lambda t: naive_split(
+                    t,
+                    args.chunk_size // 4,
+                    args.chunk_overlap // 4,
+                    length=lambda piece: len(TOKEN_RE.findall(piece)),
+                ),
+                text,
+                args.repeat,
+            ),
+            measure(
+                "TextSplitter (regex)",
+                TextSplitter(args.chunk_size // 4, args.chunk_overlap // 4, tokenizer=RegexTokenizer()).split,
+                text,
+                args.repeat,
+            ),
+        ):
+            results.append(dict(result, layout=layout))
+        for label, splitter in (
+            ("TextSplitter (chars)", TextSplitter(args.chunk_size, args.chunk_overlap)),
+            ("TextSplitter (regex)", TextSplitter(args.chunk_size // 4, args.chunk_overlap // 4, tokenizer=RegexTokenizer())),
+            ("ContentDefinedSplitter", ContentDefinedSplitter(args.chunk_size, args.chunk_overlap)),
+        ):
+            check_forward(f"{label} on {layout}", splitter.split(text))
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Cold-start cost of a worker: import time per module and time to serve.
+
+    python -m benchmarks.bench_startup --runs 5 --serve
+
+Imports app.main in fresh interpreters under `-X importtime` and reports
+the median wall time, the slowest modules by cumulative import time (app
+modules and the third-party packages they pull in), and which heavy
+dependencies were loaded by the import alone. With --serve, also starts
+uvicorn and measures when /system/health first answers and when
+/system/ready turns 200 (warm-up finished).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "httpx", "jwt", "cryptography", "supabase", "pypdf", "docx")
+
+CHILD = (
+    "import sys, time\n"
+    "started = time.perf_counter()\n"
+    "import app.main\n"
+    "print(time.perf_counter() - started)\n"
+    f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))\n"
+)
+
+
+def import_once(env: Dict[str, str]) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    seconds, heavy = result.stdout.splitlines()[-2:]
+    modules: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+    return {"seconds": float(seconds), "heavy": [m for m in heavy.split(",") if m], "modules": modules}
+
+
+def wait_for(url: str, timeout: float, status: int = 200) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == status:
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def serve_once(env: Dict[str, str], port: int) -> Dict[str, float]:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}/api/v1/system"
+        wait_for(f"{base}/health", 60)
+        health = time.perf_counter() - started
+        wait_for(f"{base}/ready", 120)
+        ready = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {"health_ms": round(1000 * health, 1), "ready_ms": round(1000 * ready, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    parser.add_argument("--serve", action="store_true", help="also time health and readiness under uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, DATA_DIR=data_dir)
+        import_once(env)  # --- compile .pyc files first ---
+        runs = [import_once(env) for _ in range(args.runs)]
+
+        names = set().union(*(run["modules"] for run in runs))
+        median_ms = {name: statistics.median(run["modules"].get(name, 0) for run in runs) / 1000 for name in names}
+        total_ms = 1000 * statistics.median(run["seconds"] for run in runs)
+        # --- App modules and packages imported directly (not their submodules) ---
+        listed = [name for name in names if name.startswith("app.") or name in HEAVY or "." not in name]
+        slowest: List = sorted(((median_ms[name], name) for name in listed), reverse=True)[: args.top]
+
+        results: Dict = {
+            "import_app_main_ms": round(total_ms, 1),
+            "heavy_loaded_at_import": runs[-1]["heavy"],
+            "slowest_modules_ms": {name: round(ms, 1) for ms, name in slowest},
+        }
+        print(f"import app.main: {total_ms:.1f} ms (median of {args.runs})")
+        print(f"heavy packages loaded by the import: {', '.join(runs[-1]['heavy']) or 'none'}")
+        for ms, name in slowest:
+            print(f"  {ms:>8.1f} ms  {name}")
+
+        if args.serve:
+            serving = [serve_once(env, args.port) for _ in range(max(1, args.runs // 2))]
+            results["serve"] = {
+                "health_ms": statistics.median(run["health_ms"] for run in serving),
+                "ready_ms": statistics.median(run["ready_ms"] for run in serving),
+            }
+            print(f"first health check answered after {results['serve']['health_ms']} ms, "
+                  f"ready after {results['serve']['ready_ms']} ms")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
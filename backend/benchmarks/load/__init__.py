@@ -0,0 +1,12 @@
+"""
+End-to-end load tests of the real app with Supabase replaced by a local fake.
+
+    python -m benchmarks.load.run --out before.json
+    python -m benchmarks.load.run --out after.json --compare before.json
+
+tokens         RS256 token minter and JWKS (TokenMinter)
+fake_supabase  /auth/v1/keys, /token and /logout with configurable latency
+scenarios      auth_me, auth_me_cold, auth_refresh, ingest, chat
+run            starts the fake and the backend, drives scenarios, writes JSON
+compare        diffs two result files and fails on regressions
+"""
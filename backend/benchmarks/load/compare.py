@@ -0,0 +1,84 @@
+"""
+Compare two load-test result files and flag regressions.
+
+    python -m benchmarks.load.compare baseline.json current.json --tolerance 0.10
+
+A scenario regresses when its throughput drops, or a latency percentile
+of any step grows, by more than `tolerance` (relative) and, for latency,
+by more than `--min-delta-ms` (absolute, so sub-millisecond noise on fast
+endpoints is not flagged), or when it has errors the baseline did not.
+Exits with status 1 when anything regressed, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+PERCENTILES = ("p50", "p95", "p99")
+
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before if before else 0.0
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = 0.10, min_delta_ms: float = 1.0) -> Tuple[List[Dict], List[str]]:
+    rows: List[Dict] = []
+    regressions: List[str] = []
+    for name, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        change = _change(before["throughput_per_s"], after["throughput_per_s"])
+        regressed = change < -tolerance
+        rows.append({"scenario": name, "metric": "throughput/s", "before": before["throughput_per_s"],
+                     "after": after["throughput_per_s"], "change": change, "regressed": regressed})
+        if regressed:
+            regressions.append(f"{name}: throughput {change:+.1%}")
+        for step, latency in after["latency_ms"].items():
+            previous = before["latency_ms"].get(step)
+            if previous is None:
+                continue
+            for q in PERCENTILES:
+                change = _change(previous[q], latency[q])
+                regressed = change > tolerance and latency[q] - previous[q] > min_delta_ms
+                rows.append({"scenario": name, "metric": f"{step} {q} ms", "before": previous[q],
+                             "after": latency[q], "change": change, "regressed": regressed})
+                if regressed:
+                    regressions.append(f"{name}: {step} {q} {previous[q]} -> {latency[q]} ms ({change:+.1%})")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: {after['errors']} errors (baseline {before['errors']})")
+    return rows, regressions
+
+
+def print_report(rows: List[Dict], regressions: List[str]) -> None:
+    print(f"{'scenario':<14} {'metric':<22} {'before':>10} {'after':>10} {'change':>8}")
+    for row in rows:
+        flag = "  <-- regression" if row["regressed"] else ""
+        print(f"{row['scenario']:<14} {row['metric']:<22} {row['before']:>10} {row['after']:>10} {row['change']:>+8.1%}{flag}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"  {line}")
+    else:
+        print("\nno regressions")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative change")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.current) as fh:
+        current = json.load(fh)
+    rows, regressions = compare(baseline, current, args.tolerance, args.min_delta_ms)
+    print_report(rows, regressions)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Local stand-in for the Supabase auth endpoints the backend calls.
+"""
+import asyncio
+import random
+import socket
+from collections import Counter
+from typing import Dict, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from benchmarks.load.tokens import TokenMinter
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeSupabase:
+    """
+    Serves /auth/v1/keys, /auth/v1/token and /auth/v1/logout over real HTTP.
+
+    Keys and tokens come from `minter`. Every response waits `latency_ms`
+    plus up to `jitter_ms`, standing in for the round trip to a hosted
+    project; `calls` counts requests per endpoint so a run can report how
+    much upstream traffic the backend generated.
+    """
+
+    def __init__(
+        self,
+        minter: TokenMinter,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        jwks_max_age: int = 3600,
+        seed: int = 0,
+    ):
+        self.minter = minter
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.jwks_max_age = jwks_max_age
+        self.calls: Counter = Counter()
+        self._random = random.Random(seed)
+        self._server: Optional[uvicorn.Server] = None
+        self._task: Optional[asyncio.Task] = None
+        self.url = ""
+        self.app = Starlette(routes=[
+            Route("/auth/v1/keys", self.keys, methods=["GET"]),
+            Route("/auth/v1/token", self.token, methods=["POST"]),
+            Route("/auth/v1/logout", self.logout, methods=["POST"]),
+        ])
+
+    async def _delay(self, endpoint: str) -> None:
+        self.calls[endpoint] += 1
+        seconds = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def keys(self, request: Request) -> Response:
+        await self._delay("jwks")
+        return JSONResponse(self.minter.jwks(), headers={"Cache-Control": f"public, max-age={self.jwks_max_age}"})
+
+    async def token(self, request: Request) -> Response:
+        await self._delay("token")
+        body: Dict = await request.json()
+        grant = request.query_params.get("grant_type") or body.get("grant_type")
+        user = self.minter.redeem(body.get("refresh_token", "")) if grant == "refresh_token" else None
+        if user is None:
+            return JSONResponse({"error": "invalid_grant", "error_description": "Invalid Refresh Token"}, status_code=400)
+        return JSONResponse({
+            "access_token": self.minter.access_token(user),
+            "token_type": "bearer",
+            "expires_in": self.minter.ttl_seconds,
+            "refresh_token": self.minter.refresh_token(user),
+            "user": {"id": user.id, "email": user.email, "aud": "authenticated"},
+        })
+
+    async def logout(self, request: Request) -> Response:
+        await self._delay("logout")
+        return Response(status_code=204)
+
+    async def start(self, port: int = 0) -> str:
+        port = port or free_port()
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._task
+            self._server = None
@@ -0,0 +1,243 @@
+"""
+Load-test the backend against a local Supabase stand-in.
+
+    python -m benchmarks.load.run --scenarios auth_me auth_refresh ingest:100 chat:200 \\
+        --concurrency 32 --requests 2000 --upstream-latency-ms 40 --out results.json
+
+Starts FakeSupabase (JWKS, token and logout endpoints with the given
+latency), then `uvicorn app.main:app` in a subprocess whose SUPABASE_URL
+points at it, with a fresh DATA_DIR, the fake LLM, and the answer cache
+and admission control off (override with --env KEY=VALUE); a scenario
+that needs other settings (rate_limited turns admission back on) gets a
+backend restarted with them. Each scenario (name[:requests]) gets
+untimed setup and warm-up, then runs with `--concurrency` clients in a
+closed loop. Reports throughput, p50/p95/p99 per step and the upstream
+calls it caused; --out writes JSON for benchmarks.load.compare, and
+--compare checks the run against an earlier one right away.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.load.compare import compare, print_report
+from benchmarks.load.fake_supabase import FakeSupabase, free_port
+from benchmarks.load.scenarios import SCENARIOS, LoadContext, Scenario
+from benchmarks.load.tokens import TokenMinter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ERROR_SAMPLES = 5
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    latency: Dict[str, Dict[str, float]] = {}
+    for step, values in samples.items():
+        ordered = sorted(1000 * value for value in values)
+        latency[step] = {
+            "p50": round(percentile(ordered, 0.50), 2),
+            "p95": round(percentile(ordered, 0.95), 2),
+            "p99": round(percentile(ordered, 0.99), 2),
+            "mean": round(sum(ordered) / len(ordered), 2),
+            "max": round(ordered[-1], 2),
+        }
+    return latency
+
+
+async def drive(scenario: Scenario, ctx: LoadContext, concurrency: int, requests: int, offset: int = 0) -> Dict:
+    """
+    Run `requests` operations with `concurrency` clients, each starting the next as soon as one finishes
+    """
+    indexes = itertools.count(offset)
+    end = offset + requests
+    samples: Dict[str, List[float]] = {}
+    errors: List[str] = []
+
+    async def client() -> None:
+        for i in indexes:
+            if i >= end:
+                return
+            try:
+                marks = await scenario.op(ctx, i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            for step, seconds in marks.items():
+                samples.setdefault(step, []).append(seconds)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    seconds = time.perf_counter() - started
+    return {
+        "operations": requests,
+        "errors": len(errors),
+        "error_samples": errors[:_ERROR_SAMPLES],
+        "seconds": round(seconds, 3),
+        "throughput_per_s": round((requests - len(errors)) / seconds, 1),
+        "latency_ms": summarize(samples),
+    }
+
+
+async def start_backend(port: int, env: Dict[str, str], workers: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 60
+    async with httpx.AsyncClient() as client:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"backend exited with status {process.returncode}")
+            try:
+                if (await client.get(f"http://127.0.0.1:{port}/")).status_code == 200:
+                    return process
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                process.terminate()
+                raise RuntimeError("backend did not start within 60 s")
+            await asyncio.sleep(0.1)
+
+
+def stop_backend(process: subprocess.Popen) -> None:
+    process.terminate()
+    process.wait(timeout=30)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_scenarios(specs: List[str], default_requests: int) -> List[tuple]:
+    plan = []
+    for spec in specs:
+        name, _, count = spec.partition(":")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        plan.append((SCENARIOS[name], int(count) if count else default_requests))
+    return plan
+
+
+async def run(args: argparse.Namespace, data_dir: str) -> Dict:
+    minter = TokenMinter()
+    fake = FakeSupabase(minter, args.upstream_latency_ms, args.upstream_jitter_ms, seed=args.seed)
+    supabase_url = await fake.start()
+
+    env = dict(os.environ)
+    env.update({
+        "SUPABASE_URL": supabase_url,
+        "DATA_DIR": data_dir,
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_FIRST_TOKEN_DELAY_MS": str(args.first_token_ms),
+        "FAKE_LLM_TOKEN_DELAY_MS": str(args.token_ms),
+        "CHAT_CACHE_MAX_ENTRIES": "0",
+        # --- Measure the service itself; rate_limited checks the limiter on purpose ---
+        "ADMISSION_ENABLED": "false",
+    })
+    overrides = dict(pair.split("=", 1) for pair in args.env)
+    port = free_port()
+    backend: Optional[subprocess.Popen] = None
+    backend_env: Optional[Dict[str, str]] = None
+
+    users = minter.users(args.users, seed=args.seed)
+    results: Dict = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": {},
+    }
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        for scenario, requests in parse_scenarios(args.scenarios, args.requests):
+            scenario_env = {**env, **scenario.env, **overrides}
+            if scenario_env != backend_env:
+                if backend is not None:
+                    stop_backend(backend)
+                backend, backend_env = await start_backend(port, scenario_env, args.workers), scenario_env
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout) as client:
+                ctx = LoadContext(client, minter, users, requests, doc_kb=args.doc_kb, seed=args.seed)
+                await scenario.setup(ctx)
+                warmup = min(args.concurrency, max(1, requests // 10))
+                await drive(scenario, ctx, args.concurrency, warmup, offset=requests)
+
+                before = dict(fake.calls)
+                summary = await drive(scenario, ctx, args.concurrency, requests)
+                summary["concurrency"] = args.concurrency
+                summary["upstream_calls"] = {k: v - before.get(k, 0) for k, v in fake.calls.items() if v - before.get(k, 0)}
+                results["scenarios"][scenario.name] = summary
+                report(scenario.name, summary)
+    finally:
+        if backend is not None:
+            stop_backend(backend)
+        await fake.stop()
+    return results
+
+
+def report(name: str, summary: Dict) -> None:
+    print(f"{name}: {summary['operations']} ops, {summary['errors']} errors, "
+          f"{summary['throughput_per_s']}/s over {summary['seconds']} s, upstream {summary['upstream_calls'] or '-'}")
+    for step, latency in summary["latency_ms"].items():
+        print(f"  {step:<12} p50 {latency['p50']:>9} ms   p95 {latency['p95']:>9} ms   p99 {latency['p99']:>9} ms")
+    for sample in summary["error_samples"]:
+        print(f"  error: {sample}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["auth_me", "auth_me_cold", "auth_refresh", "ingest:100", "chat:200", "rate_limited:100"],
+                        help=f"name[:requests] from {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=2000, help="operations per scenario unless given with the name")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--upstream-latency-ms", type=float, default=40.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--first-token-ms", type=float, default=100.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--doc-kb", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="extra backend settings")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with an earlier results file")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        results = asyncio.run(run(args, data_dir))
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        rows, regressions = compare(baseline, results, args.tolerance)
+        print()
+        print_report(rows, regressions)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
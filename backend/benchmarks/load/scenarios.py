@@ -0,0 +1,185 @@
+"""
+Scripted user flows against the running backend.
+
+Each scenario does its setup untimed, then `op` is called once per
+operation and returns how long each step took (seconds), keyed by step;
+e.g. chat reports both its first token and its final event. An op raises
+on any unexpected response, which counts as an error. `env` holds backend
+settings a scenario depends on; the runner restarts the backend with them.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load.tokens import Identity, TokenMinter
+
+WORDS = (
+    "invoice contract clause payment delivery warranty liability customer "
+    "supplier schedule amendment termination notice party agreement section"
+).split()
+
+
+@dataclass
+class LoadContext:
+    client: httpx.AsyncClient
+    minter: TokenMinter
+    users: List[Identity]
+    requests: int
+    doc_kb: int = 16
+    seed: int = 0
+    state: Dict = field(default_factory=dict)
+
+    def user(self, i: int) -> Identity:
+        return self.users[i % len(self.users)]
+
+    def bearer(self, i: int) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.minter.access_token(self.user(i))}"}
+
+
+def document(size_kb: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    parts: List[str] = []
+    written = 0
+    while written < size_kb * 1024:
+        paragraph = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + ".\n\n"
+        parts.append(paragraph)
+        written += len(paragraph)
+    return "".join(parts).encode()
+
+
+def _check(response: httpx.Response, expected: int = 200) -> httpx.Response:
+    if response.status_code != expected:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code}")
+    return response
+
+
+class Scenario:
+    name = ""
+    description = ""
+    env: Dict[str, str] = {}
+
+    async def setup(self, ctx: LoadContext) -> None:
+        pass
+
+    async def op(self, ctx: LoadContext, i: int) -> Dict[str, float]:
+        raise NotImplementedError
+
+
+class AuthMe(Scenario):
+    name = "auth_me"
+    description = "GET /auth/me with one token per user (verified once, then cached)"
+
+    async def op(self, ctx: LoadContext, i: int) -> Dict[str, float]:
+        headers = ctx.bearer(i)
+        started = time.perf_counter()
+        _check(await ctx.client.get("/api/v1/auth/me", headers=headers))
+        return {"request": time.perf_counter() - started}
+
+
+class AuthMeCold(Scenario):
+    name = "auth_me_cold"
+    description = "GET /auth/me with a never-seen token each time (full signature check)"
+
+    async def setup(self, ctx: LoadContext) -> None:
+        # --- Signing is the client's cost; do it before the clock starts ---
+        ctx.state["cold_tokens"] = [ctx.minter.access_token(ctx.user(i), fresh=True) for i in range(ctx.requests)]
+
+    async def op(self, ctx: LoadContext, i: int) -> Dict[str, float]:
+        token = ctx.state["cold_tokens"][i % len(ctx.state["cold_tokens"])]
+        started = time.perf_counter()
+        _check(await ctx.client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"}))
+        return {"request": time.perf_counter() - started}
+
+
+class AuthRefresh(Scenario):
+    name = "auth_refresh"
+    description = "POST /auth/refresh with a new refresh token each time (one upstream exchange each)"
+
+    async def op(self, ctx: LoadContext, i: int) -> Dict[str, float]:
+        cookie = f"sb-refresh-token={ctx.minter.refresh_token(ctx.user(i))}"
+        started = time.perf_counter()
+        _check(await ctx.client.post("/api/v1/auth/refresh", headers={"Cookie": cookie}))
+        return {"request": time.perf_counter() - started}
+
+
+class RateLimited(Scenario):
+    name = "rate_limited"
+    description = "GET /auth/me as one user until the auth rate limit answers 429 with Retry-After"
+    # --- The other scenarios run with admission off; this one needs it on, with a bucket it can drain ---
+    env = {"ADMISSION_ENABLED": "true", "RATE_LIMIT_AUTH_PER_MINUTE": "60", "RATE_LIMIT_AUTH_BURST": "5"}
+    attempts = 20
+
+    async def op(self, ctx: LoadContext, i: int) -> Dict[str, float]:
+        headers = ctx.bearer(i)
+        for _ in range(self.attempts):
+            started = time.perf_counter()
+            response = await ctx.client.get("/api/v1/auth/me", headers=headers)
+            if response.status_code == 429:
+                break
+            _check(response)
+        else:
+            raise RuntimeError(f"no 429 after {self.attempts} requests")
+        retry_after = response.headers.get("Retry-After", "")
+        if not retry_after.isdigit() or int(retry_after) < 1:
+            raise RuntimeError(f"429 without a valid Retry-After: {retry_after!r}")
+        return {"rejected": time.perf_counter() - started}
+
+
+async def upload_and_wait(ctx: LoadContext, i: int, poll_seconds: float = 0.05) -> Dict[str, float]:
+    headers = ctx.bearer(i)
+    files = {"file": (f"load-{i}.txt", document(ctx.doc_kb, ctx.seed * 100_003 + i), "text/plain")}
+    started = time.perf_counter()
+    response = _check(await ctx.client.post("/api/v1/documents/upload", headers=headers, files=files), 202)
+    uploaded = time.perf_counter()
+    job = response.json()["job"]
+    while job["status"] not in ("succeeded", "failed"):
+        await asyncio.sleep(poll_seconds)
+        job = _check(await ctx.client.get(f"/api/v1/documents/jobs/{job['id']}", headers=headers)).json()
+    if job["status"] == "failed":
+        raise RuntimeError(f"ingestion job {job['id']} failed")
+    return {"upload": uploaded - started, "ingested": time.perf_counter() - started}
+
+
+class Ingest(Scenario):
+    name = "ingest"
+    description = "Upload a document, then poll its job until ingested"
+
+    async def op(self, ctx: LoadContext, i: int) -> Dict[str, float]:
+        return await upload_and_wait(ctx, i)
+
+
+class Chat(Scenario):
+    name = "chat"
+    description = "Stream an answer over SSE from each user's ingested document"
+
+    async def setup(self, ctx: LoadContext) -> None:
+        if not ctx.state.get("seeded"):
+            await asyncio.gather(*[upload_and_wait(ctx, i) for i in range(len(ctx.users))])
+            ctx.state["seeded"] = True
+
+    async def op(self, ctx: LoadContext, i: int) -> Dict[str, float]:
+        rng = random.Random(ctx.seed * 1_000_003 + i)
+        question = f"what does the {rng.choice(WORDS)} clause say about {rng.choice(WORDS)} #{i}?"
+        marks: Dict[str, float] = {}
+        started = time.perf_counter()
+        async with ctx.client.stream("POST", "/api/v1/chat/stream", headers=ctx.bearer(i), json={"message": question}) as response:
+            _check(response)
+            async for line in response.aiter_lines():
+                if line == "event: token":
+                    marks.setdefault("first_token", time.perf_counter() - started)
+                elif line == "event: error":
+                    raise RuntimeError("chat stream sent an error event")
+                elif line == "event: done":
+                    marks["done"] = time.perf_counter() - started
+        if "done" not in marks:
+            raise RuntimeError("chat stream ended without a done event")
+        return marks
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s for s in (AuthMe(), AuthMeCold(), AuthRefresh(), RateLimited(), Ingest(), Chat())
+}
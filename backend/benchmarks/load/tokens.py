@@ -0,0 +1,79 @@
+"""
+RS256 access tokens shaped like Supabase's, signed with a local key.
+"""
+import secrets
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+@dataclass(frozen=True)
+class Identity:
+    id: str
+    email: str
+
+
+class TokenMinter:
+    """
+    Signs access tokens with a generated RSA key and publishes it as a JWKS.
+
+    Tokens carry what JWKSVerifier checks (kid header, RS256, audience
+    "authenticated", exp) plus the user fields User.from_supabase reads.
+    Access tokens are cached per user until they near expiry, so serving a
+    refresh does not sign anew each time; `fresh=True` mints a distinct
+    token, which the backend has never verified. Refresh tokens are opaque
+    and remembered until redeemed.
+    """
+
+    def __init__(self, kid: str = "bench-key-1", ttl_seconds: int = 3600, key_size: int = 2048):
+        self.kid = kid
+        self.ttl_seconds = ttl_seconds
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+        self._access: Dict[str, tuple] = {}
+        self._refresh: Dict[str, Identity] = {}
+        self.signed = 0
+
+    def jwks(self) -> Dict[str, List[Dict]]:
+        jwk = jwt.algorithms.RSAAlgorithm.to_jwk(self._key.public_key(), as_dict=True)
+        jwk.update({"kid": self.kid, "alg": "RS256", "use": "sig"})
+        return {"keys": [jwk]}
+
+    def users(self, count: int, seed: int = 0) -> List[Identity]:
+        namespace = uuid.UUID(int=seed)
+        return [Identity(str(uuid.uuid5(namespace, f"user-{i}")), f"load-{i}@example.com") for i in range(count)]
+
+    def access_token(self, user: Identity, fresh: bool = False) -> str:
+        now = int(time.time())
+        cached = self._access.get(user.id)
+        if not fresh and cached is not None and cached[1] - now > self.ttl_seconds // 2:
+            return cached[0]
+        claims = {
+            "sub": user.id,
+            "id": user.id,
+            "email": user.email,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "iat": now,
+            "exp": now + self.ttl_seconds,
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {"full_name": user.email.split("@")[0]},
+        }
+        if fresh:
+            claims["jti"] = secrets.token_hex(8)
+        token = jwt.encode(claims, self._key, algorithm="RS256", headers={"kid": self.kid})
+        self.signed += 1
+        if not fresh:
+            self._access[user.id] = (token, claims["exp"])
+        return token
+
+    def refresh_token(self, user: Identity) -> str:
+        token = secrets.token_urlsafe(24)
+        self._refresh[token] = user
+        return token
+
+    def redeem(self, refresh_token: str) -> Optional[Identity]:
+        return self._refresh.pop(refresh_token, None)